@@ -4,26 +4,40 @@ from __future__ import annotations
 
 import asyncio
 import json
-from datetime import datetime
-from typing import AsyncGenerator, Dict, Optional
+from datetime import date, datetime, timezone
+from typing import AsyncGenerator, Dict, List, Optional
 
+import numpy as np
 from fastapi import Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 
+from market_data.chain_snapshots import CHAIN_COLUMNS, read_chain_history
+from market_data.instruments import chain_expiries, option_chain
+from market_data.maintenance import database_stats
+from market_data.schema import from_epoch, interval_code, interval_name, table_exists, to_epoch
+
 from .config import get_settings
-from .database import get_connection, init_db
+from .database import get_connection, get_hot_cache, init_db
 from .models import (
+    DatabaseStats,
+    ExpiriesResponse,
     Instrument,
+    IngestLagResponse,
     InstrumentListResponse,
+    OptionChainHistoryResponse,
+    OptionChainResponse,
     PriceBar,
     PriceBarsResponse,
+    SeriesLag,
+    SeriesQuality,
+    SeriesQualityResponse,
     TrainingModelResult,
     TrainingRequest,
     TrainingRunResponse,
     WalkForwardMetric,
 )
-from .services.analytics import compute_summary, compute_technicals
+from .services.analytics import compute_screener, compute_summary, compute_technicals
 from .services.training import run_training_job
 
 
@@ -80,6 +94,73 @@ def create_app() -> FastAPI:
         instruments = [Instrument(**dict(row)) for row in rows]
         return InstrumentListResponse(items=instruments, total=total)
 
+    @app.get("/instruments/expiries", response_model=ExpiriesResponse, tags=["instruments"])
+    def list_expiries(
+        name: str = Query(..., description="Underlying name such as 'NIFTY' or 'BANKNIFTY'"),
+        segment: str = Query("NFO-OPT"),
+        include_expired: bool = Query(False),
+    ) -> ExpiriesResponse:
+        with get_connection() as conn:
+            expiries = chain_expiries(conn, name, segment, None if include_expired else date.today())
+        return ExpiriesResponse(name=name, segment=segment, expiries=expiries)
+
+    @app.get("/instruments/chain", response_model=OptionChainResponse, tags=["instruments"])
+    def get_option_chain(
+        name: str = Query(..., description="Underlying name such as 'NIFTY' or 'BANKNIFTY'"),
+        expiry: date = Query(..., description="Contract expiry date"),
+        segment: str = Query("NFO-OPT"),
+        min_strike: Optional[float] = Query(None),
+        max_strike: Optional[float] = Query(None),
+        instrument_type: Optional[str] = Query(None, description="CE, PE or FUT"),
+    ) -> OptionChainResponse:
+        with get_connection() as conn:
+            rows = option_chain(conn, name, expiry, segment, min_strike, max_strike, instrument_type)
+        items = [Instrument(**row) for row in rows]
+        return OptionChainResponse(
+            name=name,
+            segment=segment,
+            expiry=expiry.isoformat(),
+            count=len(items),
+            items=items,
+        )
+
+    @app.get("/instruments/chain/history", response_model=OptionChainHistoryResponse, tags=["instruments"])
+    def get_option_chain_history(
+        name: str = Query(..., description="Underlying name such as 'NIFTY' or 'BANKNIFTY'"),
+        expiry: date = Query(..., description="Contract expiry date"),
+        day: date = Query(..., description="Session whose snapshots to return"),
+        columns: list[str] = Query(["last_price", "oi", "oi_change"], description="Quote columns to include"),
+    ) -> OptionChainHistoryResponse:
+        """Every chain snapshot recorded on ``day`` by scripts/record_option_chain.py."""
+        unknown = sorted(set(columns) - set(CHAIN_COLUMNS) - {"oi_change"})
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+        with get_connection() as conn:
+            if not table_exists(conn, "option_chain_snapshots"):
+                raise HTTPException(status_code=404, detail="No option-chain snapshots recorded")
+            history = read_chain_history(conn, name, expiry.isoformat(), day)
+
+        def nullable(values):
+            data = values.astype(object)
+            data[np.isnan(values)] = None
+            return data.tolist()
+
+        return OptionChainHistoryResponse(
+            name=name,
+            expiry=expiry.isoformat(),
+            day=day.isoformat(),
+            instrument_tokens=history.instrument_tokens.tolist(),
+            strikes=history.strikes.tolist(),
+            option_types=history.option_types.tolist(),
+            timestamps=[from_epoch(timestamp) for timestamp in history.timestamps.tolist()],
+            underlying_price=nullable(history.underlying_price),
+            put_call_ratio=nullable(history.put_call_ratio()),
+            columns={
+                column: nullable(history.oi_change if column == "oi_change" else history.column(column))
+                for column in columns
+            },
+        )
+
     @app.get("/price-bars", response_model=PriceBarsResponse, tags=["prices"])
     def get_price_bars(
         instrument_token: int = Query(..., description="Instrument token to query"),
@@ -88,6 +169,11 @@ def create_app() -> FastAPI:
         end: Optional[datetime] = Query(None, description="Inclusive end timestamp"),
         limit: int = Query(5000, ge=1, le=20000),
     ) -> PriceBarsResponse:
+        try:
+            code = interval_code(interval)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
         with get_connection() as conn:
             instrument_row = conn.execute(
                 "SELECT * FROM instruments WHERE instrument_token = ?", (instrument_token,)
@@ -95,22 +181,30 @@ def create_app() -> FastAPI:
             if not instrument_row:
                 raise HTTPException(status_code=404, detail="Instrument not found")
 
-            query = "SELECT * FROM price_bars WHERE instrument_token = ? AND interval = ?"
-            params: list = [instrument_token, interval]
-            if start:
-                query += " AND timestamp >= ?"
-                params.append(start.isoformat())
-            if end:
-                query += " AND timestamp <= ?"
-                params.append(end.isoformat())
-
-            query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(limit)
-
-            rows = conn.execute(query, params).fetchall()
+            # Recent ranges are answered from memory; older ones fall through to read_bars.
+            bars = get_hot_cache().read_bars(
+                conn,
+                instrument_token,
+                code,
+                start=to_epoch(start) if start else None,
+                end=to_epoch(end) if end else None,
+                limit=limit,
+            )
 
-        items = [PriceBar(**dict(row)) for row in rows]
-        items.reverse()  # ascending chronological order for consumers
+        items = [
+            PriceBar(
+                instrument_token=instrument_token,
+                interval=interval,
+                timestamp=from_epoch(timestamp),
+                open=open_,
+                high=high,
+                low=low,
+                close=close,
+                volume=volume,
+                oi=oi,
+            )
+            for timestamp, open_, high, low, close, volume, oi in bars.rows()
+        ]
         return PriceBarsResponse(
             instrument_token=instrument_token,
             interval=interval,
@@ -120,6 +214,83 @@ def create_app() -> FastAPI:
             items=items,
         )
 
+    @app.get("/ingest/lag", response_model=IngestLagResponse, tags=["system"])
+    def get_ingest_lag(
+        interval: Optional[str] = Query(None, description="Restrict to one interval such as 'minute'"),
+    ) -> IngestLagResponse:
+        """Seconds each daemon-watched series trails the wall clock, measured now."""
+        query = (
+            "SELECT l.*, i.tradingsymbol FROM ingest_lag l "
+            "LEFT JOIN instruments i ON i.instrument_token = l.instrument_token"
+        )
+        params: list = []
+        if interval:
+            try:
+                params.append(interval_code(interval))
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+            query += " WHERE l.interval = ?"
+        query += " ORDER BY l.lag_seconds DESC"
+
+        now = datetime.now(timezone.utc)
+        with get_connection() as conn:
+            rows = conn.execute(query, params).fetchall() if table_exists(conn, "ingest_lag") else []
+
+        items = []
+        for row in rows:
+            last_bar = row["last_bar_timestamp"]
+            lag = None
+            if last_bar is not None:
+                lag = max(now.timestamp() - (last_bar + row["interval"] * 60), 0.0)
+            items.append(
+                SeriesLag(
+                    instrument_token=row["instrument_token"],
+                    tradingsymbol=row["tradingsymbol"],
+                    interval=interval_name(row["interval"]),
+                    last_bar=from_epoch(last_bar) if last_bar is not None else None,
+                    polled_at=from_epoch(row["polled_at"]),
+                    lag_seconds=lag,
+                    error=row["error"],
+                )
+            )
+        return IngestLagResponse(as_of=now, items=items)
+
+    @app.get("/system/db-stats", response_model=DatabaseStats, tags=["system"])
+    def get_db_stats(
+        detailed: bool = Query(False, description="Include per-table sizes (reads every page; use sparingly)"),
+    ) -> DatabaseStats:
+        """Database size, WAL size, free-page fragmentation and the last maintenance runs."""
+        with get_connection() as conn:
+            return DatabaseStats(**database_stats(conn, detailed))
+
+    @app.get("/data-quality", response_model=SeriesQualityResponse, tags=["prices"])
+    def get_data_quality(
+        instrument_token: Optional[int] = Query(None, description="Restrict to one instrument"),
+        interval: Optional[str] = Query(None, description="Restrict to one interval such as 'minute', 'day'"),
+    ) -> SeriesQualityResponse:
+        query = "SELECT * FROM series_quality"
+        filters: list[str] = []
+        params: list = []
+        if instrument_token is not None:
+            filters.append("instrument_token = ?")
+            params.append(instrument_token)
+        if interval:
+            try:
+                params.append(interval_code(interval))
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+            filters.append("interval = ?")
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+        query += " ORDER BY instrument_token, interval"
+
+        with get_connection() as conn:
+            # Databases that have not been ingested into since validation was added have no report yet.
+            rows = conn.execute(query, params).fetchall() if table_exists(conn, "series_quality") else []
+
+        items = [SeriesQuality(**{**dict(row), "interval": interval_name(row["interval"])}) for row in rows]
+        return SeriesQualityResponse(items=items)
+
     return app
 
 
@@ -150,6 +321,26 @@ def analytics_technicals(
     return data
 
 
+@app.get("/analytics/screener", tags=["analytics"])
+def analytics_screener(
+    instrument_token: List[int] = Query(..., description="Instrument tokens to summarise; repeat the parameter"),
+    interval: str = Query("day"),
+    start: Optional[datetime] = Query(None, description="Inclusive start timestamp"),
+    end: Optional[datetime] = Query(None, description="Inclusive end timestamp"),
+):
+    try:
+        interval_code(interval)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    items = compute_screener(
+        instrument_token,
+        interval,
+        start=to_epoch(start) if start else None,
+        end=to_epoch(end) if end else None,
+    )
+    return {"interval": interval, "count": len(items), "items": items}
+
+
 @app.post("/training/run", tags=["training"], response_model=TrainingRunResponse)
 def run_training(request: TrainingRequest):
     if request.stream:
@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -22,6 +22,22 @@ class Settings(BaseSettings):
         default_factory=lambda: ["http://localhost", "http://localhost:5173", "http://localhost:3000"],
         description="CORS origins permitted to access the API",
     )
+    bar_cache_dir: Optional[str] = Field(
+        default=None,
+        description="Directory of the memory-mapped bar cache (default: cache/bars next to the database)",
+    )
+    hot_cache_bars: int = Field(
+        default=512,
+        description="Latest bars per series kept in memory for tail queries (analytics, /price-bars)",
+    )
+    analytical_engine: str = Field(
+        default="auto",
+        description="Engine for multi-series scans: 'duckdb', 'sqlite', or 'auto' (duckdb when installed)",
+    )
+    analytical_min_bars: int = Field(
+        default=200_000,
+        description="Scans touching fewer bars than this stay on SQLite even with duckdb enabled",
+    )
     app_name: str = Field(default="nifty-ml-backend")
 
 
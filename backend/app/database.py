@@ -4,8 +4,16 @@ from __future__ import annotations
 
 import sqlite3
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterator
+from typing import Iterator, Optional
+
+from market_data import analytical
+from market_data.analytical import AnalyticalEngine
+from market_data.bar_cache import BarCache
+from market_data.hot_cache import HotBarCache
+from market_data.schema import SCHEMA_VERSION, schema_version
+from market_data.shards import attach_shards
 
 from .config import get_settings
 
@@ -30,6 +38,12 @@ def init_db() -> None:
             raise RuntimeError(
                 f"Database missing tables: {missing}. Ensure fetch_price_history.py populated the schema."
             )
+        version = schema_version(conn)
+        if version != SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Database schema is v{version}, expected v{SCHEMA_VERSION}. "
+                "Run scripts/migrate_price_bars.py to upgrade it."
+            )
 
 
 @contextmanager
@@ -38,8 +52,31 @@ def get_connection() -> Iterator[sqlite3.Connection]:
     conn = sqlite3.connect(settings.database_path)
     conn.row_factory = sqlite3.Row
     try:
+        attach_shards(conn)
         yield conn
     finally:
         conn.close()
 
 
+@lru_cache()
+def get_bar_cache() -> BarCache:
+    """Memory-mapped bar cache shared by every request in this process."""
+    return BarCache(get_settings().bar_cache_dir)
+
+
+@lru_cache()
+def get_hot_cache() -> HotBarCache:
+    """Ring buffers of the latest bars per series shared by every request in this process."""
+    return HotBarCache(get_settings().hot_cache_bars)
+
+
+@lru_cache()
+def get_analytical_engine() -> Optional[AnalyticalEngine]:
+    """DuckDB engine for large scans and aggregates, or None to keep them on SQLite."""
+    settings = get_settings()
+    engine = settings.analytical_engine.lower()
+    if engine not in {"auto", "duckdb", "sqlite"}:
+        raise ValueError(f"Unsupported analytical engine '{settings.analytical_engine}'. Expected auto, duckdb or sqlite")
+    if engine == "sqlite" or (engine == "auto" and analytical.duckdb is None):
+        return None
+    return AnalyticalEngine(settings.database_path, settings.analytical_min_bars)
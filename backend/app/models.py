@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -17,6 +17,10 @@ class Instrument(BaseModel):
     lot_size: Optional[int]
     expiry: Optional[str]
     last_refreshed: Optional[str]
+    exchange_token: Optional[int] = None
+    strike: Optional[float] = None
+    instrument_type: Optional[str] = None
+    tick_size: Optional[float] = None
 
 
 class PriceBar(BaseModel):
@@ -36,6 +40,34 @@ class InstrumentListResponse(BaseModel):
     total: int
 
 
+class ExpiriesResponse(BaseModel):
+    name: str
+    segment: str
+    expiries: list[str]
+
+
+class OptionChainResponse(BaseModel):
+    name: str
+    segment: str
+    expiry: str
+    count: int
+    items: list[Instrument]
+
+
+class OptionChainHistoryResponse(BaseModel):
+    name: str
+    expiry: str
+    day: str
+    instrument_tokens: list[int]
+    strikes: list[float]
+    option_types: list[str]
+    timestamps: list[datetime]
+    underlying_price: list[Optional[float]]
+    put_call_ratio: list[Optional[float]]
+    # Column name (last_price, bid, ask, volume, oi, oi_change) -> one row per snapshot.
+    columns: Dict[str, list[list[Optional[float]]]]
+
+
 class PriceBarsResponse(BaseModel):
     instrument_token: int
     interval: str
@@ -45,6 +77,63 @@ class PriceBarsResponse(BaseModel):
     items: list[PriceBar]
 
 
+class SeriesQuality(BaseModel):
+    instrument_token: int
+    interval: str
+    bar_count: int
+    sessions: int
+    expected_sessions: int
+    coverage_pct: Optional[float]
+    gap_bars: int
+    spikes: int
+    zero_volume: int
+    quarantined: int
+    duplicates: int
+    updated_at: Optional[str]
+
+
+class SeriesQualityResponse(BaseModel):
+    items: list[SeriesQuality]
+
+
+class SeriesLag(BaseModel):
+    instrument_token: int
+    tradingsymbol: Optional[str]
+    interval: str
+    last_bar: Optional[datetime]
+    polled_at: datetime
+    lag_seconds: Optional[float]
+    error: Optional[str]
+
+
+class IngestLagResponse(BaseModel):
+    as_of: datetime
+    items: list[SeriesLag]
+
+
+class TableStats(BaseModel):
+    name: str
+    bytes: int
+    pages: int
+    unused_pct: float
+
+
+class DatabaseStats(BaseModel):
+    path: str
+    file_bytes: int
+    wal_bytes: int
+    page_size: int
+    page_count: int
+    freelist_pages: int
+    free_pct: float
+    auto_vacuum: str
+    journal_mode: str
+    bars_by_interval: Dict[str, int]
+    tables: list[TableStats]
+    last_runs: Dict[str, Dict[str, Any]]
+    shards: Dict[str, Dict[str, Any]] = {}
+
+
 class WalkForwardMetric(BaseModel):
     fold: int
     train_start: datetime
@@ -5,9 +5,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime
 from statistics import mean
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 
-from ..database import get_connection
+import numpy as np
+
+from market_data.analytical import summarize_bars
+from market_data.schema import from_epoch
+
+from ..database import get_analytical_engine, get_connection, get_hot_cache
 
 
 @dataclass
@@ -26,32 +31,19 @@ def _fetch_recent_bars(
     limit: int,
 ) -> List[Bar]:
     with get_connection() as conn:
-        rows = conn.execute(
-            """
-            SELECT timestamp, open, high, low, close, volume
-            FROM price_bars
-            WHERE instrument_token = ? AND interval = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-            """,
-            (instrument_token, interval, limit),
-        ).fetchall()
-
-    bars: List[Bar] = []
-    for row in rows:
-        bars.append(
-            Bar(
-                timestamp=datetime.fromisoformat(row["timestamp"]),
-                open=row["open"],
-                high=row["high"],
-                low=row["low"],
-                close=row["close"],
-                volume=row["volume"],
-            )
+        rows = get_hot_cache().tail(conn, instrument_token, interval, limit).rows()
+
+    return [
+        Bar(
+            timestamp=from_epoch(timestamp),
+            open=open_,
+            high=high,
+            low=low,
+            close=close,
+            volume=volume,
         )
-
-    bars.reverse()  # chronological order
-    return bars
+        for timestamp, open_, high, low, close, volume, _oi in rows
+    ]
 
 
 def compute_summary(
@@ -167,3 +159,29 @@ def compute_technicals(
     }
 
 
+def compute_screener(
+    instrument_tokens: Sequence[int],
+    interval: str,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> List[Dict[str, object]]:
+    """Range summary of every series, scanned by the analytical engine when it is large."""
+    with get_connection() as conn:
+        summary = summarize_bars(conn, instrument_tokens, interval, start, end, engine=get_analytical_engine())
+
+    return [
+        {
+            "instrument_token": int(row.instrument_token),
+            "interval": interval,
+            "bars": int(row.bars),
+            "first_timestamp": from_epoch(int(row.first_timestamp)),
+            "last_timestamp": from_epoch(int(row.last_timestamp)),
+            "open": None if np.isnan(row.open) else float(row.open),
+            "high": None if np.isnan(row.high) else float(row.high),
+            "low": None if np.isnan(row.low) else float(row.low),
+            "close": None if np.isnan(row.close) else float(row.close),
+            "volume": None if np.isnan(row.volume) else float(row.volume),
+            "change_pct": None if np.isnan(row.change_pct) else float(row.change_pct),
+        }
+        for row in summary.itertuples(index=False)
+    ]
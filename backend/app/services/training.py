@@ -22,7 +22,7 @@ try:
 except ImportError:  # pragma: no cover
     XGBRegressor = None  # type: ignore
 
-from ..database import get_connection
+from ..database import get_bar_cache, get_connection
 
 
 @dataclass
@@ -39,13 +39,8 @@ class WalkForwardWindow:
 
 def load_price_frame(instrument_token: int, interval: str) -> pd.DataFrame:
     with get_connection() as conn:
-        query = (
-            "SELECT timestamp, open, high, low, close, volume FROM price_bars "
-            "WHERE instrument_token = ? AND interval = ? ORDER BY timestamp"
-        )
-        df = pd.read_sql_query(query, conn, params=(instrument_token, interval))
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    return df
+        bars = get_bar_cache().load(conn, instrument_token, interval)
+    return bars.frame(("open", "high", "low", "close", "volume"))
 
 
 def compute_rsi(series: pd.Series, window: int = 14) -> pd.Series:
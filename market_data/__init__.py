@@ -0,0 +1 @@
+"""Storage helpers shared by the ingestion scripts and the backend."""
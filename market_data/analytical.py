@@ -0,0 +1,424 @@
+"""Optional DuckDB engine for scans and aggregates over many series.
+
+:func:`market_data.bars.read_bars` answers one series at a time, which is what the
+``/price-bars`` pages and tail reads need. Screeners and training sets that touch the
+full history of hundreds of series instead spend their time in SQLite's row-at-a-time
+cursor. When ``duckdb`` is installed, :class:`AnalyticalEngine` scans the same storage
+column-wise:
+
+* archived months straight from their Parquet files (``market_data.archive``);
+* packed ``price_chunks`` sessions, decoded with NumPy and handed over as one frame;
+* ``price_bars`` rows through DuckDB's ``sqlite`` extension when it can be loaded
+  (main database and any shard files), otherwise through one SQLite query per scan.
+
+Tiers are merged with the precedence :func:`read_bars` uses (rows over chunks over
+archive). :func:`scan_bars` and :func:`summarize_bars` send a request to the engine
+when ``series_coverage`` says it touches at least ``engine.min_bars`` bars and keep
+smaller requests, and everything when DuckDB is missing, on :func:`read_bars`.
+
+duckdb (``requirements-analytics.txt``, verified against 1.5.6) is only needed for the
+engine; pandas for any of the frames returned here.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    import duckdb  # type: ignore
+except ImportError:  # pragma: no cover
+    duckdb = None  # type: ignore
+
+from .archive import database_dir
+from .bars import BarArrays, read_bars
+from .chunks import COLUMNS, read_chunks
+from .schema import interval_code, table_exists
+from .shards import registered_shards
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Below this many bars the per-series SQLite path is as fast as starting a DuckDB scan.
+DEFAULT_MIN_BARS = 200_000
+SCAN_COLUMNS = ("instrument_token", "timestamp", *COLUMNS)
+SUMMARY_COLUMNS = (
+    "instrument_token",
+    "bars",
+    "first_timestamp",
+    "last_timestamp",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "change_pct",
+)
+# SQLite's default limit on host parameters is 999 before 3.32.
+_TOKEN_BATCH = 900
+
+
+def _require_duckdb() -> None:
+    if duckdb is None:
+        raise RuntimeError("The analytical engine needs duckdb; install it with 'pip install duckdb'.")
+
+
+def _bounds(start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+    return (start if start is not None else -(2**62), end if end is not None else 2**62)
+
+
+def _token_batches(instrument_tokens: Sequence[int]) -> List[List[int]]:
+    tokens = sorted(set(int(token) for token in instrument_tokens))
+    return [tokens[index : index + _TOKEN_BATCH] for index in range(0, len(tokens), _TOKEN_BATCH)]
+
+
+def estimated_bars(
+    conn: sqlite3.Connection,
+    instrument_tokens: Sequence[int],
+    code: int,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> int:
+    """Bars a scan would touch, pro-rated from each series' coverage over ``[start, end]``."""
+    if not table_exists(conn, "series_coverage"):
+        return 0
+    lo, hi = _bounds(start, end)
+    total = 0.0
+    for batch in _token_batches(instrument_tokens):
+        rows = conn.execute(
+            f"""
+            SELECT first_timestamp, last_timestamp, bar_count FROM series_coverage
+            WHERE interval = ? AND instrument_token IN ({','.join('?' * len(batch))})
+            """,
+            (code, *batch),
+        ).fetchall()
+        for first, last, count in rows:
+            if not count or first is None or last < lo or first > hi:
+                continue
+            span = last - first
+            total += count * ((min(last, hi) - max(first, lo)) / span if span else 1.0)
+    return int(total)
+
+
+class AnalyticalEngine:
+    """DuckDB handle over one market database; safe to share between threads."""
+
+    def __init__(self, db_path: str, min_bars: int = DEFAULT_MIN_BARS) -> None:
+        _require_duckdb()
+        self.db_path = os.path.abspath(db_path)
+        self.min_bars = min_bars
+        self._duck = duckdb.connect()
+        self._lock = threading.Lock()
+        self._attached: Dict[str, str] = {}
+        try:
+            self._duck.execute("LOAD sqlite")
+            self.sqlite_scanner = True
+        except duckdb.Error as exc:
+            # Not bundled and not installed (INSTALL needs network access once).
+            logger.info("DuckDB sqlite extension unavailable (%s); reading price_bars rows through sqlite3", exc)
+            self.sqlite_scanner = False
+
+    def wants(
+        self,
+        conn: sqlite3.Connection,
+        instrument_tokens: Sequence[int],
+        code: int,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> bool:
+        """Whether a scan is large enough to be worth running here."""
+        return estimated_bars(conn, instrument_tokens, code, start, end) >= self.min_bars
+
+    def scan(
+        self,
+        conn: sqlite3.Connection,
+        instrument_tokens: Sequence[int],
+        interval: Union[str, int],
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> "pd.DataFrame":
+        """Every bar of the series in ``[start, end]``, ordered by token then time."""
+        query, cursor = self._bars(conn, instrument_tokens, interval, start, end)
+        try:
+            return cursor.execute(f"SELECT * FROM ({query}) ORDER BY instrument_token, timestamp").df()
+        finally:
+            cursor.close()
+
+    def summarize(
+        self,
+        conn: sqlite3.Connection,
+        instrument_tokens: Sequence[int],
+        interval: Union[str, int],
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> "pd.DataFrame":
+        """One row of :data:`SUMMARY_COLUMNS` per series with bars in ``[start, end]``."""
+        query, cursor = self._bars(conn, instrument_tokens, interval, start, end)
+        try:
+            return cursor.execute(
+                f"""
+                SELECT *, (close / NULLIF(open, 0) - 1) * 100 AS change_pct
+                FROM (
+                    SELECT
+                        instrument_token,
+                        COUNT(*) AS bars,
+                        MIN(timestamp) AS first_timestamp,
+                        MAX(timestamp) AS last_timestamp,
+                        ARG_MIN(open, timestamp) AS open,
+                        MAX(high) AS high,
+                        MIN(low) AS low,
+                        ARG_MAX(close, timestamp) AS close,
+                        SUM(volume) AS volume
+                    FROM ({query})
+                    GROUP BY instrument_token
+                )
+                ORDER BY instrument_token
+                """
+            ).df()
+        finally:
+            cursor.close()
+
+    def _bars(
+        self,
+        conn: sqlite3.Connection,
+        instrument_tokens: Sequence[int],
+        interval: Union[str, int],
+        start: Optional[int],
+        end: Optional[int],
+    ) -> Tuple[str, Any]:
+        """A query over the merged tiers and the DuckDB cursor it must run on."""
+        import pandas as pd
+
+        code = interval if isinstance(interval, int) else interval_code(interval)
+        lo, hi = _bounds(start, end)
+        tokens = np.array(sorted(set(int(token) for token in instrument_tokens)), dtype=np.int64)
+        columns = ", ".join(SCAN_COLUMNS)
+        window = f"timestamp BETWEEN {lo} AND {hi}"
+        cursor = self._duck.cursor()
+        cursor.register("wanted", pd.DataFrame({"instrument_token": tokens}))
+        # Newest tier first: rows, packed chunks, archive.
+        tiers = ["row_tier"]
+        rows = " UNION ALL ".join(self._row_arms(conn, cursor, tokens.tolist(), code, lo, hi))
+        cursor.execute(f"CREATE TEMP VIEW row_tier AS {rows}")
+
+        chunks = self._chunk_frame(conn, tokens.tolist(), code, start, end)
+        if len(chunks):
+            cursor.register("chunk_bars", chunks)
+            cursor.execute(f"CREATE TEMP VIEW chunk_tier AS SELECT {columns} FROM chunk_bars")
+            tiers.append("chunk_tier")
+
+        paths = self._archive_paths(conn, tokens.tolist(), code, lo, hi)
+        if paths:
+            # The token is only in the partition path (token=<token>/interval=<code>/).
+            cursor.read_parquet(paths, hive_partitioning=True).create_view("archive_bars")
+            cursor.execute(
+                f"""
+                CREATE TEMP VIEW archive_tier AS
+                SELECT CAST(token AS BIGINT) AS instrument_token, timestamp, {', '.join(COLUMNS)}
+                FROM archive_bars WHERE {window}
+                """
+            )
+            tiers.append("archive_tier")
+
+        if not self._overlapping(cursor, tiers):
+            return " UNION ALL ".join(f"SELECT * FROM {tier}" for tier in tiers), cursor
+        # Some series have a timestamp in two tiers (an interrupted pack or archive run):
+        # an older tier's bar is kept only when no newer tier has it.
+        parts = [f"SELECT * FROM {tiers[0]}"]
+        for index, tier in enumerate(tiers[1:], start=1):
+            newer = " UNION ALL ".join(f"SELECT instrument_token, timestamp FROM {other}" for other in tiers[:index])
+            parts.append(f"SELECT * FROM {tier} ANTI JOIN ({newer}) AS newer USING (instrument_token, timestamp)")
+        query = " UNION ALL ".join(f"({part})" for part in parts)
+        return query, cursor
+
+    @staticmethod
+    def _overlapping(cursor: Any, tiers: List[str]) -> bool:
+        """Whether any series' time range in one tier overlaps its range in another.
+
+        Normally each series' tiers are disjoint in time, and a plain UNION ALL is
+        several times cheaper than the anti joins that resolve duplicates.
+        """
+        if len(tiers) < 2:
+            return False
+        ranges = [
+            f"(SELECT instrument_token, MIN(timestamp) AS lo, MAX(timestamp) AS hi FROM {tier} GROUP BY 1)"
+            for tier in tiers
+        ]
+        checks = " UNION ALL ".join(
+            f"SELECT 1 FROM {ranges[i]} AS a JOIN {ranges[j]} AS b USING (instrument_token) "
+            "WHERE a.lo <= b.hi AND b.lo <= a.hi"
+            for i in range(len(ranges))
+            for j in range(i + 1, len(ranges))
+        )
+        return cursor.execute(f"SELECT EXISTS ({checks})").fetchone()[0]
+
+    def _archive_paths(self, conn: sqlite3.Connection, tokens: List[int], code: int, lo: int, hi: int) -> List[str]:
+        if not table_exists(conn, "archive_partitions"):
+            return []
+        base = database_dir(conn)
+        paths: List[str] = []
+        for batch in _token_batches(tokens):
+            rows = conn.execute(
+                f"""
+                SELECT path FROM archive_partitions
+                WHERE interval = ? AND last_timestamp >= ? AND first_timestamp <= ?
+                  AND instrument_token IN ({','.join('?' * len(batch))})
+                """,
+                (code, lo, hi, *batch),
+            ).fetchall()
+            paths.extend(os.path.join(base, path) for (path,) in rows)
+        return paths
+
+    def _chunk_frame(
+        self, conn: sqlite3.Connection, tokens: List[int], code: int, start: Optional[int], end: Optional[int]
+    ) -> "pd.DataFrame":
+        import pandas as pd
+
+        lo, hi = _bounds(start, end)
+        token_parts, timestamp_parts, value_parts = [], [], []
+        for token in tokens:
+            for timestamps, values in read_chunks(conn, token, code, start, end):
+                token_parts.append(np.full(len(timestamps), token, dtype=np.int64))
+                timestamp_parts.append(timestamps)
+                value_parts.append(values)
+        if not timestamp_parts:
+            return pd.DataFrame(columns=list(SCAN_COLUMNS))
+        timestamps = np.concatenate(timestamp_parts)
+        values = np.concatenate(value_parts)
+        # Chunks are whole sessions; trim the first and last to the range.
+        window = (timestamps >= lo) & (timestamps <= hi)
+        data = {"instrument_token": np.concatenate(token_parts)[window], "timestamp": timestamps[window]}
+        data.update({name: values[window, index] for index, name in enumerate(COLUMNS)})
+        return pd.DataFrame(data)
+
+    def _row_arms(
+        self, conn: sqlite3.Connection, cursor: Any, tokens: List[int], code: int, lo: int, hi: int
+    ) -> List[str]:
+        columns = ", ".join(SCAN_COLUMNS)
+        where = f"interval = {code} AND timestamp BETWEEN {lo} AND {hi}"
+        if self.sqlite_scanner:
+            try:
+                return [
+                    f"SELECT {columns} FROM {table} "
+                    f"WHERE {where} AND instrument_token IN (SELECT instrument_token FROM wanted)"
+                    for table in self._row_tables(conn)
+                ]
+            except duckdb.Error as exc:
+                logger.warning("DuckDB could not attach %s (%s); reading rows through sqlite3", self.db_path, exc)
+                self.sqlite_scanner = False
+        cursor.register("row_bars", self._row_frame(conn, tokens, code, lo, hi))
+        return [f"SELECT {columns} FROM row_bars"]
+
+    def _row_tables(self, conn: sqlite3.Connection) -> List[str]:
+        """DuckDB names of the main and shard ``price_bars`` tables, attaching as needed."""
+        files = {"md": self.db_path}
+        base = os.path.dirname(self.db_path)
+        files.update({f"md_{family}": os.path.join(base, path) for family, path in registered_shards(conn).items()})
+        with self._lock:
+            for alias, path in files.items():
+                if self._attached.get(alias) != path:
+                    quoted = path.replace("'", "''")
+                    self._duck.execute(f"ATTACH '{quoted}' AS {alias} (TYPE sqlite, READ_ONLY)")
+                    self._attached[alias] = path
+        return [f"{alias}.price_bars" for alias in files]
+
+    def _row_frame(self, conn: sqlite3.Connection, tokens: List[int], code: int, lo: int, hi: int) -> "pd.DataFrame":
+        import pandas as pd
+
+        rows: List[tuple] = []
+        for batch in _token_batches(tokens):
+            rows.extend(
+                conn.execute(
+                    f"""
+                    SELECT {', '.join(SCAN_COLUMNS)} FROM price_bars
+                    WHERE interval = ? AND timestamp BETWEEN ? AND ?
+                      AND instrument_token IN ({','.join('?' * len(batch))})
+                    """,
+                    (code, lo, hi, *batch),
+                ).fetchall()
+            )
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), len(SCAN_COLUMNS))
+        frame = {"instrument_token": data[:, 0].astype(np.int64), "timestamp": data[:, 1].astype(np.int64)}
+        frame.update({name: data[:, index + 2] for index, name in enumerate(COLUMNS)})
+        return pd.DataFrame(frame)
+
+    def close(self) -> None:
+        self._duck.close()
+
+
+def _series_frames(
+    conn: sqlite3.Connection,
+    instrument_tokens: Sequence[int],
+    code: int,
+    start: Optional[int],
+    end: Optional[int],
+) -> Iterator[Tuple[int, BarArrays]]:
+    for token in sorted(set(int(token) for token in instrument_tokens)):
+        bars = read_bars(conn, token, code, start, end)
+        if len(bars):
+            yield token, bars
+
+
+def scan_bars(
+    conn: sqlite3.Connection,
+    instrument_tokens: Sequence[int],
+    interval: Union[str, int],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    engine: Optional[AnalyticalEngine] = None,
+) -> "pd.DataFrame":
+    """Long frame of :data:`SCAN_COLUMNS` for every bar of the series in ``[start, end]``."""
+    import pandas as pd
+
+    code = interval if isinstance(interval, int) else interval_code(interval)
+    if engine is not None and engine.wants(conn, instrument_tokens, code, start, end):
+        return engine.scan(conn, instrument_tokens, code, start, end)
+    frames = []
+    for token, bars in _series_frames(conn, instrument_tokens, code, start, end):
+        data = {"instrument_token": np.full(len(bars), token, dtype=np.int64), "timestamp": bars.timestamps}
+        data.update({name: bars.column(name) for name in COLUMNS})
+        frames.append(pd.DataFrame(data))
+    if not frames:
+        return pd.DataFrame(columns=list(SCAN_COLUMNS))
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_bars(
+    conn: sqlite3.Connection,
+    instrument_tokens: Sequence[int],
+    interval: Union[str, int],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    engine: Optional[AnalyticalEngine] = None,
+) -> "pd.DataFrame":
+    """Per-series range summary (:data:`SUMMARY_COLUMNS`), e.g. for screeners."""
+    import pandas as pd
+
+    code = interval if isinstance(interval, int) else interval_code(interval)
+    if engine is not None and engine.wants(conn, instrument_tokens, code, start, end):
+        return engine.summarize(conn, instrument_tokens, code, start, end)
+    rows = []
+    for token, bars in _series_frames(conn, instrument_tokens, code, start, end):
+        first_open, last_close = bars.column("open")[0], bars.column("close")[-1]
+        rows.append(
+            (
+                token,
+                len(bars),
+                int(bars.timestamps[0]),
+                int(bars.timestamps[-1]),
+                first_open,
+                np.nanmax(bars.column("high")),
+                np.nanmin(bars.column("low")),
+                last_close,
+                np.nansum(bars.column("volume")),
+                (last_close / first_open - 1) * 100 if first_open else np.nan,
+            )
+        )
+    return pd.DataFrame.from_records(rows, columns=list(SUMMARY_COLUMNS))
@@ -0,0 +1,196 @@
+"""Cold-tier Parquet archive for old bars.
+
+``archive_series`` moves bars older than a cutoff out of SQLite (rows and packed
+chunks alike) into one Parquet file per ``(instrument_token, interval, month)``::
+
+    <db dir>/archive/token=<token>/interval=<code>/<YYYY-MM>.parquet
+
+Each file is registered in ``archive_partitions`` with its time bounds, so readers
+only open the months a query overlaps, and inside a file row-group statistics on
+``timestamp`` let pyarrow skip the rest. :func:`market_data.bars.read_bars` merges the
+archive under the SQLite tiers, so callers never need to know where a bar lives.
+
+pyarrow is only needed once a series has been archived.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:  # pragma: no cover
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+from .chunks import COLUMNS, merge_bars
+from .coverage import refresh_coverage
+from .schema import MARKET_UTC_OFFSET_SECONDS, day_start_epoch, interval_code, table_exists
+from .shards import bars_table
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIRNAME = "archive"
+# Roughly one row group per trading week of minute bars.
+ROW_GROUP_SIZE = 2048
+
+
+def _require_pyarrow() -> None:
+    if pq is None:
+        raise RuntimeError("The Parquet archive needs pyarrow; install it with 'pip install pyarrow'.")
+
+
+def database_dir(conn: sqlite3.Connection) -> str:
+    """Directory of the connection's main database file (cwd for in-memory databases)."""
+    for _, name, path in conn.execute("PRAGMA database_list").fetchall():
+        if name == "main" and path:
+            return os.path.dirname(os.path.abspath(path))
+    return os.getcwd()
+
+
+def partition_path(root: str, instrument_token: int, code: int, month: str) -> str:
+    return os.path.join(root, f"token={instrument_token}", f"interval={code}", f"{month}.parquet")
+
+
+def _months(timestamps: np.ndarray) -> np.ndarray:
+    """Exchange-local ``YYYY-MM`` of each timestamp."""
+    local = (timestamps + MARKET_UTC_OFFSET_SECONDS).astype("datetime64[s]")
+    return np.datetime_as_string(local.astype("datetime64[M]"), unit="M")
+
+
+def read_partition(path: str, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    _require_pyarrow()
+    filters = []
+    if start is not None:
+        filters.append(("timestamp", ">=", start))
+    if end is not None:
+        filters.append(("timestamp", "<=", end))
+    table = pq.read_table(path, columns=["timestamp", *COLUMNS], filters=filters or None)
+    timestamps = table.column("timestamp").to_numpy().astype(np.int64)
+    values = np.column_stack(
+        [table.column(name).to_numpy(zero_copy_only=False).astype(np.float64) for name in COLUMNS]
+    ) if len(timestamps) else np.empty((0, len(COLUMNS)), dtype=np.float64)
+    return timestamps, values
+
+
+def write_partition(path: str, timestamps: np.ndarray, values: np.ndarray) -> None:
+    """Write one month atomically: a reader sees either the old file or the new one."""
+    _require_pyarrow()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {"timestamp": pa.array(timestamps, type=pa.int64())}
+    arrays.update({name: pa.array(values[:, index], type=pa.float64()) for index, name in enumerate(COLUMNS)})
+    scratch = f"{path}.tmp"
+    pq.write_table(pa.table(arrays), scratch, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+    os.replace(scratch, path)
+
+
+def read_archive(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    code: int,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    descending: bool = False,
+) -> Iterable[Tuple[np.ndarray, np.ndarray]]:
+    """Archived bars overlapping ``[start, end]``, one month at a time."""
+    if not table_exists(conn, "archive_partitions"):
+        return
+    rows = conn.execute(
+        f"""
+        SELECT path FROM archive_partitions
+        WHERE instrument_token = ? AND interval = ? AND last_timestamp >= ? AND first_timestamp <= ?
+        ORDER BY month {'DESC' if descending else 'ASC'}
+        """,
+        (instrument_token, code, start if start is not None else -(2**62), end if end is not None else 2**62),
+    ).fetchall()
+    base = database_dir(conn) if rows else ""
+    for (path,) in rows:
+        yield read_partition(os.path.join(base, path), start, end)
+
+
+def archive_series(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    before: date,
+    root: Optional[str] = None,
+) -> int:
+    """Move a series' bars stamped before ``before`` into the Parquet archive.
+
+    Months that already have a file are merged with it, SQLite bars taking precedence.
+    Files are written before the SQLite rows are deleted, so an interrupted run leaves
+    the bars in both tiers and is simply repeated. Returns the number of bars moved.
+    """
+    from .bars import read_bars
+
+    _require_pyarrow()
+    code = interval_code(interval)
+    cutoff = day_start_epoch(before)
+    hot = read_bars(conn, instrument_token, code, end=cutoff - 1, include_archive=False)
+    if not len(hot):
+        return 0
+
+    base = database_dir(conn)
+    root = root or os.path.join(base, ARCHIVE_DIRNAME)
+    months = _months(hot.timestamps)
+    bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1], True])
+    registered = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        month = str(months[start])
+        path = partition_path(root, instrument_token, code, month)
+        timestamps, values = hot.timestamps[start:end], hot.values[start:end]
+        if os.path.exists(path):
+            timestamps, values = merge_bars([read_partition(path), (timestamps, values)])
+        write_partition(path, timestamps, values)
+        registered.append(
+            (
+                instrument_token,
+                code,
+                month,
+                int(timestamps[0]),
+                int(timestamps[-1]),
+                len(timestamps),
+                os.path.relpath(path, base),
+                datetime.utcnow().isoformat(),
+            )
+        )
+
+    conn.executemany(
+        """
+        INSERT INTO archive_partitions (
+            instrument_token, interval, month, first_timestamp, last_timestamp, bar_count, path, archived_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval, month) DO UPDATE SET
+            first_timestamp=excluded.first_timestamp,
+            last_timestamp=excluded.last_timestamp,
+            bar_count=excluded.bar_count,
+            path=excluded.path,
+            archived_at=excluded.archived_at
+        """,
+        registered,
+    )
+    conn.execute(
+        f"DELETE FROM {bars_table(conn, code)} WHERE instrument_token = ? AND interval = ? AND timestamp < ?",
+        (instrument_token, code, cutoff),
+    )
+    conn.execute(
+        "DELETE FROM price_chunks WHERE instrument_token = ? AND interval = ? AND last_timestamp < ?",
+        (instrument_token, code, cutoff),
+    )
+    refresh_coverage(conn, instrument_token, interval, rewritten=False)
+    conn.commit()
+    logger.info(
+        "Archived %s %s bars of %s into %s monthly partitions",
+        len(hot),
+        interval,
+        instrument_token,
+        len(registered),
+    )
+    return len(hot)
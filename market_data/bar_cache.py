@@ -0,0 +1,173 @@
+"""Memory-mapped NumPy cache of whole bar series.
+
+Each ``(instrument_token, interval)`` is kept as two ``.npy`` files under
+``<db dir>/cache/bars/<token>_<interval code>/``:
+
+* ``timestamps.npy`` - int64, shape ``(capacity,)``;
+* ``values.npy`` - float64, shape ``(6, capacity)``, one contiguous row per column
+  (open, high, low, close, volume, oi), so a column is a plain slice of the file;
+
+plus ``meta.json`` with the number of valid bars and the ``series_coverage`` row the
+cache was built from (including ``updated_at``, which every writer touches). Loads compare that row with the database and return views of
+``np.load(..., mmap_mode="r")`` when nothing changed, so repeated loads cost a query
+and two ``mmap`` calls and every process shares the same page cache.
+
+When the row changed but its first bar did not, the cached prefix is kept and only
+bars from the cached high-water mark onward are read again, or from the start of the
+earliest rewrite since the cached ``generation`` (a session downloaded again, see
+``market_data.coverage.rewritten_since``), and written in place; the files are
+rewritten at double the capacity when they fill up (or shrink). Anything else (a backfill before
+the first bar, a rewrite that is no longer logged) rebuilds the series from the
+database. ``meta.json`` is replaced atomically after the data it describes is written,
+so readers in other processes always see a consistent prefix.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from .archive import database_dir
+from .bars import BarArrays, read_bars
+from .chunks import COLUMNS
+from .coverage import rewritten_since
+from .schema import interval_code
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRNAME = os.path.join("cache", "bars")
+MIN_CAPACITY = 4096
+
+
+class BarCache:
+    """Process-wide handle on a bar cache directory; safe to share between threads."""
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+
+    def series_dir(self, conn: sqlite3.Connection, instrument_token: int, code: int) -> str:
+        root = self.root or os.path.join(database_dir(conn), CACHE_DIRNAME)
+        return os.path.join(root, f"{instrument_token}_{code}")
+
+    def load(self, conn: sqlite3.Connection, instrument_token: int, interval: Union[str, int]) -> BarArrays:
+        """Every bar of the series as read-only memory-mapped arrays, refreshed if needed."""
+        code = interval if isinstance(interval, int) else interval_code(interval)
+        source = conn.execute(
+            """
+            SELECT first_timestamp, last_timestamp, bar_count, generation, updated_at FROM series_coverage
+            WHERE instrument_token = ? AND interval = ?
+            """,
+            (instrument_token, code),
+        ).fetchone()
+        if source is None or not source[2]:
+            # Series without coverage bookkeeping are not cached.
+            return read_bars(conn, instrument_token, code)
+        source = tuple(source)
+
+        path = self.series_dir(conn, instrument_token, code)
+        meta = _read_meta(path)
+        if meta is None or tuple(meta["source"]) != source:
+            with self._lock:
+                meta = _read_meta(path)
+                if meta is None or tuple(meta["source"]) != source:
+                    meta = self._refresh(conn, path, instrument_token, code, source, meta)
+        return _open(path, meta["count"])
+
+    def _refresh(
+        self,
+        conn: sqlite3.Connection,
+        path: str,
+        instrument_token: int,
+        code: int,
+        source: Tuple[int, int, int, int, str],
+        meta: Optional[Dict],
+    ) -> Dict:
+        cached = tuple(meta["source"]) if meta is not None and meta["count"] else None
+        start = None
+        if cached is not None and len(cached) == len(source) and cached[0] == source[0]:
+            timestamps, values = _open_raw(path)
+            # Re-read the cached last bar too: it may have been a partial bar.
+            start = int(timestamps[meta["count"] - 1])
+            if cached[3] != source[3]:
+                since = rewritten_since(conn, instrument_token, code, cached[3])
+                start = None if since is None else min(since, start)
+        if start is not None:
+            offset = int(np.searchsorted(timestamps[: meta["count"]], start, "left"))
+            fresh = read_bars(conn, instrument_token, code, start=start)
+            count = offset + len(fresh)
+            # The kept prefix plus the re-read bars must be the whole series.
+            if count == source[2]:
+                # Readers of the old files may hold up to the old count of bars, so a
+                # series that shrank gets new files just like one that outgrew them.
+                if not meta["count"] <= count <= len(timestamps):
+                    _write_files(path, np.r_[timestamps[:offset], fresh.timestamps], np.r_[values.T[:offset], fresh.values])
+                else:
+                    writable_timestamps, writable_values = _open_raw(path, mode="r+")
+                    writable_timestamps[offset:count] = fresh.timestamps
+                    writable_values[:, offset:count] = fresh.values.T
+                    writable_timestamps.flush()
+                    writable_values.flush()
+                    del writable_timestamps, writable_values
+                return _write_meta(path, count, source)
+
+        bars = read_bars(conn, instrument_token, code)
+        _write_files(path, bars.timestamps, bars.values)
+        logger.debug("Rebuilt bar cache for %s/%s with %s bars", instrument_token, code, len(bars))
+        return _write_meta(path, len(bars), source)
+
+
+def _read_meta(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path: str, count: int, source: Tuple[int, int, int, int, str]) -> Dict:
+    meta = {"count": count, "source": list(source)}
+    scratch = os.path.join(path, f"meta.json.{os.getpid()}")
+    with open(scratch, "w", encoding="utf-8") as handle:
+        json.dump(meta, handle)
+    os.replace(scratch, os.path.join(path, "meta.json"))
+    return meta
+
+
+def _write_files(path: str, timestamps: np.ndarray, values: np.ndarray) -> None:
+    """Write the series into fresh files with room to grow and swap them in."""
+    os.makedirs(path, exist_ok=True)
+    capacity = max(MIN_CAPACITY, 1 << int(2 * max(len(timestamps), 1) - 1).bit_length())
+    suffix = f".{os.getpid()}"
+    stamps = np.lib.format.open_memmap(
+        os.path.join(path, "timestamps.npy" + suffix), mode="w+", dtype=np.int64, shape=(capacity,)
+    )
+    stamps[: len(timestamps)] = timestamps
+    columns = np.lib.format.open_memmap(
+        os.path.join(path, "values.npy" + suffix), mode="w+", dtype=np.float64, shape=(len(COLUMNS), capacity)
+    )
+    columns[:, : len(timestamps)] = values.T
+    stamps.flush()
+    columns.flush()
+    del stamps, columns
+    # Readers holding the old files keep their mappings; new readers see the new ones.
+    for name in ("timestamps.npy", "values.npy"):
+        os.replace(os.path.join(path, name + suffix), os.path.join(path, name))
+
+
+def _open_raw(path: str, mode: str = "r") -> Tuple[np.ndarray, np.ndarray]:
+    return (
+        np.load(os.path.join(path, "timestamps.npy"), mmap_mode=mode),
+        np.load(os.path.join(path, "values.npy"), mmap_mode=mode),
+    )
+
+
+def _open(path: str, count: int) -> BarArrays:
+    timestamps, values = _open_raw(path)
+    return BarArrays(timestamps[:count], values[:, :count].T)
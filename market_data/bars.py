@@ -0,0 +1,141 @@
+"""Single read path for stored bars.
+
+Every consumer (the backend endpoints, analytics, training and the derived-series
+jobs) reads bars through :func:`read_bars`, which merges the row table ``price_bars``
+with packed ``price_chunks`` sessions and the Parquet archive and hands back NumPy
+arrays. Storage changes then only need to teach this module where bars live.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .archive import read_archive
+from .chunks import COLUMNS, merge_bars, read_chunks
+from .schema import MARKET_TZ, interval_code
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd
+
+
+@dataclass
+class BarArrays:
+    """Bars of one series in ascending time order."""
+
+    timestamps: np.ndarray  # int64 epoch seconds
+    values: np.ndarray  # (n, 6) float64 in COLUMNS order, NaN for NULL
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def tail(self, count: int) -> "BarArrays":
+        return BarArrays(self.timestamps[-count:], self.values[-count:])
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, COLUMNS.index(name)]
+
+    def frame(self, columns: Sequence[str] = COLUMNS) -> "pd.DataFrame":
+        """DataFrame with an exchange-local ``timestamp`` column followed by ``columns``."""
+        import pandas as pd
+
+        data = {"timestamp": pd.to_datetime(self.timestamps, unit="s", utc=True).tz_convert(MARKET_TZ.key)}
+        for name in columns:
+            data[name] = self.column(name)
+        return pd.DataFrame(data)
+
+    def rows(self) -> List[Tuple]:
+        """``(timestamp, open, high, low, close, volume, oi)`` tuples with None for NULL."""
+        values = self.values.astype(object)
+        values[np.isnan(self.values)] = None
+        return [(timestamp, *row) for timestamp, row in zip(self.timestamps.tolist(), values.tolist())]
+
+
+def empty_bars() -> BarArrays:
+    return BarArrays(np.empty(0, dtype=np.int64), np.empty((0, len(COLUMNS)), dtype=np.float64))
+
+
+def _read_rows(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    code: int,
+    start: Optional[int],
+    end: Optional[int],
+    limit: Optional[int],
+) -> Tuple[np.ndarray, np.ndarray]:
+    query = (
+        "SELECT timestamp, open, high, low, close, volume, oi FROM price_bars "
+        "WHERE instrument_token = ? AND interval = ?"
+    )
+    params: list = [instrument_token, code]
+    if start is not None:
+        query += " AND timestamp >= ?"
+        params.append(start)
+    if end is not None:
+        query += " AND timestamp <= ?"
+        params.append(end)
+    if limit is not None:
+        query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+    else:
+        query += " ORDER BY timestamp"
+    rows = conn.execute(query, params).fetchall()
+    if not rows:
+        return empty_bars().timestamps, empty_bars().values
+    data = np.array([tuple(row) for row in rows], dtype=np.float64)
+    if limit is not None:
+        data = data[::-1]
+    return data[:, 0].astype(np.int64), data[:, 1:]
+
+
+def read_bars(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: Union[str, int],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    limit: Optional[int] = None,
+    include_archive: bool = True,
+) -> BarArrays:
+    """Bars of a series between epoch seconds ``start`` and ``end`` (both inclusive).
+
+    With ``limit`` only the latest ``limit`` bars of the range are returned, still in
+    ascending order. Tiers are merged oldest storage first (Parquet archive, packed
+    chunks, rows), so a newer tier's bar wins when a timestamp is stored twice.
+    """
+    code = interval if isinstance(interval, int) else interval_code(interval)
+    tiers = [read_archive, read_chunks] if include_archive else [read_chunks]
+    parts = []
+    if limit is None:
+        for tier in tiers:
+            parts.extend(tier(conn, instrument_token, code, start, end))
+    else:
+        # Decode newest first and only as far back as the limit needs.
+        wanted = limit
+        for tier in reversed(tiers):
+            for part in tier(conn, instrument_token, code, start, end, descending=True):
+                parts.append(part)
+                wanted -= len(part[0])
+                if wanted <= 0:
+                    break
+            if wanted <= 0:
+                break
+        parts.reverse()
+    parts.append(_read_rows(conn, instrument_token, code, start, end, limit))
+
+    if len(parts) == 1:
+        timestamps, values = parts[0]
+    else:
+        timestamps, values = merge_bars(parts)
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start is not None:
+            mask &= timestamps >= start
+        if end is not None:
+            mask &= timestamps <= end
+        timestamps, values = timestamps[mask], values[mask]
+    if limit is not None:
+        timestamps, values = timestamps[-limit:], values[-limit:]
+    return BarArrays(timestamps, values)
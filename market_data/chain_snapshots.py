@@ -0,0 +1,381 @@
+"""Whole option-chain snapshots, delta encoded against the previous snapshot.
+
+:class:`ChainSnapshotRecorder` quotes every contract of one underlying and expiry in
+batches of :data:`QUOTE_BATCH_SIZE` and stores the result in two tables:
+
+* ``option_chain_layouts`` fixes the contracts of a chain (ordered by strike, then
+  CE before PE) as packed arrays. A new layout is only written when the listed
+  contracts change, so a snapshot is nothing but a matrix of numbers.
+* ``option_chain_snapshots`` holds one row per snapshot: the
+  :data:`CHAIN_COLUMNS` matrix as integers (prices in paise, -1 where a quote was
+  missing) minus the previous snapshot's matrix, byte-shuffled and zlib compressed,
+  plus per-snapshot totals (call/put OI and their change, the underlying's price).
+  The first snapshot of a layout each session is a keyframe stored against zeros.
+
+Quiet strikes therefore cost a few bytes, and the stored ``oi`` deltas are the OI
+change per strike between consecutive snapshots. :func:`read_chain_history` decodes a
+day with one query, one decompression per snapshot and a cumulative sum.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .instruments import chain_expiries, option_chain
+from .schema import MARKET_TZ, day_start_epoch, to_epoch
+
+logger = logging.getLogger(__name__)
+
+CHAIN_COLUMNS = ("last_price", "bid", "ask", "volume", "oi")
+# The first three columns are prices, stored as integer paise.
+PRICE_COLUMNS = 3
+MISSING = -1
+# Instruments per quote request accepted by the Kite API.
+QUOTE_BATCH_SIZE = 500
+COMPRESSION_LEVEL = 6
+OPTION_TYPES = {"CE": "call", "PE": "put"}
+
+
+def to_ints(values: np.ndarray) -> np.ndarray:
+    """Integer form of a ``(len(CHAIN_COLUMNS), n)`` float matrix; NaN becomes MISSING."""
+    scaled = values.copy()
+    scaled[:PRICE_COLUMNS] *= 100
+    ints = np.rint(np.nan_to_num(scaled, nan=MISSING)).astype(np.int64)
+    ints[np.isnan(values)] = MISSING
+    return ints
+
+
+def from_ints(ints: np.ndarray) -> np.ndarray:
+    """Inverse of :func:`to_ints` over the last two axes."""
+    values = ints.astype(np.float64)
+    values[ints == MISSING] = np.nan
+    values[..., :PRICE_COLUMNS, :] /= 100
+    return values
+
+
+def pack_deltas(deltas: np.ndarray) -> bytes:
+    shuffled = np.ascontiguousarray(np.ascontiguousarray(deltas, dtype="<i8").view(np.uint8).reshape(-1, 8).T)
+    return zlib.compress(shuffled.tobytes(), COMPRESSION_LEVEL)
+
+
+def unpack_deltas(payload: bytes, contracts: int) -> np.ndarray:
+    shuffled = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(8, -1)
+    return np.ascontiguousarray(shuffled.T).view("<i8").reshape(len(CHAIN_COLUMNS), contracts)
+
+
+def quote_values(quotes: Dict[str, Dict[str, Any]], keys: Sequence[str]) -> np.ndarray:
+    """The :data:`CHAIN_COLUMNS` matrix for ``keys`` from a Kite ``quote`` response."""
+    values = np.full((len(CHAIN_COLUMNS), len(keys)), np.nan)
+    for position, key in enumerate(keys):
+        quote = quotes.get(key)
+        if not quote:
+            continue
+        depth = quote.get("depth") or {}
+        bids = depth.get("buy") or [{}]
+        asks = depth.get("sell") or [{}]
+        row = (
+            quote.get("last_price"),
+            bids[0].get("price") or None,
+            asks[0].get("price") or None,
+            quote.get("volume"),
+            quote.get("oi"),
+        )
+        values[:, position] = [np.nan if value is None else value for value in row]
+    return values
+
+
+@dataclass
+class ChainLayout:
+    layout_id: int
+    instrument_tokens: np.ndarray  # int64
+    strikes: np.ndarray  # float64
+    option_types: np.ndarray  # "CE" / "PE"
+
+    @classmethod
+    def from_row(cls, layout_id: int, tokens: bytes, strikes: bytes, types: bytes) -> "ChainLayout":
+        return cls(
+            layout_id,
+            np.frombuffer(tokens, dtype="<i8"),
+            np.frombuffer(strikes, dtype="<f8"),
+            np.array(types.decode("ascii").split(",")),
+        )
+
+
+def ensure_layout(conn: sqlite3.Connection, underlying: str, expiry: str, contracts: Sequence[Dict[str, Any]]) -> ChainLayout:
+    """The latest layout of the chain if it lists exactly ``contracts``, else a new one."""
+    tokens = np.array([int(item["instrument_token"]) for item in contracts], dtype="<i8")
+    row = conn.execute(
+        """
+        SELECT layout_id, instrument_tokens, strikes, option_types FROM option_chain_layouts
+        WHERE underlying = ? AND expiry = ?
+        ORDER BY layout_id DESC LIMIT 1
+        """,
+        (underlying, expiry),
+    ).fetchone()
+    if row is not None and np.frombuffer(row[1], dtype="<i8").tolist() == tokens.tolist():
+        return ChainLayout.from_row(*row)
+    strikes = np.array([float(item.get("strike") or 0) for item in contracts], dtype="<f8")
+    types = ",".join(str(item.get("instrument_type")) for item in contracts).encode("ascii")
+    cursor = conn.execute(
+        """
+        INSERT INTO option_chain_layouts (underlying, expiry, instrument_tokens, strikes, option_types, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (underlying, expiry, tokens.tobytes(), strikes.tobytes(), types, datetime.utcnow().isoformat()),
+    )
+    conn.commit()
+    return ChainLayout.from_row(cursor.lastrowid, tokens.tobytes(), strikes.tobytes(), types)
+
+
+def _decode_layout(
+    conn: sqlite3.Connection,
+    layout: ChainLayout,
+    start: int,
+    end: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Timestamps, keyframe flags, underlying prices, integer matrices and deltas of one
+    layout in ``[start, end)``.
+
+    ``start`` must be a session start so the range opens on a keyframe.
+    """
+    rows = conn.execute(
+        """
+        SELECT timestamp, keyframe, underlying_price, payload FROM option_chain_snapshots
+        WHERE layout_id = ? AND timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp
+        """,
+        (layout.layout_id, start, end),
+    ).fetchall()
+    contracts = len(layout.instrument_tokens)
+    if not rows:
+        empty = np.empty((0, len(CHAIN_COLUMNS), contracts), dtype=np.int64)
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool), np.empty(0), empty, empty
+    timestamps = np.array([row[0] for row in rows], dtype=np.int64)
+    keyframes = np.array([row[1] for row in rows], dtype=bool)
+    keyframes[0] = True
+    prices = np.array([np.nan if row[2] is None else row[2] for row in rows], dtype=np.float64)
+    deltas = np.stack([unpack_deltas(row[3], contracts) for row in rows])
+    ints = np.cumsum(deltas, axis=0)
+    # Restart the running sum at every keyframe.
+    keys = np.flatnonzero(keyframes)
+    base = np.zeros((len(keys),) + ints.shape[1:], dtype=np.int64)
+    base[1:] = ints[keys[1:] - 1]
+    ints -= base[np.cumsum(keyframes) - 1]
+    return timestamps, keyframes, prices, ints, deltas
+
+
+class ChainSnapshotRecorder:
+    """Snapshots one expiry of an underlying's option chain on demand.
+
+    ``acquire`` is called before every quote request so callers can share a rate limiter.
+    """
+
+    def __init__(
+        self,
+        kite,
+        conn: sqlite3.Connection,
+        underlying: str,
+        expiry: Optional[str] = None,
+        segment: str = "NFO-OPT",
+        spot_key: Optional[str] = None,
+        acquire: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.kite = kite
+        self.conn = conn
+        self.underlying = underlying
+        self.segment = segment
+        self.acquire = acquire
+        today = datetime.now(MARKET_TZ).date()
+        if expiry is None:
+            expiries = chain_expiries(conn, underlying, segment, today)
+            if not expiries:
+                raise ValueError(f"No unexpired {segment} contracts for {underlying} in the instruments table.")
+            expiry = expiries[0]
+        self.expiry = expiry
+        self.spot_key = spot_key or self._nearest_future_key(today)
+        self.layout: Optional[ChainLayout] = None
+        self.keys: List[str] = []
+        self._previous: Optional[np.ndarray] = None
+        self._previous_at: Optional[int] = None
+        self.refresh_contracts()
+
+    def _nearest_future_key(self, today: date) -> Optional[str]:
+        expiries = chain_expiries(self.conn, self.underlying, "NFO-FUT", today)
+        futures = option_chain(self.conn, self.underlying, expiries[0], "NFO-FUT") if expiries else []
+        if not futures:
+            return None
+        return f"{futures[0].get('exchange') or 'NFO'}:{futures[0]['tradingsymbol']}"
+
+    def refresh_contracts(self) -> None:
+        """Pick up contracts listed since the recorder started (a new layout if any changed)."""
+        contracts = [
+            item
+            for item in option_chain(self.conn, self.underlying, self.expiry, self.segment)
+            if item.get("instrument_type") in OPTION_TYPES
+        ]
+        if not contracts:
+            raise ValueError(f"No {self.underlying} options expiring {self.expiry} in the instruments table.")
+        layout = ensure_layout(self.conn, self.underlying, self.expiry, contracts)
+        if self.layout is None or layout.layout_id != self.layout.layout_id:
+            self.layout = layout
+            self.keys = [f"{item.get('exchange') or 'NFO'}:{item['tradingsymbol']}" for item in contracts]
+            self._previous = self._previous_at = None
+
+    def _quote(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        quotes: Dict[str, Dict[str, Any]] = {}
+        for offset in range(0, len(keys), QUOTE_BATCH_SIZE):
+            if self.acquire is not None:
+                self.acquire()
+            quotes.update(self.kite.quote(list(keys[offset : offset + QUOTE_BATCH_SIZE])))
+        return quotes
+
+    def _resume(self, day_start: int) -> None:
+        """Continue today's delta chain after a restart instead of writing a new keyframe."""
+        timestamps, _, _, ints, _ = _decode_layout(self.conn, self.layout, day_start, day_start + 86400)
+        if len(timestamps):
+            self._previous, self._previous_at = ints[-1], int(timestamps[-1])
+
+    def snapshot(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Quote the whole chain and store it; returns the snapshot's totals."""
+        now = now or datetime.now(MARKET_TZ)
+        timestamp = to_epoch(now)
+        day_start = day_start_epoch((now if now.tzinfo is None else now.astimezone(MARKET_TZ)).date())
+        if self._previous_at is None:
+            self._resume(day_start)
+        if self._previous_at is not None and self._previous_at >= timestamp:
+            raise ValueError(f"Snapshot at {timestamp} is not after the previous one at {self._previous_at}.")
+        keyframe = self._previous is None or self._previous_at < day_start
+
+        quotes = self._quote(self.keys + ([self.spot_key] if self.spot_key else []))
+        ints = to_ints(quote_values(quotes, self.keys))
+        deltas = ints if keyframe else ints - self._previous
+        oi_index = CHAIN_COLUMNS.index("oi")
+        oi = ints[oi_index]
+        totals: Dict[str, Any] = {"timestamp": timestamp, "keyframe": keyframe}
+        for option_type, side in OPTION_TYPES.items():
+            legs = (self.layout.option_types == option_type) & (oi != MISSING)
+            totals[f"{side}_oi"] = float(oi[legs].sum())
+            if keyframe:
+                totals[f"{side}_oi_change"] = None
+            else:
+                totals[f"{side}_oi_change"] = float(deltas[oi_index][legs & (self._previous[oi_index] != MISSING)].sum())
+        spot = quotes.get(self.spot_key, {}).get("last_price") if self.spot_key else None
+        totals["underlying_price"] = spot
+
+        self.conn.execute(
+            """
+            INSERT INTO option_chain_snapshots (
+                layout_id, timestamp, keyframe, underlying_price,
+                call_oi, put_oi, call_oi_change, put_oi_change, payload
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                self.layout.layout_id,
+                timestamp,
+                int(keyframe),
+                spot,
+                totals["call_oi"],
+                totals["put_oi"],
+                totals["call_oi_change"],
+                totals["put_oi_change"],
+                pack_deltas(deltas),
+            ),
+        )
+        self.conn.commit()
+        self._previous, self._previous_at = ints, timestamp
+        return totals
+
+
+@dataclass
+class ChainHistory:
+    """A day of snapshots of one chain; contracts are ordered by strike, then type."""
+
+    timestamps: np.ndarray  # (snapshots,) int64 epoch seconds
+    instrument_tokens: np.ndarray  # (contracts,)
+    strikes: np.ndarray
+    option_types: np.ndarray
+    values: np.ndarray  # (snapshots, len(CHAIN_COLUMNS), contracts) float64, NaN when missing
+    oi_change: np.ndarray  # (snapshots, contracts); NaN at keyframes and missing quotes
+    underlying_price: np.ndarray  # (snapshots,)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def column(self, name: str) -> np.ndarray:
+        """A ``(snapshots, contracts)`` matrix of one of :data:`CHAIN_COLUMNS`."""
+        return self.values[:, CHAIN_COLUMNS.index(name)]
+
+    def put_call_ratio(self) -> np.ndarray:
+        """Total put OI over total call OI per snapshot."""
+        oi = np.nan_to_num(self.column("oi"))
+        calls = oi[:, self.option_types == "CE"].sum(axis=1)
+        puts = oi[:, self.option_types == "PE"].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(calls > 0, puts / calls, np.nan)
+
+
+def read_chain_history(conn: sqlite3.Connection, underlying: str, expiry: str, day: date) -> ChainHistory:
+    """Every snapshot of ``underlying``/``expiry`` taken on ``day``."""
+    start = day_start_epoch(day)
+    end = day_start_epoch(day + timedelta(days=1))
+    layouts = [
+        ChainLayout.from_row(*row)
+        for row in conn.execute(
+            """
+            SELECT layout_id, instrument_tokens, strikes, option_types FROM option_chain_layouts l
+            WHERE underlying = ? AND expiry = ? AND EXISTS (
+                SELECT 1 FROM option_chain_snapshots s
+                WHERE s.layout_id = l.layout_id AND s.timestamp >= ? AND s.timestamp < ?
+            )
+            ORDER BY layout_id
+            """,
+            (underlying, str(expiry)[:10], start, end),
+        ).fetchall()
+    ]
+    if not layouts:
+        empty = np.empty(0)
+        return ChainHistory(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), empty, np.empty(0, dtype="<U2"),
+            np.empty((0, len(CHAIN_COLUMNS), 0)), np.empty((0, 0)), empty,
+        )
+    decoded = [(layout, *_decode_layout(conn, layout, start, end)) for layout in layouts]
+    if len(decoded) == 1:
+        layout, timestamps, keyframes, prices, ints, deltas = decoded[0]
+        tokens, strikes, types = layout.instrument_tokens, layout.strikes, layout.option_types
+        positions = [np.arange(len(tokens))]
+    else:
+        # The chain was relisted during the day: line every layout up on the union of contracts.
+        tokens, first = np.unique(np.concatenate([item[0].instrument_tokens for item in decoded]), return_index=True)
+        strikes = np.concatenate([item[0].strikes for item in decoded])[first]
+        types = np.concatenate([item[0].option_types for item in decoded])[first]
+        order = np.lexsort((types, strikes))
+        tokens, strikes, types = tokens[order], strikes[order], types[order]
+        lookup = {token: position for position, token in enumerate(tokens.tolist())}
+        positions = [np.array([lookup[token] for token in item[0].instrument_tokens.tolist()]) for item in decoded]
+        timestamps = np.concatenate([item[1] for item in decoded])
+        keyframes = np.concatenate([item[2] for item in decoded])
+        prices = np.concatenate([item[3] for item in decoded])
+        ints = np.full((len(timestamps), len(CHAIN_COLUMNS), len(tokens)), MISSING, dtype=np.int64)
+        deltas = np.zeros_like(ints)
+        offset = 0
+        for (_, stamps, _, _, layout_ints, layout_deltas), columns in zip(decoded, positions):
+            ints[offset : offset + len(stamps)][:, :, columns] = layout_ints
+            deltas[offset : offset + len(stamps)][:, :, columns] = layout_deltas
+            offset += len(stamps)
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, keyframes, prices = timestamps[order], keyframes[order], prices[order]
+        ints, deltas = ints[order], deltas[order]
+
+    oi_index = CHAIN_COLUMNS.index("oi")
+    oi = ints[:, oi_index]
+    previous = np.vstack([np.full((1, oi.shape[1]), MISSING), oi[:-1]])
+    oi_change = deltas[:, oi_index].astype(np.float64)
+    oi_change[(oi == MISSING) | (previous == MISSING) | keyframes[:, None]] = np.nan
+    return ChainHistory(timestamps, tokens, strikes, types, from_ints(ints), oi_change, prices)
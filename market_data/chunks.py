@@ -0,0 +1,182 @@
+"""Columnar compressed storage for completed sessions of intraday bars.
+
+One row of ``price_chunks`` holds a whole ``(instrument_token, interval, session)``:
+
+* ``timestamps`` - int32 deltas from ``first_timestamp`` (0 for the first bar), zlib
+  compressed. Minute bars are 60 s apart, so the deltas compress to a few bytes.
+* ``price_columns`` - the open/high/low/close/volume/oi columns as little-endian
+  float64 (NULL stored as NaN), byte-shuffled so the n-th byte of every value sits
+  together before zlib compression. Neighbouring prices share their high-order bytes,
+  which is what makes the shuffle pay off.
+
+Packing is optional: :func:`pack_series` moves completed sessions out of
+``price_bars`` and readers in :mod:`market_data.bars` merge both tables, with rows in
+``price_bars`` taking precedence over a chunk for the same timestamp. Re-downloaded
+bars therefore land in ``price_bars`` as usual and are folded into the chunk the next
+time the series is packed.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import zlib
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .coverage import refresh_coverage
+from .schema import MARKET_UTC_OFFSET_SECONDS, day_start_epoch, interval_code, table_exists
+from .shards import bars_table
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("open", "high", "low", "close", "volume", "oi")
+COMPRESSION_LEVEL = 6
+DAY_SECONDS = 86400
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def session_days(timestamps: np.ndarray) -> np.ndarray:
+    """Exchange-local session day (days since 1970-01-01) of each timestamp."""
+    return (timestamps + MARKET_UTC_OFFSET_SECONDS) // DAY_SECONDS
+
+
+def encode_chunk(timestamps: np.ndarray, values: np.ndarray) -> Tuple[bytes, bytes]:
+    """Compressed (timestamps, price_columns) blobs for one session's bars."""
+    deltas = (timestamps - timestamps[0]).astype("<i4")
+    columns = np.ascontiguousarray(values.T, dtype="<f8")
+    shuffled = np.ascontiguousarray(columns.view(np.uint8).reshape(-1, 8).T)
+    return (
+        zlib.compress(deltas.tobytes(), COMPRESSION_LEVEL),
+        zlib.compress(shuffled.tobytes(), COMPRESSION_LEVEL),
+    )
+
+
+def decode_chunk(first_timestamp: int, bar_count: int, timestamps: bytes, price_columns: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of :func:`encode_chunk`: int64 timestamps and an (n, 6) float64 array."""
+    stamps = np.frombuffer(zlib.decompress(timestamps), dtype="<i4").astype(np.int64) + first_timestamp
+    shuffled = np.frombuffer(zlib.decompress(price_columns), dtype=np.uint8).reshape(8, -1)
+    columns = np.ascontiguousarray(shuffled.T).view("<f8").reshape(len(COLUMNS), bar_count)
+    return stamps, columns.T
+
+
+def chunk_payload(
+    instrument_token: int,
+    code: int,
+    timestamps: np.ndarray,
+    values: np.ndarray,
+) -> Iterable[tuple]:
+    """``price_chunks`` rows for sorted bars, one per session."""
+    days = session_days(timestamps)
+    bounds = np.flatnonzero(np.r_[True, days[1:] != days[:-1], True])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        stamps = timestamps[start:end]
+        yield (
+            instrument_token,
+            code,
+            int(days[start]),
+            int(stamps[0]),
+            int(stamps[-1]),
+            int(end - start),
+            *encode_chunk(stamps, values[start:end]),
+        )
+
+
+def read_chunks(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    code: int,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    descending: bool = False,
+) -> Iterable[Tuple[np.ndarray, np.ndarray]]:
+    """Decoded chunks overlapping ``[start, end]`` in session order, decoded lazily."""
+    if not table_exists(conn, "price_chunks"):
+        return
+    cursor = conn.execute(
+        f"""
+        SELECT first_timestamp, bar_count, timestamps, price_columns
+        FROM price_chunks
+        WHERE instrument_token = ? AND interval = ? AND last_timestamp >= ? AND first_timestamp <= ?
+        ORDER BY session_day {'DESC' if descending else 'ASC'}
+        """,
+        (instrument_token, code, start if start is not None else -(2**62), end if end is not None else 2**62),
+    )
+    for first_timestamp, bar_count, timestamps, price_columns in cursor:
+        yield decode_chunk(first_timestamp, bar_count, timestamps, price_columns)
+
+
+def merge_bars(parts: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate bar arrays, keeping the last part's bar where timestamps repeat."""
+    timestamps = np.concatenate([part[0] for part in parts])
+    values = np.concatenate([part[1] for part in parts])
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, values = timestamps[order], values[order]
+    keep = np.r_[timestamps[1:] != timestamps[:-1], True]
+    return timestamps[keep], values[keep]
+
+
+def pack_series(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    before: Optional[date] = None,
+) -> int:
+    """Move completed sessions of a series from ``price_bars`` into ``price_chunks``.
+
+    Sessions before ``before`` are packed; by default everything except the latest
+    stored session, which may still be trading. Returns the number of bars moved.
+    """
+    if interval == "day":
+        raise ValueError("Daily bars are one row per session already; only intraday intervals are packed.")
+    code = interval_code(interval)
+    if before is None:
+        (last,) = conn.execute(
+            "SELECT MAX(timestamp) FROM price_bars WHERE instrument_token = ? AND interval = ?",
+            (instrument_token, code),
+        ).fetchone()
+        if last is None:
+            return 0
+        before = date.fromordinal(int(session_days(np.array([last]))[0]) + _EPOCH_ORDINAL)
+    cutoff = day_start_epoch(before)
+
+    rows = conn.execute(
+        """
+        SELECT timestamp, open, high, low, close, volume, oi
+        FROM price_bars
+        WHERE instrument_token = ? AND interval = ? AND timestamp < ?
+        ORDER BY timestamp
+        """,
+        (instrument_token, code, cutoff),
+    ).fetchall()
+    if not rows:
+        return 0
+    data = np.array(rows, dtype=np.float64)
+    timestamps, values = data[:, 0].astype(np.int64), data[:, 1:]
+
+    # Fold in sessions that were packed before and have since been re-downloaded.
+    parts = list(read_chunks(conn, instrument_token, code, int(timestamps[0]), int(timestamps[-1])))
+    touched = set(session_days(timestamps).tolist())
+    parts = [part for part in parts if int(session_days(part[0][:1])[0]) in touched]
+    if parts:
+        timestamps, values = merge_bars(parts + [(timestamps, values)])
+
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO price_chunks (
+            instrument_token, interval, session_day, first_timestamp, last_timestamp,
+            bar_count, timestamps, price_columns
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        chunk_payload(instrument_token, code, timestamps, values),
+    )
+    conn.execute(
+        f"DELETE FROM {bars_table(conn, code)} WHERE instrument_token = ? AND interval = ? AND timestamp < ?",
+        (instrument_token, code, cutoff),
+    )
+    refresh_coverage(conn, instrument_token, interval, rewritten=False)
+    conn.commit()
+    logger.info("Packed %s %s bars of %s into %s sessions", len(rows), interval, instrument_token, len(touched))
+    return len(rows)
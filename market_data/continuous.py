@@ -0,0 +1,283 @@
+"""Continuous futures series stitched from stored monthly contracts.
+
+Kite's ``continuous=True`` history is only available for daily candles, and plain
+contract history stops at each expiry. This module splices the monthly ``NFO-FUT``
+contracts already in ``price_bars`` into one series per underlying:
+
+* ``roll="expiry"`` holds each contract up to and including its expiry session;
+* ``roll="oi"`` moves to the next contract after the first session in which the next
+  contract closes with higher open interest (and at expiry at the latest).
+
+Earlier segments are back-adjusted at every roll so the spliced series has no
+artificial jumps: ``adjustment="ratio"`` scales prices by next/current close on the
+roll session, ``adjustment="difference"`` shifts them by next - current, and
+``"none"`` leaves raw prices. The most recent contract is never adjusted, so between
+rolls new bars are simply appended; a new roll rewrites the series.
+
+The result is stored in ``price_bars`` under a synthetic instrument (negative token,
+segment ``SYNTHETIC``) and is read like any other series.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .bars import read_bars
+from .coverage import mark_rewritten, refresh_coverage
+from .schema import MARKET_UTC_OFFSET_SECONDS, interval_code
+from .shards import bars_table
+
+logger = logging.getLogger(__name__)
+
+ROLL_RULES = ("expiry", "oi")
+ADJUSTMENTS = ("ratio", "difference", "none")
+SYNTHETIC_SEGMENT = "SYNTHETIC"
+
+DAY_SECONDS = 86400
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+Bars = Tuple[np.ndarray, np.ndarray]
+
+
+@dataclass
+class Segment:
+    """Bars of one contract held in the continuous series."""
+
+    instrument_token: int
+    timestamps: np.ndarray
+    values: np.ndarray
+    # Next/current price relation at the roll that ends this segment (None for the last one).
+    roll_ratio: Optional[float] = None
+    roll_difference: Optional[float] = None
+
+
+def synthetic_token(name: str, roll: str, adjustment: str) -> int:
+    """Stable negative token for a continuous series; Kite tokens are always positive."""
+    return -zlib.crc32(f"{name}:{roll}:{adjustment}".encode("utf-8"))
+
+
+def synthetic_symbol(name: str, roll: str, adjustment: str) -> str:
+    return f"{name}-CONT-{roll.upper()}-{adjustment.upper()}"
+
+
+def _session_days(timestamps: np.ndarray) -> np.ndarray:
+    return (timestamps + MARKET_UTC_OFFSET_SECONDS) // DAY_SECONDS
+
+
+def _day_number(value: str) -> int:
+    return date.fromisoformat(value[:10]).toordinal() - _EPOCH_ORDINAL
+
+
+def futures_contracts(conn: sqlite3.Connection, name: str) -> List[Tuple[int, int]]:
+    """(instrument_token, expiry day number) of the underlying's futures, oldest first."""
+    rows = conn.execute(
+        """
+        SELECT instrument_token, expiry FROM instruments
+        WHERE name = ? AND segment = 'NFO-FUT' AND expiry IS NOT NULL AND expiry != ''
+        ORDER BY expiry
+        """,
+        (name,),
+    ).fetchall()
+    return [(token, _day_number(expiry)) for token, expiry in rows]
+
+
+def load_bars(conn: sqlite3.Connection, instrument_token: int, code: int) -> Bars:
+    bars = read_bars(conn, instrument_token, code)
+    return bars.timestamps, bars.values
+
+
+def _last_per_day(timestamps: np.ndarray, column: np.ndarray) -> Dict[int, Tuple[int, float]]:
+    """Session day -> (timestamp, value) of the day's last bar."""
+    days = _session_days(timestamps)
+    last = np.flatnonzero(np.r_[days[1:] != days[:-1], True]) if len(days) else np.empty(0, dtype=np.int64)
+    return {int(days[i]): (int(timestamps[i]), float(column[i])) for i in last}
+
+
+def plan_segments(
+    contracts: Sequence[Tuple[int, int]],
+    bars: Dict[int, Bars],
+    roll: str,
+) -> List[Segment]:
+    """Split the contracts' bars into held segments and measure the gap at each roll."""
+    contracts = [(token, expiry) for token, expiry in contracts if len(bars[token][0])]
+    segments: List[Segment] = []
+    previous_roll_day = -1
+    for position, (token, expiry) in enumerate(contracts):
+        timestamps, values = bars[token]
+        days = _session_days(timestamps)
+        following = contracts[position + 1] if position + 1 < len(contracts) else None
+
+        roll_day = expiry if following else int(days[-1])
+        if following and roll == "oi":
+            current_oi = _last_per_day(timestamps, values[:, 5])
+            next_stamps, next_values = bars[following[0]]
+            next_oi = _last_per_day(next_stamps, next_values[:, 5])
+            for day in sorted(current_oi):
+                if previous_roll_day < day <= expiry and day in next_oi and next_oi[day][1] > current_oi[day][1]:
+                    roll_day = day
+                    break
+
+        held = (days > previous_roll_day) & (days <= roll_day)
+        segment = Segment(token, timestamps[held], values[held])
+        if following and held.any():
+            # Compare both contracts at the last bar the current one was held.
+            roll_stamp = int(segment.timestamps[-1])
+            next_stamps, next_values = bars[following[0]]
+            index = np.searchsorted(next_stamps, roll_stamp, side="right") - 1
+            if index >= 0 and _session_days(next_stamps[index : index + 1])[0] == _session_days(np.array([roll_stamp]))[0]:
+                current_close = float(segment.values[-1, 3])
+                next_close = float(next_values[index, 3])
+                segment.roll_ratio = next_close / current_close if current_close else 1.0
+                segment.roll_difference = next_close - current_close
+            else:
+                logger.warning(
+                    "No bar for contract %s on the roll session of %s; rolling without adjustment",
+                    following[0],
+                    token,
+                )
+        if held.any():
+            segments.append(segment)
+        previous_roll_day = max(previous_roll_day, roll_day)
+    return segments
+
+
+def stitch(segments: Sequence[Segment], adjustment: str) -> Bars:
+    """Concatenate segments, back-adjusting every earlier segment's prices."""
+    if not segments:
+        return np.empty(0, dtype=np.int64), np.empty((0, 6), dtype=np.float64)
+    lengths = np.array([len(segment.timestamps) for segment in segments])
+    timestamps = np.concatenate([segment.timestamps for segment in segments])
+    values = np.concatenate([segment.values for segment in segments]).copy()
+    if adjustment == "ratio":
+        ratios = np.array([segment.roll_ratio or 1.0 for segment in segments[:-1]])
+        # Each segment is scaled by the product of every later roll ratio.
+        factors = np.r_[np.cumprod(ratios[::-1])[::-1], 1.0]
+        values[:, :4] *= np.repeat(factors, lengths)[:, None]
+    elif adjustment == "difference":
+        differences = np.array([segment.roll_difference or 0.0 for segment in segments[:-1]])
+        offsets = np.r_[np.cumsum(differences[::-1])[::-1], 0.0]
+        values[:, :4] += np.repeat(offsets, lengths)[:, None]
+    return timestamps, values
+
+
+def _write(conn: sqlite3.Connection, instrument_token: int, code: int, bars: Bars) -> int:
+    timestamps, values = bars
+    if len(timestamps):
+        mark_rewritten(conn, instrument_token, code, int(timestamps[0]))
+    conn.executemany(
+        f"""
+        INSERT INTO {bars_table(conn, code)} (
+            instrument_token, interval, timestamp, open, high, low, close, volume, oi
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval, timestamp) DO UPDATE SET
+            open=excluded.open,
+            high=excluded.high,
+            low=excluded.low,
+            close=excluded.close,
+            volume=excluded.volume,
+            oi=excluded.oi
+        """,
+        (
+            (instrument_token, code, timestamp, *row)
+            for timestamp, row in zip(timestamps.tolist(), values.tolist())
+        ),
+    )
+    return len(timestamps)
+
+
+def build_continuous(
+    conn: sqlite3.Connection,
+    name: str,
+    interval: str = "day",
+    roll: str = "expiry",
+    adjustment: str = "ratio",
+) -> int:
+    """Create or update the continuous series for ``name`` and return its instrument token.
+
+    Only bars after the stored series' last bar are appended while the roll schedule
+    is unchanged; a new roll (or a change to an earlier contract) rewrites the series.
+    """
+    if roll not in ROLL_RULES:
+        raise ValueError(f"Unsupported roll rule '{roll}'. Expected one of: {', '.join(ROLL_RULES)}")
+    if adjustment not in ADJUSTMENTS:
+        raise ValueError(f"Unsupported adjustment '{adjustment}'. Expected one of: {', '.join(ADJUSTMENTS)}")
+    code = interval_code(interval)
+    token = synthetic_token(name, roll, adjustment)
+
+    contracts = futures_contracts(conn, name)
+    bars = {contract: load_bars(conn, contract, code) for contract, _ in contracts}
+    segments = plan_segments(contracts, bars, roll)
+    if not segments:
+        raise ValueError(f"No stored {interval} bars for {name} futures contracts.")
+    schedule = ",".join(
+        f"{segment.instrument_token}:{int(segment.timestamps[0])}" for segment in segments
+    )
+
+    state = conn.execute(
+        "SELECT schedule FROM continuous_series WHERE instrument_token = ? AND interval = ?",
+        (token, code),
+    ).fetchone()
+    last = conn.execute(
+        "SELECT MAX(timestamp) FROM price_bars WHERE instrument_token = ? AND interval = ?",
+        (token, code),
+    ).fetchone()[0]
+
+    conn.execute(
+        """
+        INSERT INTO instruments (instrument_token, tradingsymbol, name, segment, exchange, instrument_type, last_refreshed)
+        VALUES (?, ?, ?, ?, 'NFO', 'FUT', ?)
+        ON CONFLICT(instrument_token) DO UPDATE SET last_refreshed=excluded.last_refreshed
+        """,
+        (token, synthetic_symbol(name, roll, adjustment), name, SYNTHETIC_SEGMENT, datetime.utcnow().isoformat()),
+    )
+    if state and state[0] == schedule and last is not None:
+        # Same contracts and rolls: the latest segment is unadjusted, so new bars append as-is.
+        current = segments[-1]
+        fresh = current.timestamps >= last
+        written = _write(conn, token, code, (current.timestamps[fresh], current.values[fresh]))
+        action = "appended"
+    else:
+        conn.execute(f"DELETE FROM {bars_table(conn, code)} WHERE instrument_token = ? AND interval = ?", (token, code))
+        written = _write(conn, token, code, stitch(segments, adjustment))
+        action = "rebuilt"
+
+    conn.execute(
+        """
+        INSERT INTO continuous_series (instrument_token, interval, name, roll, adjustment, schedule, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval) DO UPDATE SET
+            schedule=excluded.schedule,
+            updated_at=excluded.updated_at
+        """,
+        (token, code, name, roll, adjustment, schedule, datetime.utcnow().isoformat()),
+    )
+    refresh_coverage(conn, token, interval, rewritten=False)
+    conn.commit()
+    logger.info(
+        "%s %s %s bars of %s from %s contracts",
+        action.capitalize(),
+        written,
+        interval,
+        synthetic_symbol(name, roll, adjustment),
+        len(segments),
+    )
+    return token
+
+
+def refresh_continuous(conn: sqlite3.Connection, names: Sequence[str], interval: str) -> List[int]:
+    """Update every registered continuous series of ``names`` at ``interval``."""
+    if not names:
+        return []
+    placeholders = ", ".join("?" for _ in names)
+    rows = conn.execute(
+        f"SELECT name, roll, adjustment FROM continuous_series WHERE interval = ? AND name IN ({placeholders})",
+        (interval_code(interval), *names),
+    ).fetchall()
+    return [build_continuous(conn, name, interval, roll, adjustment) for name, roll, adjustment in rows]
@@ -0,0 +1,164 @@
+"""Series coverage bookkeeping shared by the downloader and derived-bar jobs.
+
+Besides the high-water mark row in ``series_coverage``, every rewrite of stored bars
+bumps the row's ``generation`` and logs where it started in ``series_rewrites``, so
+caches built at an older generation can re-read just the rewritten tail
+(:func:`rewritten_since`) instead of the whole series.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+from typing import Optional, Union
+
+from .schema import interval_code
+from .shards import series_table
+
+# Rewrites logged per series; caches older than that rebuild.
+REWRITE_HISTORY = 64
+
+
+def refresh_coverage(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    rewritten: bool = True,
+) -> Optional[int]:
+    """Recompute the high-water mark row for a series across all storage tiers and return it.
+
+    The row's ``generation`` is bumped unless ``rewritten`` is False, which callers pass
+    when they marked their writes with :func:`mark_rewritten` or only moved bars
+    between tiers without changing them.
+    """
+    code = interval_code(interval)
+    if rewritten:
+        mark_rewritten(conn, instrument_token, code)
+    first, last, count = conn.execute(
+        """
+        SELECT MIN(first_timestamp), MAX(last_timestamp), COALESCE(SUM(bars), 0)
+        FROM (
+            SELECT MIN(timestamp) AS first_timestamp, MAX(timestamp) AS last_timestamp, COUNT(*) AS bars
+            FROM price_bars
+            WHERE instrument_token = ? AND interval = ?
+            UNION ALL
+            SELECT MIN(first_timestamp), MAX(last_timestamp), SUM(bar_count)
+            FROM price_chunks
+            WHERE instrument_token = ? AND interval = ?
+            UNION ALL
+            SELECT MIN(first_timestamp), MAX(last_timestamp), SUM(bar_count)
+            FROM archive_partitions
+            WHERE instrument_token = ? AND interval = ?
+        )
+        """,
+        (instrument_token, code, instrument_token, code, instrument_token, code),
+    ).fetchone()
+    conn.execute(
+        f"""
+        INSERT INTO {series_table(conn, "series_coverage", code)} (
+            instrument_token, interval, first_timestamp, last_timestamp, bar_count, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval) DO UPDATE SET
+            first_timestamp=excluded.first_timestamp,
+            last_timestamp=excluded.last_timestamp,
+            bar_count=excluded.bar_count,
+            updated_at=excluded.updated_at
+        """,
+        (instrument_token, code, first, last, count, datetime.utcnow().isoformat()),
+    )
+    return last
+
+
+def advance_coverage(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    first: int,
+    last: int,
+    new_bars: int,
+) -> None:
+    """Extend the high-water mark row with freshly appended bars without rescanning the series.
+
+    ``new_bars`` counts only bars after the previous high-water mark; rewritten bars are
+    already included in ``bar_count``. Bars before the high-water mark count as a rewrite
+    (see :func:`mark_rewritten`).
+    """
+    code = interval_code(interval)
+    mark_rewritten(conn, instrument_token, code, first)
+    conn.execute(
+        f"""
+        INSERT INTO {series_table(conn, "series_coverage", code)} (
+            instrument_token, interval, first_timestamp, last_timestamp, bar_count, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval) DO UPDATE SET
+            first_timestamp=MIN(COALESCE(first_timestamp, excluded.first_timestamp), excluded.first_timestamp),
+            last_timestamp=MAX(COALESCE(last_timestamp, excluded.last_timestamp), excluded.last_timestamp),
+            bar_count=bar_count + excluded.bar_count,
+            updated_at=excluded.updated_at
+        """,
+        (instrument_token, code, first, last, new_bars, datetime.utcnow().isoformat()),
+    )
+
+
+def mark_rewritten(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: Union[str, int],
+    since: Optional[int] = None,
+) -> None:
+    """Bump the series' ``generation`` when bars from ``since`` (None: all of them) may have changed.
+
+    Call it in the transaction that writes the bars. Writes that only touch the bar at
+    the high-water mark or later bars are appends and leave the generation alone:
+    caches built from the series (``market_data.bar_cache``, ``market_data.hot_cache``)
+    re-read their last bar anyway and extend from there. A rewrite is logged with its
+    first timestamp, and caches re-read from there (see :func:`rewritten_since`).
+    """
+    code = interval if isinstance(interval, int) else interval_code(interval)
+    series = (instrument_token, code)
+    coverage = series_table(conn, "series_coverage", code)
+    rewrites = series_table(conn, "series_rewrites", code)
+    bumped = conn.execute(
+        f"""
+        UPDATE {coverage} SET generation = generation + 1
+        WHERE instrument_token = ? AND interval = ? AND last_timestamp > COALESCE(?, last_timestamp - 1)
+        """,
+        (*series, since),
+    ).rowcount
+    if not bumped:
+        return
+    (generation,) = conn.execute(
+        f"SELECT generation FROM {coverage} WHERE instrument_token = ? AND interval = ?", series
+    ).fetchone()
+    conn.execute(
+        f"INSERT OR REPLACE INTO {rewrites} (instrument_token, interval, generation, rewritten_from) VALUES (?, ?, ?, ?)",
+        (*series, generation, since),
+    )
+    conn.execute(
+        f"DELETE FROM {rewrites} WHERE instrument_token = ? AND interval = ? AND generation <= ?",
+        (*series, generation - REWRITE_HISTORY),
+    )
+
+
+def rewritten_since(conn: sqlite3.Connection, instrument_token: int, code: int, generation: int) -> Optional[int]:
+    """Earliest timestamp rewritten after ``generation`` of a series.
+
+    None when that is unknown: a rewrite of every bar, or more rewrites since than are
+    logged. Callers then read the series again in full.
+    """
+    series = (instrument_token, code)
+    row = conn.execute(
+        "SELECT generation FROM series_coverage WHERE instrument_token = ? AND interval = ?", series
+    ).fetchone()
+    if row is None or row[0] <= generation:
+        return None
+    logged, bounded, since = conn.execute(
+        """
+        SELECT COUNT(*), COUNT(rewritten_from), MIN(rewritten_from) FROM series_rewrites
+        WHERE instrument_token = ? AND interval = ? AND generation > ?
+        """,
+        (*series, generation),
+    ).fetchone()
+    if logged != row[0] - generation or bounded != logged:
+        return None
+    return since
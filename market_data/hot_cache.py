@@ -0,0 +1,184 @@
+"""Process-wide ring buffers holding the latest bars of each series.
+
+Dashboard requests keep asking for the last few hundred bars of the same series while
+only the newest bar changes. :class:`HotBarCache` keeps the latest ``capacity`` bars
+of every ``(instrument_token, interval)`` it has been asked for in fixed-size NumPy
+ring buffers, filled on first use.
+
+A ring is validated against the series' ``series_coverage`` row (high-water mark, bar
+count, ``generation`` and ``updated_at``, which every writer touches), at most once
+per ``check_seconds``; requests in between are answered from memory alone. When the
+row changed, only the bars from the cached last bar onward are read again (that bar
+may have been partial), or from the start of the earliest rewrite since the cached
+``generation`` (see ``market_data.coverage.rewritten_since``) when that falls inside
+the ring. Any other change reloads the ring.
+
+Ranges the ring cannot answer (older than its first bar) fall through to
+:func:`market_data.bars.read_bars`.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from .bars import BarArrays, read_bars
+from .chunks import COLUMNS
+from .coverage import rewritten_since
+from .schema import interval_code
+
+DEFAULT_CAPACITY = 512
+DEFAULT_MAX_SERIES = 2048
+DEFAULT_CHECK_SECONDS = 1.0
+
+
+class BarRing:
+    """The latest ``capacity`` bars of one series in a circular buffer."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(COLUMNS)), np.nan)
+        self.size = 0
+        self._next = 0
+        self.source: Optional[Tuple] = None
+        self.checked = 0.0
+
+    def _positions(self, count: int) -> np.ndarray:
+        return (self._next - count + np.arange(count)) % self.capacity
+
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.timestamps[(self._next - 1) % self.capacity]) if self.size else None
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        timestamps, values = timestamps[-self.capacity :], values[-self.capacity :]
+        positions = (self._next + np.arange(len(timestamps))) % self.capacity
+        self.timestamps[positions] = timestamps
+        self.values[positions] = values
+        self._next = (self._next + len(timestamps)) % self.capacity
+        self.size = min(self.size + len(timestamps), self.capacity)
+
+    def truncate(self, count: int) -> None:
+        """Drop the newest ``count`` bars."""
+        self._next = (self._next - count) % self.capacity
+        self.size -= count
+
+    def reset(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        self.size = self._next = 0
+        self.extend(timestamps, values)
+
+    def bars(self) -> BarArrays:
+        """Copies of the cached bars in ascending order."""
+        positions = self._positions(self.size)
+        return BarArrays(self.timestamps[positions], self.values[positions])
+
+
+class HotBarCache:
+    """Ring buffers for up to ``max_series`` series, least recently used evicted first."""
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        max_series: int = DEFAULT_MAX_SERIES,
+        check_seconds: float = DEFAULT_CHECK_SECONDS,
+    ) -> None:
+        self.capacity = capacity
+        self.max_series = max_series
+        self.check_seconds = check_seconds
+        self.hits = 0
+        self.misses = 0
+        self._rings: "OrderedDict[Tuple[int, int], BarRing]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read_bars(
+        self,
+        conn: sqlite3.Connection,
+        instrument_token: int,
+        interval: Union[str, int],
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> BarArrays:
+        """Same contract as :func:`market_data.bars.read_bars`, served from memory when possible."""
+        code = interval if isinstance(interval, int) else interval_code(interval)
+        with self._lock:
+            ring = self._ring(conn, instrument_token, code)
+            cached = ring.bars() if ring is not None else None
+            complete = ring is not None and ring.source is not None and ring.size == ring.source[1]
+        if cached is not None:
+            timestamps = cached.timestamps
+            lo = 0 if start is None else int(np.searchsorted(timestamps, start, "left"))
+            hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, "right"))
+            # Bars before the ring's first one may exist unless the ring holds the whole series.
+            covered = complete or (start is not None and len(timestamps) and start >= timestamps[0])
+            if covered or (limit is not None and hi - lo >= limit):
+                self.hits += 1
+                if limit is not None:
+                    lo = max(lo, hi - limit)
+                return BarArrays(timestamps[lo:hi], cached.values[lo:hi])
+        self.misses += 1
+        return read_bars(conn, instrument_token, code, start, end, limit)
+
+    def tail(self, conn: sqlite3.Connection, instrument_token: int, interval: Union[str, int], count: int) -> BarArrays:
+        return self.read_bars(conn, instrument_token, interval, limit=count)
+
+    def _ring(self, conn: sqlite3.Connection, instrument_token: int, code: int) -> Optional[BarRing]:
+        key = (instrument_token, code)
+        ring = self._rings.get(key)
+        now = time.monotonic()
+        if ring is not None:
+            self._rings.move_to_end(key)
+            if now - ring.checked < self.check_seconds:
+                return ring
+        source = conn.execute(
+            """
+            SELECT last_timestamp, bar_count, generation, updated_at FROM series_coverage
+            WHERE instrument_token = ? AND interval = ?
+            """,
+            (instrument_token, code),
+        ).fetchone()
+        if source is None or not source[1]:
+            # Series without coverage bookkeeping cannot be validated cheaply.
+            self._rings.pop(key, None)
+            return None
+        source = tuple(source)
+        if ring is None:
+            ring = self._rings[key] = BarRing(self.capacity)
+            while len(self._rings) > self.max_series:
+                self._rings.popitem(last=False)
+        if ring.source != source:
+            self._refresh(conn, ring, instrument_token, code, source)
+        ring.checked = now
+        return ring
+
+    def _refresh(self, conn: sqlite3.Connection, ring: BarRing, instrument_token: int, code: int, source: Tuple) -> None:
+        start = ring.last_timestamp() if ring.source is not None else None
+        if start is not None and source[2] != ring.source[2]:
+            since = rewritten_since(conn, instrument_token, code, ring.source[2])
+            start = None if since is None else min(since, start)
+        cached = ring.bars().timestamps
+        complete = ring.source is not None and ring.size == ring.source[1]
+        if start is not None and (complete or start >= cached[0]):
+            kept = int(np.searchsorted(cached, start, "left"))
+            fresh = read_bars(conn, instrument_token, code, start=start)
+            if source[1] - ring.source[1] == len(fresh) - (ring.size - kept):
+                ring.truncate(ring.size - kept)
+                ring.extend(fresh.timestamps, fresh.values)
+                ring.source = source
+                return
+        bars = read_bars(conn, instrument_token, code, limit=self.capacity)
+        ring.reset(bars.timestamps, bars.values)
+        ring.source = source
+
+    def invalidate(self, instrument_token: Optional[int] = None) -> None:
+        with self._lock:
+            if instrument_token is None:
+                self._rings.clear()
+            else:
+                for key in [key for key in self._rings if key[0] == instrument_token]:
+                    del self._rings[key]
@@ -0,0 +1,200 @@
+"""Instrument rows, full-dump sync and indexed option-chain lookups."""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .schema import MARKET_TZ, table_exists
+
+logger = logging.getLogger(__name__)
+
+UPSERT_INSTRUMENT_SQL = """
+    INSERT INTO instruments (
+        instrument_token, exchange_token, tradingsymbol, name, segment, exchange,
+        instrument_type, strike, tick_size, lot_size, expiry, last_refreshed
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(instrument_token) DO UPDATE SET
+        exchange_token=excluded.exchange_token,
+        tradingsymbol=excluded.tradingsymbol,
+        name=excluded.name,
+        segment=excluded.segment,
+        exchange=excluded.exchange,
+        instrument_type=excluded.instrument_type,
+        strike=excluded.strike,
+        tick_size=excluded.tick_size,
+        lot_size=excluded.lot_size,
+        expiry=excluded.expiry,
+        last_refreshed=excluded.last_refreshed
+"""
+# Dump columns compared by sync_instruments, in UPSERT_INSTRUMENT_SQL order.
+SYNC_FIELDS = (
+    "exchange_token",
+    "tradingsymbol",
+    "name",
+    "segment",
+    "exchange",
+    "instrument_type",
+    "strike",
+    "tick_size",
+    "lot_size",
+    "expiry",
+)
+_NUMERIC_FIELDS = frozenset({"exchange_token", "strike", "tick_size", "lot_size"})
+
+
+def _expiry_text(value: Any) -> Optional[str]:
+    """ISO date for an expiry from the dump; blank expiries are stored as NULL."""
+    if not value:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()[:10]
+    return str(value)[:10]
+
+
+def upsert_instrument(conn: sqlite3.Connection, instrument: Dict[str, Any]) -> None:
+    conn.execute(
+        UPSERT_INSTRUMENT_SQL,
+        (
+            instrument["instrument_token"],
+            instrument.get("exchange_token"),
+            instrument.get("tradingsymbol"),
+            instrument.get("name"),
+            instrument.get("segment"),
+            instrument.get("exchange"),
+            instrument.get("instrument_type"),
+            instrument.get("strike"),
+            instrument.get("tick_size"),
+            instrument.get("lot_size"),
+            _expiry_text(instrument.get("expiry")),
+            datetime.utcnow().isoformat(),
+        ),
+    )
+
+
+def sync_instruments(conn: sqlite3.Connection, catalogue: Any, today: Optional[date] = None) -> Dict[str, int]:
+    """Bring ``instruments`` in line with a full instruments dump in one transaction.
+
+    ``catalogue`` is a ``scripts.instrument_catalogue.InstrumentCatalogue`` or anything
+    else with a ``column(field)`` method returning one array per dump column. The dump
+    and the stored rows are compared column by column with NumPy, and only new
+    instruments are inserted and changed ones rewritten. Instruments missing from the
+    dump are deleted once expired, unless bars are stored for them: continuous futures
+    and backtests still need expired contracts. Returns the counts of each action.
+    """
+    today = today or datetime.now(MARKET_TZ).date()
+    tokens, first = np.unique(np.asarray(catalogue.column("instrument_token"), dtype=np.int64), return_index=True)
+    dump: Dict[str, np.ndarray] = {}
+    for field in SYNC_FIELDS:
+        column = np.asarray(catalogue.column(field))[first]
+        dump[field] = column.astype(np.float64) if field in _NUMERIC_FIELDS else column.astype(object)
+
+    rows = conn.execute(
+        f"SELECT instrument_token, {', '.join(SYNC_FIELDS)} FROM instruments ORDER BY instrument_token"
+    ).fetchall()
+    stored_columns = list(zip(*rows)) or [()] * (len(SYNC_FIELDS) + 1)
+    stored: Dict[str, np.ndarray] = {}
+    for field, values in zip(("instrument_token", *SYNC_FIELDS), stored_columns):
+        if field in _NUMERIC_FIELDS:
+            stored[field] = np.array(values, dtype=np.float64)
+        elif field == "instrument_token":
+            stored[field] = np.array(values, dtype=np.int64)
+        else:
+            # NULL and blank are the same value in the dump.
+            column = np.array(values, dtype=object)
+            column[np.equal(column, None)] = ""
+            stored[field] = column
+    stored_tokens = stored["instrument_token"]
+    positions = np.searchsorted(stored_tokens, tokens).clip(max=max(len(stored_tokens) - 1, 0))
+    present = stored_tokens[positions] == tokens if len(stored_tokens) else np.zeros(len(tokens), dtype=bool)
+    matched = positions[present]
+
+    changed = np.zeros(len(matched), dtype=bool)
+    for field in SYNC_FIELDS:
+        old, new = stored[field][matched], dump[field][present]
+        if field in _NUMERIC_FIELDS:
+            changed |= ~((old == new) | (np.isnan(old) & np.isnan(new)))
+        else:
+            changed |= old != new
+    writes = np.r_[np.flatnonzero(~present), np.flatnonzero(present)[changed]]
+
+    missing = np.ones(len(stored_tokens), dtype=bool)
+    missing[matched] = False
+    expiries = stored["expiry"]
+    expired = missing & (expiries != "") & (expiries < today.isoformat())
+    kept = set()
+    if table_exists(conn, "series_coverage"):
+        kept = {row[0] for row in conn.execute("SELECT DISTINCT instrument_token FROM series_coverage WHERE bar_count > 0")}
+    deletes = [token for token in stored_tokens[expired].tolist() if token not in kept]
+
+    now = datetime.utcnow().isoformat()
+    columns = [tokens[writes].tolist()]
+    for field in SYNC_FIELDS:
+        values = dump[field][writes]
+        if field in ("exchange_token", "lot_size"):
+            columns.append(values.astype(np.int64).tolist())
+        elif field == "expiry":
+            columns.append([value or None for value in values.tolist()])
+        else:
+            columns.append(values.tolist())
+    conn.executemany(UPSERT_INSTRUMENT_SQL, [(*row, now) for row in zip(*columns)])
+    conn.executemany("DELETE FROM instruments WHERE instrument_token = ?", [(token,) for token in deletes])
+    conn.commit()
+    counts = {
+        "inserted": int((~present).sum()),
+        "updated": int(changed.sum()),
+        "deleted": len(deletes),
+        "unchanged": int(len(matched) - changed.sum()),
+        "kept_expired": int(expired.sum()) - len(deletes),
+    }
+    logger.info("Instruments sync: %s", counts)
+    return counts
+
+
+def chain_expiries(
+    conn: sqlite3.Connection,
+    name: str,
+    segment: str = "NFO-OPT",
+    on_or_after: Optional[date] = None,
+) -> List[str]:
+    """Distinct expiries listed for an underlying, in ascending order."""
+    rows = conn.execute(
+        """
+        SELECT DISTINCT expiry FROM instruments
+        WHERE name = ? AND segment = ? AND expiry >= ?
+        ORDER BY expiry
+        """,
+        (name, segment, (on_or_after or date.min).isoformat()),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def option_chain(
+    conn: sqlite3.Connection,
+    name: str,
+    expiry: Any,
+    segment: str = "NFO-OPT",
+    min_strike: Optional[float] = None,
+    max_strike: Optional[float] = None,
+    instrument_type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Contracts of one underlying and expiry ordered by strike, served by ``idx_instruments_chain``."""
+    query = "SELECT * FROM instruments WHERE name = ? AND segment = ? AND expiry = ?"
+    params: List[Any] = [name, segment, _expiry_text(expiry)]
+    if min_strike is not None:
+        query += " AND strike >= ?"
+        params.append(min_strike)
+    if max_strike is not None:
+        query += " AND strike <= ?"
+        params.append(max_strike)
+    if instrument_type:
+        query += " AND instrument_type = ?"
+        params.append(instrument_type)
+    query += " ORDER BY strike, instrument_type"
+    cursor = conn.execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
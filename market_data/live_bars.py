@@ -0,0 +1,273 @@
+"""Build minute bars from live ticks and write them to ``price_bars`` as they close.
+
+The historical API only serves a minute bar some time after it closes and every poll
+costs rate budget. :class:`MinuteBarAggregator` folds streaming ticks (the
+``TICK_DTYPE`` records of :mod:`market_data.ticks`) into open minute bars in memory,
+keyed by ``(instrument_token, minute)``, and a background thread writes every bar
+whose minute ended ``grace_seconds`` ago in one transaction per minute, advancing
+``series_coverage`` and ``ingest_lag`` alongside. Readers therefore see a completed
+minute a few hundred milliseconds after the boundary.
+
+* Ticks are bucketed by their own timestamp, so a tick that arrives after the
+  boundary but inside the grace window still lands in the right bar. Ticks for a
+  minute that has already been written are counted in ``late_ticks`` and dropped.
+* ``volume`` in a tick is the cumulative day volume; a bar's volume is the increase
+  over the previous bar of the same session. The first bar a process sees for a
+  session only counts the increase within that minute.
+* ``oi`` is the last reported open interest in the minute (NULL in ``ltp`` mode).
+
+Bars are written with the same upsert as downloaded ones, so the REST poller can
+still overwrite them with the exchange's own bars later.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .coverage import advance_coverage
+from .quality import last_close_before, record_chunk_quality, validate_chunk
+from .schema import MARKET_UTC_OFFSET_SECONDS, interval_code
+from .shards import attach_shards, bars_table, series_table
+from .ticks import kite_ticks_to_records
+
+logger = logging.getLogger(__name__)
+
+MINUTE_NANOS = 60 * 10**9
+DEFAULT_GRACE_SECONDS = 0.3
+
+_MINUTE = interval_code("minute")
+
+# Keys of the candle dicts ``validate_chunk`` takes, in ``price_bars`` column order.
+_CANDLE_FIELDS = ("date", "open", "high", "low", "close", "volume", "oi")
+
+# Fields of an open bar.
+_FIRST, _LAST, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME_MIN, _VOLUME_MAX, _OI = range(9)
+
+
+def _session_day(minute: int) -> int:
+    return (minute + MARKET_UTC_OFFSET_SECONDS) // 86400
+
+
+class MinuteBarAggregator:
+    """Aggregates ticks into minute bars and writes closed bars to ``db_path``."""
+
+    def __init__(
+        self,
+        db_path: str,
+        grace_seconds: float = DEFAULT_GRACE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.db_path = db_path
+        self.grace_seconds = grace_seconds
+        self.clock = clock
+        self.bars_written = 0
+        self.late_ticks = 0
+        self._bars: Dict[Tuple[int, int], List[float]] = {}
+        # Last written minute per token, and the session's cumulative volume at its close.
+        self._written: Dict[int, int] = {}
+        self._volume_base: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="minute-bars", daemon=True)
+        self._thread.start()
+
+    def extend(self, records: np.ndarray) -> None:
+        """Fold an array of ``TICK_DTYPE`` records into the open bars."""
+        records = records[~np.isnan(records["last_price"])]
+        if not len(records):
+            return
+        minutes = records["timestamp"] // MINUTE_NANOS * 60
+        order = np.lexsort((records["timestamp"], minutes, records["instrument_token"]))
+        ticks, minutes = records[order], minutes[order]
+        tokens = ticks["instrument_token"]
+        starts = np.flatnonzero(np.r_[True, (tokens[1:] != tokens[:-1]) | (minutes[1:] != minutes[:-1])])
+        ends = np.r_[starts[1:], len(ticks)] - 1
+        prices, volumes, oi = ticks["last_price"], ticks["volume"], ticks["oi"]
+        highs = np.maximum.reduceat(prices, starts)
+        lows = np.minimum.reduceat(prices, starts)
+        volume_min = np.fmin.reduceat(volumes, starts)
+        volume_max = np.fmax.reduceat(volumes, starts)
+        # Position of the last tick reporting OI in each group (-1 when none did).
+        last_oi = np.maximum.reduceat(np.where(np.isnan(oi), -1, np.arange(len(ticks))), starts)
+        groups = zip(
+            tokens[starts].tolist(),
+            minutes[starts].tolist(),
+            ticks["timestamp"][starts].tolist(),
+            ticks["timestamp"][ends].tolist(),
+            prices[starts].tolist(),
+            highs.tolist(),
+            lows.tolist(),
+            prices[ends].tolist(),
+            volume_min.tolist(),
+            volume_max.tolist(),
+            np.where(last_oi >= 0, oi[np.maximum(last_oi, 0)], np.nan).tolist(),
+            (ends - starts + 1).tolist(),
+        )
+        with self._lock:
+            for token, minute, first, last, open_, high, low, close, vmin, vmax, open_interest, count in groups:
+                if minute <= self._written.get(token, -1):
+                    self.late_ticks += count
+                    continue
+                bar = self._bars.get((token, minute))
+                if bar is None:
+                    self._bars[(token, minute)] = [first, last, open_, high, low, close, vmin, vmax, open_interest]
+                    continue
+                if first < bar[_FIRST]:
+                    bar[_FIRST], bar[_OPEN] = first, open_
+                if last >= bar[_LAST]:
+                    if not math.isnan(open_interest):
+                        bar[_OI] = open_interest
+                    bar[_LAST], bar[_CLOSE] = last, close
+                elif math.isnan(bar[_OI]):
+                    bar[_OI] = open_interest
+                bar[_HIGH] = max(bar[_HIGH], high)
+                bar[_LOW] = min(bar[_LOW], low)
+                bar[_VOLUME_MIN] = np.fmin(bar[_VOLUME_MIN], vmin)
+                bar[_VOLUME_MAX] = np.fmax(bar[_VOLUME_MAX], vmax)
+
+    def append_kite_ticks(self, ticks) -> None:
+        """``KiteTicker.on_ticks`` compatible entry point."""
+        self.extend(kite_ticks_to_records(ticks))
+
+    def close_bars(self, now: Optional[float] = None, everything: bool = False) -> List[tuple]:
+        """Remove and return ``price_bars`` rows for every bar whose minute is over.
+
+        A minute is over ``grace_seconds`` after its end; ``everything`` also takes the
+        bars still open.
+        """
+        now = self.clock() if now is None else now
+        horizon = math.inf if everything else now - 60 - self.grace_seconds
+        rows = []
+        with self._lock:
+            due = sorted(key for key in self._bars if key[1] <= horizon)
+            for token, minute in due:
+                bar = self._bars.pop((token, minute))
+                day = _session_day(minute)
+                base_day, base = self._volume_base.get(token, (None, math.nan))
+                start_volume = base if base_day == day and not math.isnan(base) else bar[_VOLUME_MIN]
+                volume = bar[_VOLUME_MAX] - start_volume
+                if not math.isnan(bar[_VOLUME_MAX]):
+                    self._volume_base[token] = (day, bar[_VOLUME_MAX])
+                self._written[token] = max(minute, self._written.get(token, -1))
+                rows.append(
+                    (
+                        token,
+                        _MINUTE,
+                        minute,
+                        bar[_OPEN],
+                        bar[_HIGH],
+                        bar[_LOW],
+                        bar[_CLOSE],
+                        None if math.isnan(volume) else max(volume, 0.0),
+                        None if math.isnan(bar[_OI]) else bar[_OI],
+                    )
+                )
+        return rows
+
+    def write_bars(self, conn: sqlite3.Connection, rows: List[tuple], now: Optional[float] = None) -> int:
+        """Validate and upsert closed bars and their bookkeeping in one transaction.
+
+        Bars go through the same checks as downloaded chunks: quarantined bars are not
+        written and flagged ones are recorded in ``price_bar_flags``. Returns the number
+        of bars written.
+        """
+        if not rows:
+            return 0
+        now = self.clock() if now is None else now
+        marks = dict(
+            conn.execute(
+                "SELECT instrument_token, last_timestamp FROM series_coverage WHERE interval = ?",
+                (_MINUTE,),
+            ).fetchall()
+        )
+        series: Dict[int, List[tuple]] = {}
+        latest: Dict[int, int] = {}
+        for row in rows:
+            series.setdefault(row[0], []).append(row)
+            latest[row[0]] = max(row[2], latest.get(row[0], row[2]))
+        table = bars_table(conn, _MINUTE)
+        written = 0
+        for token, token_rows in series.items():
+            candles = [dict(zip(_CANDLE_FIELDS, row[2:])) for row in token_rows]
+            chunk = validate_chunk(candles, last_close_before(conn, token, _MINUTE, min(row[2] for row in token_rows)))
+            bar_rows = list(chunk.bar_rows(token, _MINUTE))
+            conn.executemany(
+                f"""
+                INSERT INTO {table} (
+                    instrument_token, interval, timestamp, open, high, low, close, volume, oi
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(instrument_token, interval, timestamp) DO UPDATE SET
+                    open=excluded.open,
+                    high=excluded.high,
+                    low=excluded.low,
+                    close=excluded.close,
+                    volume=excluded.volume,
+                    oi=excluded.oi
+                """,
+                bar_rows,
+            )
+            record_chunk_quality(conn, token, _MINUTE, chunk)
+            if not bar_rows:
+                continue
+            minutes = [row[2] for row in bar_rows]
+            mark = marks.get(token)
+            fresh = sum(1 for minute in minutes if mark is None or minute > mark)
+            advance_coverage(conn, token, "minute", minutes[0], minutes[-1], fresh)
+            written += len(bar_rows)
+        conn.executemany(
+            f"""
+            INSERT INTO {series_table(conn, "ingest_lag", _MINUTE)} (instrument_token, interval, last_bar_timestamp, polled_at, lag_seconds, error)
+            VALUES (?, ?, ?, ?, ?, NULL)
+            ON CONFLICT(instrument_token, interval) DO UPDATE SET
+                last_bar_timestamp=MAX(COALESCE(last_bar_timestamp, 0), excluded.last_bar_timestamp),
+                polled_at=excluded.polled_at,
+                lag_seconds=excluded.lag_seconds,
+                error=NULL
+            """,
+            [
+                (token, _MINUTE, last, int(now), max(now - (last + 60), 0.0))
+                for token, last in latest.items()
+            ],
+        )
+        conn.commit()
+        self.bars_written += written
+        return written
+
+    def _next_due(self, now: float) -> float:
+        """Wall-clock time at which the current minute's bars are written."""
+        return ((now - self.grace_seconds) // 60 + 1) * 60 + self.grace_seconds
+
+    def _run(self) -> None:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        attach_shards(conn)
+        unwritten: List[tuple] = []
+        try:
+            while not self._stop.wait(max(self._next_due(self.clock()) - self.clock(), 0.0)):
+                unwritten += self.close_bars()
+                try:
+                    started = time.monotonic()
+                    written = self.write_bars(conn, unwritten)
+                    unwritten = []
+                    if written:
+                        logger.debug("Wrote %s minute bars in %.1f ms", written, (time.monotonic() - started) * 1000)
+                except Exception:
+                    # Kept for the next minute's transaction; the thread must outlive any
+                    # one bad batch or extend() keeps buffering bars nobody writes.
+                    conn.rollback()
+                    logger.exception("Failed to write %s live minute bars", len(unwritten))
+            # Bars still open at shutdown are partial; the REST poller re-requests them.
+            self.write_bars(conn, unwritten + self.close_bars(everything=True))
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        """Write every remaining bar and stop the writer thread."""
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,235 @@
+"""Housekeeping for the market database: checkpoints, vacuum, retention and stats.
+
+In WAL mode readers never wait for writers, but two things still hurt them over time:
+a WAL that only ever grows (every read has to consult it) and free pages scattered
+through the file after deletes. :func:`run_maintenance` runs one pass sized to the
+time of day:
+
+* during market hours only a ``PASSIVE`` checkpoint, which copies what it can without
+  waiting on anyone, and a bounded ``incremental_vacuum`` step;
+* outside them, retention deletes (one short transaction per series), a ``TRUNCATE``
+  checkpoint that resets the WAL file, and an incremental vacuum of every free page.
+
+Incremental vacuum only returns pages when the database has ``auto_vacuum=INCREMENTAL``;
+new databases are created that way and :func:`enable_incremental_vacuum` converts old
+ones with a one-off full ``VACUUM``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import date, datetime, time as dt_time
+from typing import Any, Dict, List, Mapping, Optional
+
+from .coverage import refresh_coverage
+from .schema import MARKET_TZ, INTERVAL_NAMES, day_start_epoch, interval_code, table_exists
+from .shards import attached_shards, bars_table, series_table, shard_schema
+
+logger = logging.getLogger(__name__)
+
+# Window (exchange time, weekdays) in which maintenance must stay out of the way of
+# the live poller and the dashboard: the session plus the pre-open.
+MAINTENANCE_QUIET_START = dt_time(9, 0)
+MAINTENANCE_QUIET_END = dt_time(15, 30)
+# Pages freed per incremental vacuum step during market hours (4 MB at 4 KB pages).
+MARKET_HOURS_VACUUM_PAGES = 1024
+# The WAL file is truncated back to this size after checkpoints.
+JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+def in_market_hours(now: Optional[datetime] = None) -> bool:
+    now = now or datetime.now(MARKET_TZ).replace(tzinfo=None)
+    return now.weekday() < 5 and MAINTENANCE_QUIET_START <= now.time() <= MAINTENANCE_QUIET_END
+
+
+def checkpoint(conn: sqlite3.Connection, mode: str = "PASSIVE") -> Dict[str, int]:
+    """Run a WAL checkpoint; ``busy`` is 1 when readers or writers kept it from finishing."""
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unsupported checkpoint mode '{mode}'. Expected one of: {', '.join(CHECKPOINT_MODES)}")
+    busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return {"busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+
+
+def incremental_vacuum(conn: sqlite3.Connection, max_pages: Optional[int] = None, schema: str = "main") -> int:
+    """Return up to ``max_pages`` free pages (all when None) of ``schema`` to the file system."""
+    before = conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+    if not before or conn.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+        return 0
+    pages = f"({int(max_pages)})" if max_pages else ""
+    # execute() stops after the first step, which frees a single page.
+    conn.commit()
+    conn.executescript(f"PRAGMA {schema}.incremental_vacuum{pages};")
+    return before - conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+
+
+def _schemas(conn: sqlite3.Connection) -> List[str]:
+    """The main database and its attached price_bars shards."""
+    return ["main", *(shard_schema(family) for family in attached_shards(conn))]
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """Switch an existing database to ``auto_vacuum=INCREMENTAL``; rewrites the whole file."""
+    conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def apply_retention(conn: sqlite3.Connection, interval: str, months: int, today: Optional[date] = None) -> int:
+    """Delete bars of ``interval`` older than ``months`` calendar months from SQLite.
+
+    Parquet partitions written by ``market_data.archive`` are left alone, so archive a
+    series first to keep its history. The ``series_sessions`` rows of the deleted
+    sessions are kept (they are tiny): without them ``--incremental`` runs with a longer
+    lookback would download the deleted months again. Returns the number of bars deleted.
+    """
+    code = interval_code(interval)
+    today = today or datetime.now(MARKET_TZ).date()
+    month_index = today.year * 12 + today.month - 1 - months
+    cutoff_day = date(month_index // 12, month_index % 12 + 1, 1)
+    cutoff = day_start_epoch(cutoff_day)
+
+    tokens = [
+        row[0]
+        for row in conn.execute(
+            "SELECT instrument_token FROM series_coverage WHERE interval = ? AND first_timestamp < ?",
+            (code, cutoff),
+        ).fetchall()
+    ]
+    deleted = 0
+    for token in tokens:
+        series = (token, code, cutoff)
+        deleted += conn.execute(
+            f"DELETE FROM {bars_table(conn, code)} WHERE instrument_token = ? AND interval = ? AND timestamp < ?", series
+        ).rowcount
+        for (bars,) in conn.execute(
+            "SELECT bar_count FROM price_chunks WHERE instrument_token = ? AND interval = ? AND last_timestamp < ?",
+            series,
+        ).fetchall():
+            deleted += bars
+        conn.execute(
+            "DELETE FROM price_chunks WHERE instrument_token = ? AND interval = ? AND last_timestamp < ?", series
+        )
+        for table in ("price_bars_quarantine", "price_bar_flags", "price_bar_duplicates"):
+            conn.execute(f"DELETE FROM {series_table(conn, table, code)} WHERE instrument_token = ? AND interval = ? AND timestamp < ?", series)
+        refresh_coverage(conn, token, interval)
+        # One transaction per series keeps each write lock short.
+        conn.commit()
+    if deleted:
+        logger.info("Retention removed %s %s bars before %s", deleted, interval, cutoff_day)
+    return deleted
+
+
+def record_run(conn: sqlite3.Connection, task: str, details: Mapping[str, Any]) -> None:
+    conn.execute(
+        """
+        INSERT INTO maintenance_runs (task, ran_at, details) VALUES (?, ?, ?)
+        ON CONFLICT(task) DO UPDATE SET ran_at=excluded.ran_at, details=excluded.details
+        """,
+        (task, datetime.utcnow().isoformat(), json.dumps(details)),
+    )
+    conn.commit()
+
+
+def run_maintenance(
+    conn: sqlite3.Connection,
+    retention: Optional[Mapping[str, int]] = None,
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """One maintenance pass appropriate for ``now`` (exchange time); returns what it did."""
+    now = now or datetime.now(MARKET_TZ).replace(tzinfo=None)
+    report: Dict[str, Any] = {"market_hours": in_market_hours(now)}
+    if report["market_hours"]:
+        report["checkpoint"] = checkpoint(conn, "PASSIVE")
+        report["vacuumed_pages"] = sum(
+            incremental_vacuum(conn, MARKET_HOURS_VACUUM_PAGES, schema) for schema in _schemas(conn)
+        )
+    else:
+        report["retention"] = {
+            interval: apply_retention(conn, interval, months, now.date()) for interval, months in (retention or {}).items()
+        }
+        report["vacuumed_pages"] = sum(incremental_vacuum(conn, schema=schema) for schema in _schemas(conn))
+        report["checkpoint"] = checkpoint(conn, "TRUNCATE")
+    record_run(conn, "maintenance", report)
+    logger.info("Maintenance pass: %s", report)
+    return report
+
+
+def database_stats(conn: sqlite3.Connection, detailed: bool = False) -> Dict[str, Any]:
+    """Size and fragmentation figures for the main database and any attached shards.
+
+    ``detailed`` adds per-table sizes from the ``dbstat`` virtual table, which reads
+    every page and is therefore meant for occasional use.
+    """
+    path = next((row[2] for row in conn.execute("PRAGMA database_list").fetchall() if row[1] == "main"), "")
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    wal_path = f"{path}-wal"
+    stats: Dict[str, Any] = {
+        "path": path,
+        "file_bytes": os.path.getsize(path) if path and os.path.exists(path) else page_size * page_count,
+        "wal_bytes": os.path.getsize(wal_path) if path and os.path.exists(wal_path) else 0,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_pages": freelist,
+        "free_pct": round(100.0 * freelist / page_count, 2) if page_count else 0.0,
+        "auto_vacuum": AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0], "unknown"),
+        "journal_mode": conn.execute("PRAGMA journal_mode").fetchone()[0],
+        "bars_by_interval": {},
+        "shards": {},
+        "tables": [],
+        "last_runs": {},
+    }
+    for family in attached_shards(conn):
+        schema = shard_schema(family)
+        shard = next(row[2] for row in conn.execute("PRAGMA database_list").fetchall() if row[1] == schema)
+        stats["shards"][family] = {
+            "path": shard,
+            "file_bytes": os.path.getsize(shard) if os.path.exists(shard) else 0,
+            "page_count": conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0],
+            "freelist_pages": conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0],
+        }
+    if table_exists(conn, "series_coverage"):
+        stats["bars_by_interval"] = {
+            INTERVAL_NAMES.get(code, str(code)): bars
+            for code, bars in conn.execute(
+                "SELECT interval, SUM(bar_count) FROM series_coverage GROUP BY interval ORDER BY interval"
+            ).fetchall()
+        }
+    if table_exists(conn, "maintenance_runs"):
+        stats["last_runs"] = {
+            task: {"ran_at": ran_at, **json.loads(details or "{}")}
+            for task, ran_at, details in conn.execute("SELECT task, ran_at, details FROM maintenance_runs").fetchall()
+        }
+    if detailed:
+        tables: List[Dict[str, Any]] = []
+        try:
+            rows = conn.execute(
+                """
+                SELECT name, SUM(pgsize), SUM(unused), COUNT(*)
+                FROM dbstat
+                GROUP BY name
+                ORDER BY SUM(pgsize) DESC
+                """
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB.
+            rows = []
+        for name, size, unused, pages in rows:
+            tables.append(
+                {
+                    "name": name,
+                    "bytes": size,
+                    "pages": pages,
+                    "unused_pct": round(100.0 * unused / size, 2) if size else 0.0,
+                }
+            )
+        stats["tables"] = tables
+    return stats
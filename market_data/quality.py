@@ -0,0 +1,366 @@
+"""Ingest-time data-quality checks for downloaded price bars.
+
+Every chunk is validated as a whole with array operations before it is written:
+
+* duplicate timestamps (typically at chunk boundaries) are collapsed, keeping the last,
+  and the dropped copies counted in ``price_bar_duplicates``;
+* bars with missing or non-positive prices, or inconsistent OHLC, are moved to
+  ``price_bars_quarantine`` instead of ``price_bars``;
+* close-to-close spikes and runs of zero-volume bars are written but flagged in
+  ``price_bar_flags`` so consumers can exclude them.
+
+``refresh_quality`` then summarises a series into ``series_quality`` (gap and spike
+counts, session coverage) for the backend to serve. Bar and gap counts are kept per
+session in ``session_quality``; validated writes mark the series dirty from their
+first bar, and a refresh only re-reads the sessions from there on.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .bars import read_bars
+from .chunks import DAY_SECONDS, session_days
+from .schema import MARKET_UTC_OFFSET_SECONDS, interval_code, to_epoch
+from .shards import series_table
+
+FLAG_MISSING_PRICE = 1
+FLAG_BAD_OHLC = 2
+FLAG_SPIKE = 4
+FLAG_ZERO_VOLUME = 8
+QUARANTINE_FLAGS = FLAG_MISSING_PRICE | FLAG_BAD_OHLC
+
+FLAG_NAMES = {
+    FLAG_MISSING_PRICE: "missing_price",
+    FLAG_BAD_OHLC: "bad_ohlc",
+    FLAG_SPIKE: "spike",
+    FLAG_ZERO_VOLUME: "zero_volume",
+}
+
+# A close-to-close move is a spike when it exceeds both this fraction and
+# SPIKE_MADS robust standard deviations of the chunk's returns.
+SPIKE_MIN_RETURN = 0.05
+SPIKE_MADS = 12.0
+# Zero-volume bars are only flagged in runs of at least this length, and only for
+# series that trade volume at all (index bars always report zero).
+ZERO_VOLUME_RUN = 5
+# Tolerance for OHLC comparisons on float prices.
+PRICE_EPSILON = 1e-9
+
+_COLUMNS = ("open", "high", "low", "close", "volume", "oi")
+
+
+@dataclass
+class ValidatedChunk:
+    """Arrays for one chunk after validation, sorted by timestamp and de-duplicated."""
+
+    timestamps: np.ndarray
+    values: np.ndarray
+    flags: np.ndarray
+    # Timestamp of every dropped copy (repeated when a bar came more than twice).
+    duplicate_timestamps: np.ndarray
+
+    @property
+    def duplicates(self) -> int:
+        return len(self.duplicate_timestamps)
+
+    @property
+    def accepted(self) -> np.ndarray:
+        return (self.flags & QUARANTINE_FLAGS) == 0
+
+    def bar_rows(self, instrument_token: int, code: int) -> Iterator[tuple]:
+        """``price_bars`` rows for the accepted bars (NaN is stored as NULL)."""
+        keep = self.accepted
+        for timestamp, row in zip(self.timestamps[keep].tolist(), self.values[keep].tolist()):
+            yield (instrument_token, code, timestamp, *row)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {name: int(np.count_nonzero(self.flags & flag)) for flag, name in FLAG_NAMES.items()}
+        counts["duplicate"] = self.duplicates
+        return counts
+
+
+def bar_arrays(rows: Iterable[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert Kite candle dicts to epoch timestamps and a float matrix of OHLCV+OI."""
+    rows = list(rows)
+    timestamps = np.fromiter((to_epoch(row["date"]) for row in rows), dtype=np.int64, count=len(rows))
+    values = np.array(
+        [[row.get(column) for column in _COLUMNS] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(_COLUMNS))
+    return timestamps, values
+
+
+def _runs_at_least(mask: np.ndarray, length: int) -> np.ndarray:
+    """Positions belonging to runs of ``True`` of at least ``length`` elements."""
+    edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    hits = np.zeros(len(mask), dtype=bool)
+    for start, end in zip(starts[ends - starts >= length], ends[ends - starts >= length]):
+        hits[start:end] = True
+    return hits
+
+
+def validate_chunk(rows: Iterable[Dict[str, Any]], previous_close: Optional[float] = None) -> ValidatedChunk:
+    """Validate one downloaded chunk.
+
+    ``previous_close`` is the last stored close before the chunk, so a spike on the
+    first bar of a chunk is still caught.
+    """
+    timestamps, values = bar_arrays(rows)
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, values = timestamps[order], values[order]
+
+    # Keep the last of each run of equal timestamps.
+    last_of_run = np.r_[timestamps[1:] != timestamps[:-1], True] if len(timestamps) else np.ones(0, dtype=bool)
+    duplicates = timestamps[~last_of_run]
+    timestamps, values = timestamps[last_of_run], values[last_of_run]
+
+    flags = np.zeros(len(timestamps), dtype=np.int64)
+    if not len(timestamps):
+        return ValidatedChunk(timestamps, values, flags, duplicates)
+
+    opens, highs, lows, closes, volumes = (values[:, i] for i in range(5))
+    prices = values[:, :4]
+    with np.errstate(invalid="ignore"):
+        missing = np.isnan(prices).any(axis=1) | (prices <= 0).any(axis=1)
+        bad_ohlc = (
+            (highs + PRICE_EPSILON < np.maximum(opens, closes))
+            | (lows - PRICE_EPSILON > np.minimum(opens, closes))
+            | (lows > highs)
+        )
+    flags[missing] |= FLAG_MISSING_PRICE
+    flags[bad_ohlc & ~missing] |= FLAG_BAD_OHLC
+
+    good = flags == 0
+    good_closes = closes[good]
+    if len(good_closes):
+        reference = np.r_[previous_close if previous_close else np.nan, good_closes[:-1]]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.log(good_closes / reference)
+        finite = returns[np.isfinite(returns)]
+        if len(finite):
+            median = np.median(finite)
+            mad = 1.4826 * np.median(np.abs(finite - median))
+            threshold = max(SPIKE_MIN_RETURN, SPIKE_MADS * mad)
+            with np.errstate(invalid="ignore"):
+                spikes = np.abs(returns - median) > threshold
+            flags[np.flatnonzero(good)[spikes]] |= FLAG_SPIKE
+
+    if np.nanmax(volumes, initial=0.0) > 0:
+        flags[_runs_at_least(volumes == 0, ZERO_VOLUME_RUN)] |= FLAG_ZERO_VOLUME
+
+    return ValidatedChunk(timestamps, values, flags, duplicates)
+
+
+def last_close_before(conn: sqlite3.Connection, instrument_token: int, code: int, timestamp: int) -> Optional[float]:
+    bars = read_bars(conn, instrument_token, code, end=timestamp - 1, limit=1)
+    return float(bars.column("close")[0]) if len(bars) else None
+
+
+def record_chunk_quality(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    code: int,
+    chunk: ValidatedChunk,
+) -> None:
+    """Replace the quarantine, flag and duplicate rows covering ``chunk`` and mark the
+    series' quality summary dirty from the chunk's first bar.
+
+    Rows are replaced rather than added to, so downloading a range again leaves the
+    counts as they were.
+    """
+    if not len(chunk.timestamps):
+        return
+    bounds = (instrument_token, code, int(chunk.timestamps[0]), int(chunk.timestamps[-1]))
+    conn.execute(
+        f"""
+        INSERT INTO {series_table(conn, "series_quality", code)} (instrument_token, interval, dirty_from) VALUES (?, ?, ?)
+        ON CONFLICT(instrument_token, interval) DO UPDATE SET
+            dirty_from = MIN(COALESCE(dirty_from, excluded.dirty_from), excluded.dirty_from)
+        """,
+        bounds[:3],
+    )
+    for table in ("price_bars_quarantine", "price_bar_flags", "price_bar_duplicates"):
+        conn.execute(
+            f"DELETE FROM {series_table(conn, table, code)} WHERE instrument_token = ? AND interval = ? AND timestamp BETWEEN ? AND ?",
+            bounds,
+        )
+    quarantined = ~chunk.accepted
+    if quarantined.any():
+        detected_at = datetime.utcnow().isoformat()
+        conn.executemany(
+            f"""
+            INSERT INTO {series_table(conn, "price_bars_quarantine", code)} (
+                instrument_token, interval, timestamp, open, high, low, close, volume, oi, flags, detected_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (instrument_token, code, timestamp, *row, flag, detected_at)
+                for timestamp, row, flag in zip(
+                    chunk.timestamps[quarantined].tolist(),
+                    chunk.values[quarantined].tolist(),
+                    chunk.flags[quarantined].tolist(),
+                )
+            ),
+        )
+    flagged = chunk.accepted & (chunk.flags != 0)
+    if flagged.any():
+        conn.executemany(
+            f"INSERT INTO {series_table(conn, 'price_bar_flags', code)} (instrument_token, interval, timestamp, flags) VALUES (?, ?, ?, ?)",
+            (
+                (instrument_token, code, timestamp, flag)
+                for timestamp, flag in zip(chunk.timestamps[flagged].tolist(), chunk.flags[flagged].tolist())
+            ),
+        )
+    if chunk.duplicates:
+        timestamps, copies = np.unique(chunk.duplicate_timestamps, return_counts=True)
+        conn.executemany(
+            f"INSERT INTO {series_table(conn, 'price_bar_duplicates', code)} (instrument_token, interval, timestamp, copies) VALUES (?, ?, ?, ?)",
+            ((instrument_token, code, timestamp, count) for timestamp, count in zip(timestamps.tolist(), copies.tolist())),
+        )
+
+
+def _expected_sessions(conn: sqlite3.Connection, instrument_token: int, code: int, first: date, last: date) -> int:
+    weekdays = int(np.busday_count(first, last + timedelta(days=1)))
+    (holidays,) = conn.execute(
+        """
+        SELECT COUNT(*) FROM series_sessions
+        WHERE instrument_token = ? AND interval = ? AND bar_count = 0 AND session_date BETWEEN ? AND ?
+        """,
+        (instrument_token, code, first.isoformat(), last.isoformat()),
+    ).fetchone()
+    return max(weekdays - holidays, 0)
+
+
+def _session_date(session_day: int) -> date:
+    return date(1970, 1, 1) + timedelta(days=int(session_day))
+
+
+def refresh_session_quality(conn: sqlite3.Connection, instrument_token: int, code: int, since: Optional[int] = None) -> None:
+    """Recount bars and in-session gaps from the session of ``since`` onward (None: every session)."""
+    start_day = int(session_days(np.array([since]))[0]) if since is not None else None
+    start = start_day * DAY_SECONDS - MARKET_UTC_OFFSET_SECONDS if start_day is not None else None
+    timestamps = read_bars(conn, instrument_token, code, start=start).timestamps
+    conn.execute(
+        f"DELETE FROM {series_table(conn, 'session_quality', code)} "
+        "WHERE instrument_token = ? AND interval = ? AND session_day >= COALESCE(?, session_day)",
+        (instrument_token, code, start_day),
+    )
+    if not len(timestamps):
+        return
+    days = session_days(timestamps)
+    sessions, bars = np.unique(days, return_counts=True)
+    gaps = np.zeros(len(sessions), dtype=np.int64)
+    if code != interval_code("day"):
+        # Missing bars inside a session; the overnight step is not a gap.
+        width = code * 60
+        steps = np.diff(timestamps)
+        missing = (steps > width) & (days[1:] == days[:-1])
+        np.add.at(gaps, np.searchsorted(sessions, days[1:][missing]), steps[missing] // width - 1)
+    conn.executemany(
+        f"""
+        INSERT INTO {series_table(conn, "session_quality", code)} (instrument_token, interval, session_day, bar_count, gap_bars)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (
+            (instrument_token, code, day, count, gap)
+            for day, count, gap in zip(sessions.tolist(), bars.tolist(), gaps.tolist())
+        ),
+    )
+
+
+def refresh_quality(conn: sqlite3.Connection, instrument_token: int, interval: str) -> None:
+    """Recompute the ``series_quality`` summary for one series.
+
+    Only sessions from the series' ``dirty_from`` mark onward are read again; a series
+    without session counts yet is read in full once.
+    """
+    code = interval_code(interval)
+    series = (instrument_token, code)
+    row = conn.execute(
+        "SELECT dirty_from FROM series_quality WHERE instrument_token = ? AND interval = ?", series
+    ).fetchone()
+    counted = conn.execute(
+        "SELECT 1 FROM session_quality WHERE instrument_token = ? AND interval = ? LIMIT 1", series
+    ).fetchone()
+    if counted is None:
+        refresh_session_quality(conn, instrument_token, code)
+    elif row is not None and row[0] is not None:
+        refresh_session_quality(conn, instrument_token, code, since=row[0])
+    # Sessions whose bars retention has deleted.
+    (first,) = conn.execute(
+        "SELECT first_timestamp FROM series_coverage WHERE instrument_token = ? AND interval = ?", series
+    ).fetchone() or (None,)
+    if first is not None:
+        conn.execute(
+            f"DELETE FROM {series_table(conn, 'session_quality', code)} WHERE instrument_token = ? AND interval = ? AND session_day < ?",
+            (*series, int(session_days(np.array([first]))[0])),
+        )
+
+    bars, sessions, gaps, first_day, last_day = conn.execute(
+        """
+        SELECT COALESCE(SUM(bar_count), 0), COUNT(*), COALESCE(SUM(gap_bars), 0), MIN(session_day), MAX(session_day)
+        FROM session_quality
+        WHERE instrument_token = ? AND interval = ?
+        """,
+        series,
+    ).fetchone()
+    expected = 0
+    if sessions:
+        expected = _expected_sessions(conn, instrument_token, code, _session_date(first_day), _session_date(last_day))
+    flag_counts = dict.fromkeys((FLAG_SPIKE, FLAG_ZERO_VOLUME), 0)
+    for flag in flag_counts:
+        (flag_counts[flag],) = conn.execute(
+            "SELECT COUNT(*) FROM price_bar_flags WHERE instrument_token = ? AND interval = ? AND flags & ?",
+            (instrument_token, code, flag),
+        ).fetchone()
+    (quarantined,) = conn.execute(
+        "SELECT COUNT(*) FROM price_bars_quarantine WHERE instrument_token = ? AND interval = ?",
+        (instrument_token, code),
+    ).fetchone()
+    (duplicates,) = conn.execute(
+        "SELECT COALESCE(SUM(copies), 0) FROM price_bar_duplicates WHERE instrument_token = ? AND interval = ?",
+        (instrument_token, code),
+    ).fetchone()
+    coverage = round(100.0 * sessions / expected, 2) if expected else None
+    conn.execute(
+        f"""
+        INSERT INTO {series_table(conn, "series_quality", code)} (
+            instrument_token, interval, bar_count, sessions, expected_sessions, coverage_pct,
+            gap_bars, spikes, zero_volume, quarantined, duplicates, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval) DO UPDATE SET
+            bar_count=excluded.bar_count,
+            sessions=excluded.sessions,
+            expected_sessions=excluded.expected_sessions,
+            coverage_pct=excluded.coverage_pct,
+            gap_bars=excluded.gap_bars,
+            spikes=excluded.spikes,
+            zero_volume=excluded.zero_volume,
+            quarantined=excluded.quarantined,
+            duplicates=excluded.duplicates,
+            updated_at=excluded.updated_at,
+            dirty_from=NULL
+        """,
+        (
+            instrument_token,
+            code,
+            bars,
+            sessions,
+            expected,
+            coverage,
+            gaps,
+            flag_counts[FLAG_SPIKE],
+            flag_counts[FLAG_ZERO_VOLUME],
+            quarantined,
+            duplicates,
+            datetime.utcnow().isoformat(),
+        ),
+    )
@@ -0,0 +1,232 @@
+"""Derive higher-interval bars from stored minute bars.
+
+Kite builds every intraday interval from the same minute data, so downloading
+``minute`` once and rolling it up locally replaces one historical request stream per
+interval. Intraday buckets are anchored at the 09:15 session open like Kite's own bars
+(a ``60minute`` series has bars at 09:15, 10:15, ..., 15:15) and daily bars are
+stamped at midnight IST. Derived bars are written to ``price_bars`` under their own
+interval code, so readers cannot tell them apart from downloaded ones.
+
+Rollups are incremental: a session is rebuilt when the minute coverage map has it and
+the derived series does not, and the latest derived session is always rebuilt because
+its minute bars may still be arriving.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .bars import read_bars
+from .coverage import mark_rewritten, refresh_coverage
+from .schema import (
+    MARKET_UTC_OFFSET_SECONDS,
+    SESSION_DATE_SQL,
+    day_start_epoch,
+    from_epoch,
+    interval_code,
+)
+from .shards import bars_table, series_table
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_INTERVALS = ("3minute", "5minute", "10minute", "15minute", "30minute", "60minute", "day")
+
+DAY_SECONDS = 86400
+SESSION_OPEN_SECONDS = 9 * 3600 + 15 * 60
+# Sessions loaded per pass; bounds memory to roughly 250 * 375 minute bars.
+SESSIONS_PER_BATCH = 250
+
+_MINUTE = interval_code("minute")
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def bucket_starts(timestamps: np.ndarray, interval: str) -> np.ndarray:
+    """Epoch second at which the ``interval`` bar containing each timestamp opens."""
+    local = timestamps + MARKET_UTC_OFFSET_SECONDS
+    day_start = local - local % DAY_SECONDS
+    if interval == "day":
+        return day_start - MARKET_UTC_OFFSET_SECONDS
+    width = interval_code(interval) * 60
+    offset = local - day_start - SESSION_OPEN_SECONDS
+    return day_start + SESSION_OPEN_SECONDS + offset // width * width - MARKET_UTC_OFFSET_SECONDS
+
+
+def aggregate_bars(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    interval: str,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Roll sorted minute bars up to ``interval``.
+
+    ``values`` holds open, high, low, close, volume and oi columns (NaN for NULL).
+    Returns the bucket timestamps and the aggregated rows in the same column order.
+    """
+    if not len(timestamps):
+        return timestamps, values
+    buckets = bucket_starts(timestamps, interval)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    out = np.empty((len(starts), values.shape[1]), dtype=np.float64)
+    out[:, 0] = values[starts, 0]
+    out[:, 1] = np.fmax.reduceat(values[:, 1], starts)
+    out[:, 2] = np.fmin.reduceat(values[:, 2], starts)
+    out[:, 3] = values[ends, 3]
+    out[:, 4] = np.add.reduceat(np.nan_to_num(values[:, 4]), starts)
+    out[:, 5] = values[ends, 5]
+    return buckets[starts], out
+
+
+def pending_sessions(conn: sqlite3.Connection, instrument_token: int, interval: str) -> List[str]:
+    """Session dates whose ``interval`` bars need (re)building from minute bars."""
+    code = interval_code(interval)
+    pending = {
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT m.session_date
+            FROM series_sessions m
+            WHERE m.instrument_token = ? AND m.interval = ? AND NOT EXISTS (
+                SELECT 1 FROM series_sessions d
+                WHERE d.instrument_token = m.instrument_token
+                  AND d.interval = ?
+                  AND d.session_date = m.session_date
+            )
+            """,
+            (instrument_token, _MINUTE, code),
+        )
+    }
+    row = conn.execute(
+        "SELECT last_timestamp FROM series_coverage WHERE instrument_token = ? AND interval = ?",
+        (instrument_token, code),
+    ).fetchone()
+    tail_start = day_start_epoch(from_epoch(row[0]).date()) if row and row[0] is not None else 0
+    pending.update(
+        day
+        for (day,) in conn.execute(
+            f"""
+            SELECT DISTINCT {SESSION_DATE_SQL}
+            FROM price_bars
+            WHERE instrument_token = ? AND interval = ? AND timestamp >= ?
+            """,
+            (instrument_token, _MINUTE, tail_start),
+        )
+    )
+    return sorted(pending)
+
+
+def _load_minute_bars(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    sessions: Sequence[str],
+) -> Tuple[np.ndarray, np.ndarray]:
+    first = date.fromisoformat(sessions[0])
+    last = date.fromisoformat(sessions[-1])
+    bars = read_bars(
+        conn,
+        instrument_token,
+        _MINUTE,
+        day_start_epoch(first),
+        day_start_epoch(last + timedelta(days=1)) - 1,
+    )
+    timestamps = bars.timestamps
+    wanted = np.array([date.fromisoformat(day).toordinal() - _EPOCH_ORDINAL for day in sessions])
+    mask = np.isin((timestamps + MARKET_UTC_OFFSET_SECONDS) // DAY_SECONDS, wanted)
+    return timestamps[mask], bars.values[mask]
+
+
+def _write_bars(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    code: int,
+    timestamps: np.ndarray,
+    values: np.ndarray,
+) -> None:
+    if len(timestamps):
+        mark_rewritten(conn, instrument_token, code, int(timestamps[0]))
+    conn.executemany(
+        f"""
+        INSERT INTO {bars_table(conn, code)} (
+            instrument_token, interval, timestamp, open, high, low, close, volume, oi
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval, timestamp) DO UPDATE SET
+            open=excluded.open,
+            high=excluded.high,
+            low=excluded.low,
+            close=excluded.close,
+            volume=excluded.volume,
+            oi=excluded.oi
+        """,
+        (
+            (instrument_token, code, timestamp, *row)
+            for timestamp, row in zip(timestamps.tolist(), values.tolist())
+        ),
+    )
+
+
+def rollup_series(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    intervals: Sequence[str] = ROLLUP_INTERVALS,
+) -> Dict[str, int]:
+    """Bring the derived ``intervals`` of one instrument up to date with its minute bars.
+
+    Returns the number of bars written per interval. Sessions that are complete in the
+    minute coverage map (including holidays with no bars) are recorded in the derived
+    series' map as well, so incremental downloads of those intervals skip them.
+    """
+    sessions = sorted({day for interval in intervals for day in pending_sessions(conn, instrument_token, interval)})
+    written = {interval: 0 for interval in intervals}
+    for offset in range(0, len(sessions), SESSIONS_PER_BATCH):
+        batch = sessions[offset : offset + SESSIONS_PER_BATCH]
+        timestamps, values = _load_minute_bars(conn, instrument_token, batch)
+        complete = dict(
+            conn.execute(
+                """
+                SELECT session_date, bar_count
+                FROM series_sessions
+                WHERE instrument_token = ? AND interval = ? AND session_date BETWEEN ? AND ?
+                """,
+                (instrument_token, _MINUTE, batch[0], batch[-1]),
+            ).fetchall()
+        )
+        for interval in intervals:
+            code = interval_code(interval)
+            bar_times, bars = aggregate_bars(timestamps, values, interval)
+            _write_bars(conn, instrument_token, code, bar_times, bars)
+            written[interval] += len(bar_times)
+            days, counts = np.unique((bar_times + MARKET_UTC_OFFSET_SECONDS) // DAY_SECONDS, return_counts=True)
+            per_session = {
+                date.fromordinal(int(day) + _EPOCH_ORDINAL).isoformat(): int(count)
+                for day, count in zip(days, counts)
+            }
+            conn.executemany(
+                f"""
+                INSERT INTO {series_table(conn, "series_sessions", code)} (instrument_token, interval, session_date, bar_count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(instrument_token, interval, session_date) DO UPDATE SET
+                    bar_count=excluded.bar_count
+                """,
+                [
+                    (instrument_token, code, day, per_session.get(day, 0))
+                    for day in batch
+                    if day in complete
+                ],
+            )
+        conn.commit()
+
+    for interval in intervals:
+        refresh_coverage(conn, instrument_token, interval, rewritten=False)
+    conn.commit()
+    if sessions:
+        logger.info(
+            "Rolled up %s minute sessions for %s: %s",
+            len(sessions),
+            instrument_token,
+            ", ".join(f"{interval}={count}" for interval, count in written.items()),
+        )
+    return written
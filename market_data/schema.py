@@ -0,0 +1,449 @@
+"""Schema and value encoding for the SQLite market database.
+
+Schema version 2 stores ``price_bars`` timestamps as epoch seconds (UTC) and the
+interval as a small integer code (its length in minutes) in a ``WITHOUT ROWID``
+table clustered on ``(instrument_token, interval, timestamp)``. Range queries
+therefore compare integers and rows of one series sit next to each other on disk.
+Version 3 adds the option fields of the instruments dump (``exchange_token``,
+``strike``, ``instrument_type``, ``tick_size``) and an index for option-chain lookups.
+Version 4 adds ``series_coverage.generation``, bumped whenever stored bars of a series
+are rewritten, with ``series_rewrites`` logging where each rewrite started, so caches
+can tell appends from rewrites and re-read only the rewritten tail, and the per-session
+``session_quality`` and per-bar ``price_bar_duplicates`` counts behind ``series_quality``.
+
+Databases created before version 2 are converted by ``scripts/migrate_price_bars.py``;
+the version 3 and 4 changes are additive and applied by :func:`create_tables`.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from datetime import date, datetime, time as dt_time
+from typing import Dict, Union
+from zoneinfo import ZoneInfo
+
+SCHEMA_VERSION = 4
+# First version with the integer price_bars layout.
+PRICE_BARS_VERSION = 2
+
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+# IST has no daylight saving, so session dates can be derived in SQL with a fixed offset.
+MARKET_UTC_OFFSET_SECONDS = 19800
+SESSION_DATE_SQL = f"date(timestamp + {MARKET_UTC_OFFSET_SECONDS}, 'unixepoch')"
+
+INTERVAL_CODES: Dict[str, int] = {
+    "minute": 1,
+    "3minute": 3,
+    "5minute": 5,
+    "10minute": 10,
+    "15minute": 15,
+    "30minute": 30,
+    "60minute": 60,
+    "day": 1440,
+}
+INTERVAL_NAMES: Dict[int, str] = {code: name for name, code in INTERVAL_CODES.items()}
+
+# Per-series bookkeeping kept next to the series' bars (see create_series_tables).
+SERIES_TABLES = (
+    "series_coverage",
+    "series_rewrites",
+    "series_sessions",
+    "price_bars_quarantine",
+    "price_bar_flags",
+    "price_bar_duplicates",
+    "series_quality",
+    "session_quality",
+    "ingest_lag",
+)
+
+# Columns added to ``instruments`` after its first release, with their SQL types.
+INSTRUMENT_OPTION_COLUMNS: Dict[str, str] = {
+    "exchange_token": "INTEGER",
+    "strike": "REAL",
+    "instrument_type": "TEXT",
+    "tick_size": "REAL",
+}
+
+
+class SchemaVersionError(RuntimeError):
+    """Raised when a database needs migrating before it can be used."""
+
+
+def interval_code(interval: str) -> int:
+    try:
+        return INTERVAL_CODES[interval.lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported interval '{interval}'. Expected one of: {', '.join(INTERVAL_CODES)}"
+        ) from None
+
+
+def interval_name(code: int) -> str:
+    return INTERVAL_NAMES[int(code)]
+
+
+def to_epoch(value: Union[datetime, date, str, int, float]) -> int:
+    """Epoch seconds for a bar timestamp; naive values are taken as exchange-local time."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, dt_time.min)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=MARKET_TZ)
+    return int(value.timestamp())
+
+
+def from_epoch(value: int) -> datetime:
+    """Exchange-local aware datetime for stored epoch seconds."""
+    return datetime.fromtimestamp(int(value), tz=MARKET_TZ)
+
+
+def day_start_epoch(day: date) -> int:
+    return to_epoch(datetime.combine(day, dt_time.min))
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def create_price_bars(conn: sqlite3.Connection, name: str = "price_bars") -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            oi REAL,
+            PRIMARY KEY (instrument_token, interval, timestamp),
+            FOREIGN KEY (instrument_token) REFERENCES instruments(instrument_token)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def create_series_tables(conn: sqlite3.Connection, schema: str = "main") -> None:
+    """Create the per-series bookkeeping tables (:data:`SERIES_TABLES`) in ``schema``.
+
+    They live in the same file as the bars they describe: the main database, or the
+    shard file of a sharded interval family (``market_data.shards``).
+    """
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.series_coverage (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            first_timestamp INTEGER,
+            last_timestamp INTEGER,
+            bar_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            generation INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (instrument_token, interval)
+        )
+        """
+    )
+    if "generation" not in {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(series_coverage)")}:
+        conn.execute(f"ALTER TABLE {schema}.series_coverage ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+    # First timestamp of the rewrite that produced each recent generation of a series
+    # (NULL: every bar); see market_data.coverage.rewritten_since.
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.series_rewrites (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            generation INTEGER NOT NULL,
+            rewritten_from INTEGER,
+            PRIMARY KEY (instrument_token, interval, generation)
+        ) WITHOUT ROWID
+        """
+    )
+    # One row per (series, session date) that has been requested. Sessions that came back
+    # empty (exchange holidays) are kept with bar_count = 0 so they are not requested again.
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.series_sessions (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            session_date TEXT NOT NULL,
+            bar_count INTEGER NOT NULL,
+            PRIMARY KEY (instrument_token, interval, session_date)
+        ) WITHOUT ROWID
+        """
+    )
+    # Bars rejected by ingest validation (see market_data/quality.py); ``flags`` holds
+    # the FLAG_* bits explaining why.
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.price_bars_quarantine (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            oi REAL,
+            flags INTEGER NOT NULL,
+            detected_at TEXT,
+            PRIMARY KEY (instrument_token, interval, timestamp)
+        ) WITHOUT ROWID
+        """
+    )
+    # Suspicious bars that were kept in price_bars (spikes, zero-volume runs).
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.price_bar_flags (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            flags INTEGER NOT NULL,
+            PRIMARY KEY (instrument_token, interval, timestamp)
+        ) WITHOUT ROWID
+        """
+    )
+    # Extra copies of a timestamp dropped from downloaded chunks; replaced per chunk range
+    # like the flags, so downloading a range again does not count its duplicates twice.
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.price_bar_duplicates (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            copies INTEGER NOT NULL,
+            PRIMARY KEY (instrument_token, interval, timestamp)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.series_quality (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            bar_count INTEGER NOT NULL DEFAULT 0,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            expected_sessions INTEGER NOT NULL DEFAULT 0,
+            coverage_pct REAL,
+            gap_bars INTEGER NOT NULL DEFAULT 0,
+            spikes INTEGER NOT NULL DEFAULT 0,
+            zero_volume INTEGER NOT NULL DEFAULT 0,
+            quarantined INTEGER NOT NULL DEFAULT 0,
+            duplicates INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            dirty_from INTEGER,
+            PRIMARY KEY (instrument_token, interval)
+        )
+        """
+    )
+    if "dirty_from" not in {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(series_quality)")}:
+        conn.execute(f"ALTER TABLE {schema}.series_quality ADD COLUMN dirty_from INTEGER")
+    # Bars and in-session gaps per (series, session day); series_quality sums them, so a
+    # refresh only re-reads the sessions written since ``series_quality.dirty_from``.
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.session_quality (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            session_day INTEGER NOT NULL,
+            bar_count INTEGER NOT NULL,
+            gap_bars INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (instrument_token, interval, session_day)
+        ) WITHOUT ROWID
+        """
+    )
+    # Freshness of series kept current by the watchlist daemon (fetch_price_history.py --daemon).
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.ingest_lag (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            last_bar_timestamp INTEGER,
+            polled_at INTEGER NOT NULL,
+            lag_seconds REAL,
+            error TEXT,
+            PRIMARY KEY (instrument_token, interval)
+        )
+        """
+    )
+
+
+def create_schema(conn: sqlite3.Connection) -> None:
+    """Create missing tables and apply additive upgrades up to :data:`SCHEMA_VERSION`.
+
+    Raises :class:`SchemaVersionError` when ``price_bars`` exists in the old TEXT layout.
+    """
+    if table_exists(conn, "price_bars") and schema_version(conn) < PRICE_BARS_VERSION:
+        raise SchemaVersionError(
+            "price_bars uses the pre-v2 TEXT schema. Run scripts/migrate_price_bars.py first."
+        )
+    create_tables(conn)
+    conn.commit()
+
+
+def create_tables(conn: sqlite3.Connection) -> None:
+    """Create missing tables and stamp the schema version without committing."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS instruments (
+            instrument_token INTEGER PRIMARY KEY,
+            tradingsymbol TEXT,
+            name TEXT,
+            segment TEXT,
+            exchange TEXT,
+            lot_size INTEGER,
+            expiry TEXT,
+            last_refreshed TEXT,
+            exchange_token INTEGER,
+            strike REAL,
+            instrument_type TEXT,
+            tick_size REAL
+        )
+        """
+    )
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(instruments)")}
+    for column, sql_type in INSTRUMENT_OPTION_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE instruments ADD COLUMN {column} {sql_type}")
+    # Option-chain lookups filter on underlying, segment and expiry and sort by strike.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_instruments_chain
+        ON instruments (name, segment, expiry, strike, instrument_type)
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS intervals (
+            code INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO intervals (code, name) VALUES (?, ?)",
+        [(code, name) for name, code in INTERVAL_CODES.items()],
+    )
+    create_price_bars(conn)
+    create_series_tables(conn)
+    # Completed intraday sessions packed by market_data/chunks.py; one compressed
+    # columnar row per (series, session) replaces that session's price_bars rows.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS price_chunks (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            session_day INTEGER NOT NULL,
+            first_timestamp INTEGER NOT NULL,
+            last_timestamp INTEGER NOT NULL,
+            bar_count INTEGER NOT NULL,
+            timestamps BLOB NOT NULL,
+            price_columns BLOB NOT NULL,
+            PRIMARY KEY (instrument_token, interval, session_day)
+        )
+        """
+    )
+    # Months of bars moved to Parquet by market_data/archive.py; ``path`` is relative to
+    # the database file's directory unless the archive was written elsewhere.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            first_timestamp INTEGER NOT NULL,
+            last_timestamp INTEGER NOT NULL,
+            bar_count INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            archived_at TEXT,
+            PRIMARY KEY (instrument_token, interval, month)
+        )
+        """
+    )
+    # Last run of each market_data/maintenance.py task with a JSON report.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            task TEXT PRIMARY KEY,
+            ran_at TEXT NOT NULL,
+            details TEXT
+        )
+        """
+    )
+    # Continuous futures series built by market_data/continuous.py; ``schedule`` lists the
+    # contract and first bar of every held segment so a new roll triggers a rebuild.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS continuous_series (
+            instrument_token INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            roll TEXT NOT NULL,
+            adjustment TEXT NOT NULL,
+            schedule TEXT NOT NULL,
+            updated_at TEXT,
+            PRIMARY KEY (instrument_token, interval)
+        )
+        """
+    )
+    # Option-chain snapshots recorded by market_data/chain_snapshots.py. A layout fixes the
+    # contracts (ordered by strike and type) of one underlying and expiry; each snapshot
+    # stores that layout's quote columns as deltas against the previous snapshot.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS option_chain_layouts (
+            layout_id INTEGER PRIMARY KEY,
+            underlying TEXT NOT NULL,
+            expiry TEXT NOT NULL,
+            instrument_tokens BLOB NOT NULL,
+            strikes BLOB NOT NULL,
+            option_types BLOB NOT NULL,
+            created_at TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_option_chain_layouts
+        ON option_chain_layouts (underlying, expiry)
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS option_chain_snapshots (
+            layout_id INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            keyframe INTEGER NOT NULL,
+            underlying_price REAL,
+            call_oi REAL,
+            put_oi REAL,
+            call_oi_change REAL,
+            put_oi_change REAL,
+            payload BLOB NOT NULL,
+            PRIMARY KEY (layout_id, timestamp)
+        ) WITHOUT ROWID
+        """
+    )
+    # Interval families whose price_bars live in their own file (market_data/shards.py);
+    # ``path`` is relative to this database's directory.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS storage_shards (
+            family TEXT PRIMARY KEY,
+            path TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
@@ -0,0 +1,242 @@
+"""Optional per-interval-family database files for ``price_bars``.
+
+In a sharded database the bars of each interval family live in their own SQLite file
+next to the main one, together with the per-series bookkeeping that describes them
+(``series_coverage``, ``series_sessions``, the quality tables, ``ingest_lag``; see
+:data:`market_data.schema.SERIES_TABLES`)::
+
+    market_data.db          instruments, chunks, archive, jobs, ... (the catalogue)
+    market_data.minute.db   price_bars and series bookkeeping for minute .. 60minute
+    market_data.day.db      price_bars and series bookkeeping for day
+
+Each file has its own lock, WAL and page cache, so a minute backfill holding the
+minute file's write lock never delays a day-bar write, and day-bar reads keep their
+pages cached. Full-resolution ticks already live outside SQLite (``market_data.ticks``).
+Keeping the bookkeeping next to the bars matters twice: a chunk's bars and its
+``series_sessions`` rows commit in one file, so a crash cannot record a session whose
+bars never landed (SQLite does not commit attached WAL databases atomically), and a
+download writes nothing to the main file per chunk. Packed ``price_chunks`` and the
+archive catalogue stay in the main file.
+
+:func:`attach_shards` attaches the registered files to a connection and creates a
+``TEMP`` view for ``price_bars`` and every bookkeeping table over all of them and the
+main file's table (which keeps the families not sharded yet), shadowing the tables;
+every read query therefore runs unchanged. SQLite cannot write through a view, so
+writers name their target with :func:`bars_table` and :func:`series_table`. Inserts
+into the main file's tables for a sharded family are refused by triggers, so a
+connection that forgot to attach fails loudly instead of writing rows nobody reads.
+
+Shards are created, and existing bars moved into them, by ``scripts/shard_price_bars.py``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .schema import INTERVAL_CODES, SERIES_TABLES, create_price_bars, create_series_tables, interval_code, table_exists
+
+logger = logging.getLogger(__name__)
+
+SHARD_FAMILIES: Dict[str, Tuple[int, ...]] = {
+    "minute": tuple(code for name, code in INTERVAL_CODES.items() if name != "day"),
+    "day": (INTERVAL_CODES["day"],),
+}
+BARS_COLUMNS = "instrument_token, interval, timestamp, open, high, low, close, volume, oi"
+# ``PRAGMA user_version`` of a shard file that holds its family's series bookkeeping.
+# Files sharded before that (version 0) get the rows moved over when next attached.
+SHARD_VERSION = 1
+
+
+def shard_family(code: int) -> str:
+    for family, codes in SHARD_FAMILIES.items():
+        if code in codes:
+            return family
+    raise ValueError(f"No shard family for interval code {code}.")
+
+
+def shard_schema(family: str) -> str:
+    return f"shard_{family}"
+
+
+def shard_path(db_path: str, family: str) -> str:
+    """``data/market_data.db`` -> ``data/market_data.<family>.db``."""
+    stem, extension = os.path.splitext(db_path)
+    return f"{stem}.{family}{extension or '.db'}"
+
+
+def _main_path(conn: sqlite3.Connection) -> str:
+    for _, name, path in conn.execute("PRAGMA database_list").fetchall():
+        if name == "main":
+            return path
+    return ""
+
+
+def registered_shards(conn: sqlite3.Connection) -> Dict[str, str]:
+    """Family -> shard file path (relative to the main database's directory)."""
+    if not table_exists(conn, "storage_shards"):
+        return {}
+    return dict(conn.execute("SELECT family, path FROM storage_shards ORDER BY family").fetchall())
+
+
+def attached_shards(conn: sqlite3.Connection) -> List[str]:
+    prefix = shard_schema("")
+    return [name[len(prefix) :] for _, name, _ in conn.execute("PRAGMA database_list").fetchall() if name.startswith(prefix)]
+
+
+def _attach(conn: sqlite3.Connection, family: str, path: str) -> None:
+    schema = shard_schema(family)
+    conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+    if conn.execute(f"PRAGMA {schema}.journal_mode").fetchone()[0] != "wal":
+        # A new file: incremental vacuum must be chosen before WAL mode.
+        conn.execute(f"PRAGMA {schema}.auto_vacuum=INCREMENTAL")
+        conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+    create_price_bars(conn, f"{schema}.price_bars")
+    create_series_tables(conn, schema)
+    if conn.execute(f"PRAGMA {schema}.user_version").fetchone()[0] < SHARD_VERSION:
+        _move_series_rows(conn, family)
+        conn.execute(f"PRAGMA {schema}.user_version = {SHARD_VERSION}")
+        conn.commit()
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> str:
+    return ", ".join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table})"))
+
+
+def _move_series_rows(conn: sqlite3.Connection, family: str) -> None:
+    """Move a family's bookkeeping rows from the main file into its shard and guard them there.
+
+    Rows are copied before they are deleted, so an interrupted move is simply repeated
+    on the next attach.
+    """
+    schema = shard_schema(family)
+    codes = ",".join(str(code) for code in SHARD_FAMILIES[family])
+    for table in SERIES_TABLES:
+        columns = _columns(conn, table)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {schema}.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE interval IN ({codes})"
+        )
+        conn.execute(f"DELETE FROM main.{table} WHERE interval IN ({codes})")
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS main.{table}_{family}_sharded
+            BEFORE INSERT ON {table}
+            WHEN NEW.interval IN ({codes})
+            BEGIN
+                SELECT RAISE(ABORT, '{table} of the {family} family is sharded; attach the shards with market_data.shards.attach_shards');
+            END
+            """
+        )
+
+
+def _create_view(conn: sqlite3.Connection, families: Sequence[str]) -> None:
+    for table in ("price_bars", *SERIES_TABLES):
+        columns = BARS_COLUMNS if table == "price_bars" else _columns(conn, table)
+        sources = [f"main.{table}", *(f"{shard_schema(family)}.{table}" for family in families)]
+        arms = " UNION ALL ".join(f"SELECT {columns} FROM {source}" for source in sources)
+        conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+        conn.execute(f"CREATE TEMP VIEW {table} AS {arms}")
+
+
+def attach_shards(conn: sqlite3.Connection) -> List[str]:
+    """Attach the database's shard files and shadow ``price_bars`` and the bookkeeping tables with views over them.
+
+    A no-op (returning an empty list) for unsharded databases; safe to call twice.
+    """
+    shards = registered_shards(conn)
+    if not shards:
+        return []
+    base = os.path.dirname(os.path.abspath(_main_path(conn)))
+    attached = set(attached_shards(conn))
+    for family, path in shards.items():
+        if family not in attached:
+            _attach(conn, family, os.path.join(base, path))
+    _create_view(conn, list(shards))
+    conn.commit()
+    return list(shards)
+
+
+def series_table(conn: sqlite3.Connection, table: str, interval: Union[str, int]) -> str:
+    """Table that writes of ``interval`` rows of ``table`` go to on this connection.
+
+    ``table`` is ``price_bars`` or one of :data:`market_data.schema.SERIES_TABLES`.
+    """
+    code = interval if isinstance(interval, int) else interval_code(interval)
+    attached = attached_shards(conn)
+    if not attached:
+        return table
+    family = shard_family(code)
+    return f"{shard_schema(family)}.{table}" if family in attached else f"main.{table}"
+
+
+def bars_table(conn: sqlite3.Connection, interval: Union[str, int]) -> str:
+    """Table that writes of ``interval`` bars go to on this connection."""
+    return series_table(conn, "price_bars", interval)
+
+
+def bars_tables(conn: sqlite3.Connection) -> List[Tuple[str, Optional[Tuple[int, ...]]]]:
+    """Every write target with the interval codes it holds (None: all of them)."""
+    attached = attached_shards(conn)
+    if not attached:
+        return [("price_bars", None)]
+    targets: List[Tuple[str, Optional[Tuple[int, ...]]]] = [
+        (f"{shard_schema(family)}.price_bars", SHARD_FAMILIES[family]) for family in attached
+    ]
+    rest = tuple(code for family, codes in SHARD_FAMILIES.items() if family not in attached for code in codes)
+    if rest:
+        targets.append(("main.price_bars", rest))
+    return targets
+
+
+def shard_database(conn: sqlite3.Connection, families: Sequence[str] = tuple(SHARD_FAMILIES)) -> Dict[str, int]:
+    """Create shard files for ``families`` and move their bars and bookkeeping out of main.
+
+    Families are moved one at a time, each in its own transaction; an interrupted run
+    can simply be repeated. Returns the number of bars moved per family.
+    """
+    unknown = set(families) - set(SHARD_FAMILIES)
+    if unknown:
+        raise ValueError(f"Unknown shard families: {', '.join(sorted(unknown))}. Expected: {', '.join(SHARD_FAMILIES)}")
+    main_path = _main_path(conn)
+    if not main_path:
+        raise ValueError("In-memory databases cannot be sharded.")
+    base = os.path.dirname(os.path.abspath(main_path))
+    moved: Dict[str, int] = {}
+    for family in families:
+        path = shard_path(main_path, family)
+        if family not in attached_shards(conn):
+            _attach(conn, family, path)
+        codes = ",".join(str(code) for code in SHARD_FAMILIES[family])
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO {shard_schema(family)}.price_bars ({BARS_COLUMNS})
+            SELECT {BARS_COLUMNS} FROM main.price_bars
+            WHERE interval IN ({codes})
+            ORDER BY instrument_token, interval, timestamp
+            """
+        )
+        moved[family] = conn.execute(f"DELETE FROM main.price_bars WHERE interval IN ({codes})").rowcount
+        conn.execute(
+            "INSERT OR REPLACE INTO storage_shards (family, path) VALUES (?, ?)",
+            (family, os.path.relpath(path, base)),
+        )
+        conn.commit()
+        logger.info("Moved %s bars of the %s family into %s", moved[family], family, path)
+
+    # Anything not covered by a shard has nowhere else to go, so main stays writable
+    # until every family is sharded.
+    if set(registered_shards(conn)) == set(SHARD_FAMILIES):
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS main.price_bars_sharded
+            BEFORE INSERT ON price_bars
+            BEGIN
+                SELECT RAISE(ABORT, 'price_bars is sharded; attach the shards with market_data.shards.attach_shards');
+            END
+            """
+        )
+        conn.commit()
+    _create_view(conn, list(registered_shards(conn)))
+    return moved
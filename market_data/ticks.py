@@ -0,0 +1,426 @@
+"""Append-only tick store with daily binary segments and a per-token index.
+
+Layout under the store root (``data/ticks`` by default)::
+
+    2026-10-16.ticks          fixed 64-byte records (TICK_DTYPE), append-only
+    2026-10-16.tidx           INDEX_DTYPE entries: token, first record, count, time bounds
+    2026-10-16.sealed.3.ticks the day sorted by token (generation 3, see seal_day)
+    2026-10-16.sealed.3.tidx
+    2026-10-16.lock           advisory lock held while the day is written or sealed
+
+:class:`TickWriter` buffers incoming ticks and flushes them from a background thread
+in batches. Each batch is sorted by ``(instrument_token, timestamp)`` before it is
+appended, so a token's ticks in one batch are a contiguous run described by a single
+index entry, and the data is written before the index entries that point at it, so a
+reader never sees an entry for bytes that are not on disk yet. A record torn by a
+crash or a full disk is cut off before the next append and ignored by readers.
+
+:func:`seal_day` rewrites a finished day sorted by token into a new sealed generation
+with one index entry per token; readers then return zero-copy slices of the
+memory-mapped segment. The writer holds a day's lock while it appends to it (and
+releases it once it moves on to a later day), so a seal never races an append. Where
+``fcntl`` is missing (Windows) there are no locks: seal only days nothing appends to.
+
+:func:`read_ticks` memory-maps the segments a range touches and gathers the index
+entries of the requested tokens, so a replay of one token never reads another's bytes.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .schema import MARKET_TZ, MARKET_UTC_OFFSET_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TICK_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),  # epoch nanoseconds (UTC)
+        ("instrument_token", "<i8"),
+        ("last_price", "<f8"),
+        ("last_quantity", "<f8"),
+        ("volume", "<f8"),  # cumulative day volume as reported by the exchange
+        ("oi", "<f8"),
+        ("bid", "<f8"),
+        ("ask", "<f8"),
+    ]
+)
+INDEX_DTYPE = np.dtype(
+    [
+        ("instrument_token", "<i8"),
+        ("start", "<i8"),  # first record of the run
+        ("count", "<i8"),
+        ("first_timestamp", "<i8"),
+        ("last_timestamp", "<i8"),
+    ]
+)
+
+DAY_NANOS = 86400 * 10**9
+OFFSET_NANOS = MARKET_UTC_OFFSET_SECONDS * 10**9
+DEFAULT_FLUSH_SECONDS = 1.0
+# Flush early once this many ticks are buffered.
+DEFAULT_MAX_BATCH = 65536
+
+
+def _day_of(timestamps: np.ndarray) -> np.ndarray:
+    """Exchange-local day number (days since 1970-01-01) of nanosecond timestamps."""
+    return (timestamps + OFFSET_NANOS) // DAY_NANOS
+
+
+def _day_name(day_number: int) -> str:
+    return (date(1970, 1, 1) + timedelta(days=int(day_number))).isoformat()
+
+
+def segment_paths(root: str, day: Union[date, str], generation: Optional[int] = None) -> tuple:
+    """Data and index paths of a day's live segment, or of its sealed ``generation``."""
+    name = day if isinstance(day, str) else day.isoformat()
+    suffix = "" if generation is None else f".sealed.{generation}"
+    return os.path.join(root, f"{name}{suffix}.ticks"), os.path.join(root, f"{name}{suffix}.tidx")
+
+
+def sealed_generation(root: str, day: Union[date, str]) -> Optional[int]:
+    """The newest sealed generation of a day (its index is written last), or None."""
+    name = day if isinstance(day, str) else day.isoformat()
+    prefix = f"{name}.sealed."
+    generations = [
+        int(entry[len(prefix) : -len(".tidx")])
+        for entry in os.listdir(root)
+        if entry.startswith(prefix) and entry.endswith(".tidx") and entry[len(prefix) : -len(".tidx")].isdigit()
+    ] if os.path.isdir(root) else []
+    return max(generations, default=None)
+
+
+def _lock_day(root: str, day: str, blocking: bool = True) -> Optional[Any]:
+    """Open handle holding the day's exclusive lock (closing it releases the lock).
+
+    Returns None when ``blocking`` is False and another process holds the lock.
+    """
+    handle = open(os.path.join(root, f"{day}.lock"), "a+b")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            handle.close()
+            return None
+    return handle
+
+
+def _whole_records(path: str, dtype: np.dtype, repair: bool = False) -> int:
+    """Number of whole records in ``path``; ``repair`` cuts off a torn trailing record."""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+    if repair and size % dtype.itemsize:
+        logger.warning("Dropping %s bytes of a torn record at the end of %s", size % dtype.itemsize, path)
+        with open(path, "r+b") as handle:
+            handle.truncate(size - size % dtype.itemsize)
+    return size // dtype.itemsize
+
+
+def _read_records(path: str, dtype: np.dtype) -> np.ndarray:
+    return np.fromfile(path, dtype=dtype, count=_whole_records(path, dtype))
+
+
+def to_nanos(value: Union[datetime, int, float]) -> int:
+    """Epoch nanoseconds; naive datetimes are taken as exchange-local time."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=MARKET_TZ)
+        return int(value.timestamp() * 10**9)
+    return int(value)
+
+
+def _index_runs(batch: np.ndarray, start: int) -> np.ndarray:
+    """One index entry per token run in a batch sorted by (token, timestamp)."""
+    tokens = batch["instrument_token"]
+    bounds = np.flatnonzero(np.r_[True, tokens[1:] != tokens[:-1], True])
+    entries = np.empty(len(bounds) - 1, dtype=INDEX_DTYPE)
+    entries["instrument_token"] = tokens[bounds[:-1]]
+    entries["start"] = start + bounds[:-1]
+    entries["count"] = np.diff(bounds)
+    entries["first_timestamp"] = batch["timestamp"][bounds[:-1]]
+    entries["last_timestamp"] = batch["timestamp"][bounds[1:] - 1]
+    return entries
+
+
+def kite_ticks_to_records(ticks: Sequence[Dict[str, Any]], received: Optional[int] = None) -> np.ndarray:
+    """Records for KiteTicker ``on_ticks`` payloads in any subscription mode.
+
+    The exchange timestamp is used when the mode carries one, otherwise the receive time.
+    """
+    received = received if received is not None else time.time_ns()
+    records = np.zeros(len(ticks), dtype=TICK_DTYPE)
+    nan = math.nan
+    for position, tick in enumerate(ticks):
+        stamp = tick.get("exchange_timestamp") or tick.get("last_trade_time")
+        depth = tick.get("depth") or {}
+        bids = depth.get("buy") or [{}]
+        asks = depth.get("sell") or [{}]
+        records[position] = (
+            to_nanos(stamp) if stamp else received,
+            tick["instrument_token"],
+            tick.get("last_price", nan),
+            tick.get("last_traded_quantity", tick.get("last_quantity", nan)),
+            tick.get("volume_traded", tick.get("volume", nan)),
+            tick.get("oi", nan),
+            bids[0].get("price", nan) or nan,
+            asks[0].get("price", nan) or nan,
+        )
+    return records
+
+
+class TickWriter:
+    """Buffers ticks and appends them to the day's segment from a background thread.
+
+    Only one writer may append to a store root at a time.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        max_batch: int = DEFAULT_MAX_BATCH,
+    ) -> None:
+        self.root = root
+        self.flush_seconds = flush_seconds
+        self.max_batch = max_batch
+        self.ticks_written = 0
+        os.makedirs(root, exist_ok=True)
+        self._day_locks: Dict[str, Any] = {}
+        self._pending: List[np.ndarray] = []
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tick-writer", daemon=True)
+        self._thread.start()
+
+    def extend(self, records: np.ndarray) -> None:
+        """Queue an array of TICK_DTYPE records."""
+        if not len(records):
+            return
+        with self._lock:
+            self._pending.append(records)
+            self._pending_count += len(records)
+            if self._pending_count >= self.max_batch:
+                self._wake.set()
+
+    def append(
+        self,
+        instrument_token: int,
+        timestamp: Union[datetime, int],
+        last_price: float,
+        last_quantity: float = math.nan,
+        volume: float = math.nan,
+        oi: float = math.nan,
+        bid: float = math.nan,
+        ask: float = math.nan,
+    ) -> None:
+        record = np.array(
+            [(to_nanos(timestamp), instrument_token, last_price, last_quantity, volume, oi, bid, ask)],
+            dtype=TICK_DTYPE,
+        )
+        self.extend(record)
+
+    def append_kite_ticks(self, ticks: Sequence[Dict[str, Any]]) -> None:
+        """``KiteTicker.on_ticks`` compatible entry point."""
+        self.extend(kite_ticks_to_records(ticks))
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of ticks written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._pending_count = self._pending, [], 0
+            if not pending:
+                return 0
+            batch = np.concatenate(pending)
+            days = _day_of(batch["timestamp"])
+            for day in np.unique(days):
+                part = batch[days == day]
+                part = part[np.lexsort((part["timestamp"], part["instrument_token"]))]
+                try:
+                    self._append_segment(_day_name(day), part)
+                except OSError:
+                    # Put the unwritten days back in front of anything queued meanwhile.
+                    with self._lock:
+                        self._pending.insert(0, batch[days >= day])
+                        self._pending_count += int(np.count_nonzero(days >= day))
+                    raise
+            self._release_days(before=_day_name(days.max()))
+            self.ticks_written += len(batch)
+            return len(batch)
+
+    def _append_segment(self, day: str, batch: np.ndarray) -> None:
+        if day not in self._day_locks:
+            # Waits for a seal of the day in progress.
+            self._day_locks[day] = _lock_day(self.root, day)
+        data_path, index_path = segment_paths(self.root, day)
+        start = _whole_records(data_path, TICK_DTYPE, repair=True)
+        _whole_records(index_path, INDEX_DTYPE, repair=True)
+        with open(data_path, "ab") as handle:
+            handle.write(batch.tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        with open(index_path, "ab") as handle:
+            handle.write(_index_runs(batch, start).tobytes())
+
+    def _release_days(self, before: Optional[str] = None) -> None:
+        """Release the locks of days before ``before`` (all when None) so they can be sealed."""
+        for day in [day for day in self._day_locks if before is None or day < before]:
+            self._day_locks.pop(day).close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Tick flush failed; ticks stay buffered for the next attempt")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        try:
+            self.flush()
+        finally:
+            with self._flush_lock:
+                self._release_days()
+
+
+def _open_segment(data_path: str, index_path: str) -> Optional[tuple]:
+    if not os.path.exists(index_path):
+        return None
+    index = _read_records(index_path, INDEX_DTYPE)
+    if not len(index):
+        return None
+    # Entries are appended after their data, so every entry is covered by the whole records.
+    count = _whole_records(data_path, TICK_DTYPE)
+    return np.memmap(data_path, dtype=TICK_DTYPE, mode="r", shape=(count,)), index
+
+
+def _open_segments(root: str, day: str) -> List[tuple]:
+    """(records, index) pairs of a day: its sealed segment and any ticks that arrived later."""
+    segments: List[tuple] = []
+    for _ in range(3):
+        generation = sealed_generation(root, day)
+        try:
+            segments = [
+                segment
+                for segment in (
+                    _open_segment(*segment_paths(root, day, generation)) if generation is not None else None,
+                    _open_segment(*segment_paths(root, day)),
+                )
+                if segment is not None
+            ]
+        except FileNotFoundError:
+            # Sealed again while the files were opened.
+            continue
+        # A seal that finished in between may have moved the live ticks into a newer generation.
+        if sealed_generation(root, day) == generation:
+            break
+    return segments
+
+
+def read_ticks(
+    root: str,
+    instrument_tokens: Union[int, Iterable[int]],
+    start: Union[datetime, int],
+    end: Union[datetime, int],
+) -> np.ndarray:
+    """Ticks of ``instrument_tokens`` with ``start <= timestamp <= end`` in time order.
+
+    For a single token on a sealed day the result is a view of the memory map.
+    """
+    if isinstance(instrument_tokens, (int, np.integer)):
+        instrument_tokens = [instrument_tokens]
+    tokens = np.array(list(instrument_tokens), dtype=np.int64)
+    start_ns, end_ns = to_nanos(start), to_nanos(end)
+    parts = []
+    first_day, last_day = _day_of(np.array([start_ns, end_ns]))
+    for day in range(int(first_day), int(last_day) + 1):
+        for records, index in _open_segments(root, _day_name(day)):
+            wanted = index[
+                np.isin(index["instrument_token"], tokens)
+                & (index["last_timestamp"] >= start_ns)
+                & (index["first_timestamp"] <= end_ns)
+            ]
+            for entry in wanted:
+                run = records[entry["start"] : entry["start"] + entry["count"]]
+                stamps = run["timestamp"]
+                # Runs are sorted by time, so the range is a slice.
+                lo, hi = np.searchsorted(stamps, start_ns, "left"), np.searchsorted(stamps, end_ns, "right")
+                if hi > lo:
+                    parts.append(run[lo:hi])
+    if not parts:
+        return np.empty(0, dtype=TICK_DTYPE)
+    if len(parts) == 1:
+        return parts[0]
+    ticks = np.concatenate(parts)
+    return ticks[np.argsort(ticks["timestamp"], kind="stable")]
+
+
+def seal_day(root: str, day: Union[date, str]) -> int:
+    """Rewrite a finished day sorted by token with one index entry per token.
+
+    Returns the number of ticks in the sealed segment. The sealed data and then its
+    index are written under the next generation number, so a reader opens either the
+    old pair or the new one, never a mix; the previous generation and the live files
+    are removed afterwards (readers that already mapped them keep working). Ticks
+    appended for the day later go to a new live segment read alongside the sealed one.
+
+    Raises ``RuntimeError`` while a :class:`TickWriter` still holds the day.
+    """
+    name = day if isinstance(day, str) else day.isoformat()
+    lock = _lock_day(root, name, blocking=False)
+    if lock is None:
+        raise RuntimeError(f"A tick writer is still appending to {name}; seal it once the writer has moved on.")
+    try:
+        data_path, index_path = segment_paths(root, name)
+        if not os.path.exists(index_path):
+            return 0
+        # Only records an index entry points at: an append that failed half-way may have
+        # left records that were written again by the retry.
+        index = _read_records(index_path, INDEX_DTYPE)
+        counts = index["count"]
+        offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        records = _read_records(data_path, TICK_DTYPE)[np.repeat(index["start"], counts) + offsets]
+        previous = sealed_generation(root, name)
+        if previous is not None:
+            records = np.concatenate([_read_records(segment_paths(root, name, previous)[0], TICK_DTYPE), records])
+        if not len(records):
+            for path in (index_path, data_path):
+                os.remove(path)
+            return 0
+        records = records[np.lexsort((records["timestamp"], records["instrument_token"]))]
+
+        generation = 0 if previous is None else previous + 1
+        sealed_data, sealed_index = segment_paths(root, name, generation)
+        records.tofile(sealed_data)
+        _index_runs(records, 0).tofile(f"{sealed_index}.tmp")
+        os.replace(f"{sealed_index}.tmp", sealed_index)
+        stale = [index_path, data_path]
+        if previous is not None:
+            stale = [*reversed(segment_paths(root, name, previous)), *stale]
+        for path in stale:
+            os.remove(path)
+    finally:
+        lock.close()
+    logger.info("Sealed %s ticks for %s (generation %s)", len(records), name, generation)
+    return len(records)
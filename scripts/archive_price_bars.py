@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Move old bars from SQLite into the monthly Parquet archive.
+
+Usage example (archive minute bars older than six months):
+
+    python scripts/archive_price_bars.py --interval minute --older-than-days 180
+
+Archived bars stay visible to every reader (``/price-bars``, analytics, training)
+through ``market_data.bars.read_bars``. Requires pyarrow. Run ``VACUUM`` afterwards
+to return the freed pages to the file system.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.archive import archive_series  # noqa: E402
+from market_data.schema import INTERVAL_CODES, MARKET_TZ, create_schema, interval_code  # noqa: E402
+from market_data.shards import attach_shards  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def series_tokens(conn: sqlite3.Connection, interval: str) -> List[int]:
+    rows = conn.execute(
+        "SELECT instrument_token FROM series_coverage WHERE interval = ? AND bar_count > 0",
+        (interval_code(interval),),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive old bars to Parquet partitions.")
+    parser.add_argument(
+        "--instrument-token",
+        dest="instrument_tokens",
+        type=int,
+        action="append",
+        help="Instrument token to archive. Repeat for multiple; defaults to every series at --interval.",
+    )
+    parser.add_argument(
+        "--interval",
+        default="minute",
+        choices=list(INTERVAL_CODES),
+        help="Interval to archive (default: minute).",
+    )
+    parser.add_argument(
+        "--older-than-days",
+        type=int,
+        default=180,
+        help="Archive bars of sessions more than this many days old (default: 180).",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        help="Archive root directory (default: an 'archive' directory next to the database).",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    before = datetime.now(MARKET_TZ).date() - timedelta(days=args.older_than_days)
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    try:
+        create_schema(conn)
+        attach_shards(conn)
+        tokens = args.instrument_tokens or series_tokens(conn, args.interval)
+        archived = sum(archive_series(conn, token, args.interval, before, args.archive_dir) for token in tokens)
+        logger.info("Archived %s %s bars before %s across %s instruments", archived, args.interval, before, len(tokens))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
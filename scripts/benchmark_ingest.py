@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Benchmark historical ingestion end to end against the offline Kite stand-in.
+
+Usage example (the default 1/10/100 instrument suite):
+
+    python scripts/benchmark_ingest.py
+
+Each scenario runs ``download_concurrently`` in a fresh subprocess against
+``scripts/fake_kite.py`` and a scratch database, and reports bars/s, peak RSS and
+time spent in database writes. Results are appended to a JSON-lines history file and
+compared with the median of the previous runs of the same scenario; ``--check`` exits
+non-zero when a scenario regresses by more than ``--tolerance``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS = os.path.join(ROOT, "data", "benchmarks", "ingest.jsonl")
+# Previous runs of a scenario that make up its baseline.
+BASELINE_RUNS = 5
+SCENARIO_KEYS = ("instruments", "interval", "lookback_days", "workers", "latency", "rate_limit", "bulk")
+
+
+def run_scenario(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one scenario in this process and return its measurements."""
+    from scripts.fake_kite import FakeKite, synthetic_instruments
+    from scripts.fetch_price_history import (
+        TokenBucket,
+        download_concurrently,
+        init_db,
+        resolve_chunk_days,
+    )
+
+    catalogue = synthetic_instruments(equities=max(args.run_scenario, 1))
+    targets = [row for row in catalogue if row["segment"] == "NSE"][: args.run_scenario]
+    kite = FakeKite(catalogue, latency=args.latency, historical_rate_limit=args.rate_limit)
+
+    with tempfile.TemporaryDirectory(prefix="ingest-bench-") as scratch:
+        db_path = os.path.join(scratch, "market_data.db")
+        conn = init_db(db_path)
+        started = time.monotonic()
+        stats = download_concurrently(
+            kite,
+            conn,
+            targets,
+            args.interval,
+            args.lookback_days,
+            resolve_chunk_days(args.interval, None),
+            args.workers,
+            TokenBucket(args.rate_limit),
+            max_retries=3,
+            db_path=db_path,
+            bulk=args.bulk,
+        )
+        elapsed = time.monotonic() - started
+        conn.close()
+        db_bytes = os.path.getsize(db_path)
+
+    return {
+        "instruments": args.run_scenario,
+        "interval": args.interval,
+        "lookback_days": args.lookback_days,
+        "workers": args.workers,
+        "latency": args.latency,
+        "rate_limit": args.rate_limit,
+        "bulk": args.bulk,
+        "bars": stats.bars,
+        "requests": stats.requests,
+        "failed": len(stats.failed),
+        "elapsed_seconds": round(elapsed, 3),
+        "bars_per_second": round(stats.bars / max(elapsed, 1e-9), 1),
+        "write_seconds": round(stats.write_seconds, 3),
+        # ru_maxrss is reported in kilobytes on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "db_mb": round(db_bytes / 1e6, 2),
+    }
+
+
+def scenario_command(args: argparse.Namespace, instruments: int) -> List[str]:
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--run-scenario",
+        str(instruments),
+        "--interval",
+        args.interval,
+        "--lookback-days",
+        str(args.lookback_days),
+        "--workers",
+        str(args.workers),
+        "--latency",
+        str(args.latency),
+        "--rate-limit",
+        str(args.rate_limit),
+    ]
+    if args.bulk:
+        command.append("--bulk")
+    return command
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def baseline_for(history: List[Dict[str, Any]], result: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    previous = [row for row in history if all(row.get(key) == result[key] for key in SCENARIO_KEYS)]
+    previous = previous[-BASELINE_RUNS:]
+    if not previous:
+        return None
+    return {
+        metric: statistics.median(row[metric] for row in previous)
+        for metric in ("bars_per_second", "peak_rss_mb", "write_seconds")
+    }
+
+
+def regressions(result: Dict[str, Any], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    found = []
+    if result["bars_per_second"] < baseline["bars_per_second"] * (1 - tolerance):
+        found.append(f"bars/s {result['bars_per_second']:.0f} vs {baseline['bars_per_second']:.0f}")
+    if result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        found.append(f"peak RSS {result['peak_rss_mb']:.1f} MB vs {baseline['peak_rss_mb']:.1f} MB")
+    # Sub-second write totals are mostly noise.
+    if result["write_seconds"] > max(baseline["write_seconds"] * (1 + tolerance), 1.0):
+        found.append(f"DB writes {result['write_seconds']:.2f}s vs {baseline['write_seconds']:.2f}s")
+    return found
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark historical ingestion against the offline Kite stand-in.")
+    parser.add_argument(
+        "--instruments",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Instrument counts to benchmark, one scenario each (default: 1 10 100).",
+    )
+    parser.add_argument("--interval", default="minute", help="Interval to download (default: minute).")
+    parser.add_argument(
+        "--lookback-days",
+        type=int,
+        default=30,
+        help="Calendar days per instrument (default: 30).",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Download workers (default: 4).")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.02,
+        help="Simulated seconds per Kite request (default: 0.02).",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=50.0,
+        help="Historical requests per second allowed by the stand-in and used by the client (default: 50).",
+    )
+    parser.add_argument("--bulk", action="store_true", help="Benchmark the bulk-load writer mode.")
+    parser.add_argument(
+        "--results",
+        default=DEFAULT_RESULTS,
+        help="JSON-lines file the results are appended to (default: data/benchmarks/ingest.jsonl).",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="Allowed fractional regression against the baseline before a scenario fails (default: 0.15).",
+    )
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 when any scenario regresses.")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the results file.")
+    parser.add_argument("--run-scenario", type=int, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--log-level",
+        default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: WARNING).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.run_scenario is not None:
+        print(json.dumps(run_scenario(args)))
+        return
+
+    history = load_history(args.results)
+    revision = git_revision()
+    failed = False
+    results = []
+    print(f"{'instruments':>11} {'bars':>10} {'bars/s':>10} {'peak MB':>8} {'db write s':>10}  status")
+    for instruments in args.instruments:
+        completed = subprocess.run(scenario_command(args, instruments), capture_output=True, text=True)
+        if completed.returncode != 0:
+            sys.stderr.write(completed.stderr)
+            raise RuntimeError(f"Scenario with {instruments} instruments failed.")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result.update(recorded_at=datetime.utcnow().isoformat(timespec="seconds"), revision=revision)
+        baseline = baseline_for(history, result)
+        found = regressions(result, baseline, args.tolerance) if baseline else []
+        status = "no baseline" if baseline is None else ("REGRESSION: " + "; ".join(found) if found else "ok")
+        failed = failed or bool(found)
+        print(
+            f"{instruments:>11} {result['bars']:>10} {result['bars_per_second']:>10.0f} "
+            f"{result['peak_rss_mb']:>8.1f} {result['write_seconds']:>10.2f}  {status}"
+        )
+        results.append(result)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        with open(args.results, "a", encoding="utf-8") as handle:
+            for result in results:
+                handle.write(json.dumps(result) + "\n")
+
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
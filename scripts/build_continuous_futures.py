@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Stitch stored monthly futures into back-adjusted continuous series.
+
+Usage example (NIFTY daily, rolling when the next month's open interest takes over):
+
+    python scripts/build_continuous_futures.py --name NIFTY --roll oi --adjustment ratio
+
+The contracts must already be in ``price_bars`` (download them with
+``fetch_price_history.py --segment NFO-FUT``, which stores open interest). The series is stored as a
+synthetic instrument and registered, so later ``fetch_price_history.py`` runs for the
+same underlying extend it automatically.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.continuous import ADJUSTMENTS, ROLL_RULES, build_continuous, synthetic_symbol  # noqa: E402
+from market_data.schema import INTERVAL_CODES, create_schema  # noqa: E402
+from market_data.shards import attach_shards  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build continuous futures series from stored contracts.")
+    parser.add_argument(
+        "--name",
+        dest="names",
+        action="append",
+        required=True,
+        help="Underlying name as listed in instruments (e.g. NIFTY). Repeat for multiple.",
+    )
+    parser.add_argument(
+        "--interval",
+        default="day",
+        choices=list(INTERVAL_CODES),
+        help="Bar interval to stitch (default: day).",
+    )
+    parser.add_argument("--roll", default="expiry", choices=ROLL_RULES, help="Roll rule (default: expiry).")
+    parser.add_argument(
+        "--adjustment",
+        default="ratio",
+        choices=ADJUSTMENTS,
+        help="Back-adjustment applied at each roll (default: ratio).",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    try:
+        create_schema(conn)
+        attach_shards(conn)
+        for name in args.names:
+            token = build_continuous(conn, name, args.interval, args.roll, args.adjustment)
+            logger.info("%s stored as instrument %s", synthetic_symbol(name, args.roll, args.adjustment), token)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
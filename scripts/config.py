@@ -47,4 +47,7 @@ DELTA_BREACH_THRESHOLD = 0.35
 
 # --- STATE LOGGING ---
 STATE_MONITOR_DURATION_MINUTES = 120  # Total duration to keep polling after entry
-STATE_LOG_INTERVAL_SECONDS = 60       # Poll interval for state snapshots
\ No newline at end of file
+STATE_LOG_INTERVAL_SECONDS = 60       # Poll interval for state snapshots
+# When set, every state snapshot also appends the spot and leg quotes to this tick store
+# (see market_data/ticks.py) at full resolution alongside the CSV state log.
+TICK_STORE_DIRECTORY = None
\ No newline at end of file
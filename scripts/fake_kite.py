@@ -0,0 +1,356 @@
+"""Offline stand-in for the Kite Connect client.
+
+``FakeKite`` implements the subset of ``KiteConnect`` the tools call
+(``instruments``, ``historical_data``, ``quote``, ``ltp`` and ``margins``) against a
+synthetic market, so ingestion can be exercised and benchmarked without a live
+session. Prices are a deterministic function of (instrument, timestamp), which means
+overlapping or repeated requests agree with each other just like the real API.
+
+Latency, the historical API quota and transient failures are configurable and
+surface as the same ``kiteconnect.exceptions`` types the real client raises.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Union
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from kiteconnect import exceptions as kite_exceptions
+
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+SESSION_OPEN = dt_time(9, 15)
+SESSION_MINUTES = 375
+
+# Longest range Kite serves per historical request, by interval.
+MAX_DAYS_PER_REQUEST = {
+    "minute": 60,
+    "3minute": 100,
+    "5minute": 100,
+    "10minute": 100,
+    "15minute": 200,
+    "30minute": 200,
+    "60minute": 400,
+    "day": 2000,
+}
+INTERVAL_MINUTES = {
+    "minute": 1,
+    "3minute": 3,
+    "5minute": 5,
+    "10minute": 10,
+    "15minute": 15,
+    "30minute": 30,
+    "60minute": 60,
+}
+
+INDICES = (
+    (256265, "NIFTY 50", "NIFTY", 24000.0, 50),
+    (260105, "NIFTY BANK", "BANKNIFTY", 52000.0, 100),
+)
+
+DateLike = Union[datetime, date, str]
+
+
+def _parse_datetime(value: DateLike) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, dt_time())
+    if value.tzinfo is not None:
+        value = value.astimezone(MARKET_TZ).replace(tzinfo=None)
+    return value
+
+
+def _monthly_expiries(today: date, count: int) -> List[date]:
+    """Last Thursday of the next ``count`` months, starting with the current one."""
+    expiries = []
+    year, month = today.year, today.month
+    while len(expiries) < count:
+        next_month = date(year + month // 12, month % 12 + 1, 1)
+        last = next_month - timedelta(days=1)
+        expiry = last - timedelta(days=(last.weekday() - 3) % 7)
+        if expiry >= today:
+            expiries.append(expiry)
+        year, month = next_month.year, next_month.month
+    return expiries
+
+
+def synthetic_instruments(equities: int = 200, expiries: int = 3, strikes: int = 20, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """A dump shaped like ``kite.instruments()`` with indices, equities and index derivatives."""
+    today = today or datetime.now(MARKET_TZ).date()
+    rows: List[Dict[str, Any]] = []
+
+    def add(token: int, symbol: str, name: str, segment: str, exchange: str, **extra: Any) -> None:
+        row = {
+            "instrument_token": token,
+            "exchange_token": token >> 8,
+            "tradingsymbol": symbol,
+            "name": name,
+            "last_price": 0.0,
+            "expiry": "",
+            "strike": 0.0,
+            "tick_size": 0.05,
+            "lot_size": 1,
+            "instrument_type": "EQ",
+            "segment": segment,
+            "exchange": exchange,
+        }
+        row.update(extra)
+        rows.append(row)
+
+    for token, symbol, _, _, _ in INDICES:
+        add(token, symbol, symbol, "INDICES", "NSE", tick_size=0.0, instrument_type="EQ")
+    for i in range(equities):
+        add(1_000_000 + i * 256 + 1, f"STOCK{i:04d}", f"SYNTHETIC STOCK {i:04d}", "NSE", "NSE")
+
+    token = 10_000_000
+    for _, _, underlying, spot, step in INDICES:
+        atm = round(spot / step) * step
+        for expiry in _monthly_expiries(today, expiries):
+            tag = expiry.strftime("%y%b").upper()
+            token += 256
+            add(token, f"{underlying}{tag}FUT", underlying, "NFO-FUT", "NFO", expiry=expiry, lot_size=25, instrument_type="FUT")
+            for k in range(-strikes // 2, strikes // 2 + 1):
+                strike = atm + k * step
+                for option_type in ("CE", "PE"):
+                    token += 256
+                    add(
+                        token,
+                        f"{underlying}{tag}{int(strike)}{option_type}",
+                        underlying,
+                        "NFO-OPT",
+                        "NFO",
+                        expiry=expiry,
+                        strike=float(strike),
+                        lot_size=25,
+                        instrument_type=option_type,
+                    )
+    return rows
+
+
+class FakeKite:
+    """Synthetic ``KiteConnect`` replacement.
+
+    ``latency`` (seconds, with +/-``jitter`` fraction) is slept on every call.
+    ``historical_rate_limit`` caps historical requests per second across threads the
+    way Kite does and raises ``NetworkException`` (HTTP 429) beyond it. ``error_rate``
+    is the probability that a call fails with a transient ``NetworkException``.
+    """
+
+    def __init__(
+        self,
+        instruments: Optional[Sequence[Dict[str, Any]]] = None,
+        latency: float = 0.0,
+        jitter: float = 0.25,
+        historical_rate_limit: Optional[float] = 3.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        now: Optional[datetime] = None,
+    ) -> None:
+        self._instruments = list(instruments) if instruments is not None else synthetic_instruments()
+        self._by_token = {int(row["instrument_token"]): row for row in self._instruments}
+        self._by_key = {f"{row['exchange']}:{row['tradingsymbol']}": row for row in self._instruments}
+        self.latency = latency
+        self.jitter = jitter
+        self.historical_rate_limit = historical_rate_limit
+        self.error_rate = error_rate
+        self.now = now
+        self.calls: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent: Deque[float] = deque()
+
+    # -- plumbing -----------------------------------------------------------------
+
+    def _call(self, endpoint: str, rate_limited: bool = False) -> None:
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            failed = self._random.random() < self.error_rate
+            delay = self.latency * (1 + self.jitter * (2 * self._random.random() - 1))
+            if rate_limited and self.historical_rate_limit:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.historical_rate_limit:
+                    raise kite_exceptions.NetworkException("Too many requests", code=429)
+                self._recent.append(now)
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise kite_exceptions.NetworkException("Gateway timed out", code=504)
+
+    def _now(self) -> datetime:
+        return self.now or datetime.now(MARKET_TZ).replace(tzinfo=None)
+
+    def _instrument(self, key: Union[int, str]) -> Dict[str, Any]:
+        key = str(key)
+        row = self._by_key.get(key)
+        if row is None and key.isdigit():
+            row = self._by_token.get(int(key))
+        if row is None:
+            raise kite_exceptions.InputException(f"Invalid instrument: {key}")
+        return row
+
+    @staticmethod
+    def _base_price(row: Dict[str, Any]) -> float:
+        for token, _, underlying, spot, _ in INDICES:
+            if row["instrument_token"] == token:
+                return spot
+            if row.get("name") == underlying and row.get("instrument_type") == "FUT":
+                return spot * 1.004
+            if row.get("name") == underlying and row.get("instrument_type") in ("CE", "PE"):
+                intrinsic = spot - row["strike"] if row["instrument_type"] == "CE" else row["strike"] - spot
+                return max(intrinsic, 0.0) + spot * 0.01
+        return 50.0 + (int(row["instrument_token"]) * 7919) % 4000
+
+    def _minute_path(self, row: Dict[str, Any], day: date) -> np.ndarray:
+        """Deterministic close for each of the day's 375 one-minute bars."""
+        token = int(row["instrument_token"])
+        ordinal = day.toordinal()
+        level = self._base_price(row) * np.exp(0.08 * np.sin(ordinal / 23.0 + token % 97) + 0.03 * np.sin(ordinal / 5.0))
+        rng = np.random.default_rng((token, ordinal))
+        steps = rng.normal(0.0, 0.0006, SESSION_MINUTES)
+        return level * np.exp(np.cumsum(steps))
+
+    def _session_bars(self, row: Dict[str, Any], day: date, interval: str, oi: bool) -> List[Dict[str, Any]]:
+        closes = self._minute_path(row, day)
+        opens = np.r_[closes[0] / np.exp(0.0003), closes[:-1]]
+        spread = np.abs(np.random.default_rng((int(row["instrument_token"]), day.toordinal(), 1)).normal(0, 0.0004, SESSION_MINUTES))
+        highs = np.maximum(opens, closes) * (1 + spread)
+        lows = np.minimum(opens, closes) * (1 - spread)
+        is_index = row.get("segment") == "INDICES"
+        volumes = np.zeros(SESSION_MINUTES) if is_index else np.floor(1000 + 4000 * np.abs(np.sin(np.arange(SESSION_MINUTES) / 40.0)))
+        open_interest = np.floor(100000 + np.arange(SESSION_MINUTES) * 37) if oi and row.get("segment", "").startswith("NFO") else np.zeros(SESSION_MINUTES)
+
+        width = SESSION_MINUTES if interval == "day" else INTERVAL_MINUTES[interval]
+        starts = np.arange(0, SESSION_MINUTES, width)
+        ends = np.r_[starts[1:], SESSION_MINUTES] - 1
+        bucket_open = opens[starts]
+        bucket_high = np.maximum.reduceat(highs, starts)
+        bucket_low = np.minimum.reduceat(lows, starts)
+        bucket_close = closes[ends]
+        bucket_volume = np.add.reduceat(volumes, starts)
+        bucket_oi = open_interest[ends]
+
+        tick = float(row.get("tick_size") or 0.05)
+        prices = np.round(np.round(np.c_[bucket_open, bucket_high, bucket_low, bucket_close] / tick) * tick, 2)
+        if interval == "day":
+            stamps = [datetime.combine(day, dt_time(), tzinfo=MARKET_TZ)]
+        else:
+            session_start = datetime.combine(day, SESSION_OPEN, tzinfo=MARKET_TZ)
+            stamps = [session_start + timedelta(minutes=offset) for offset in starts.tolist()]
+        bars = []
+        for stamp, (o, h, l, c), volume, open_interest_value in zip(
+            stamps, prices.tolist(), bucket_volume.astype(int).tolist(), bucket_oi.astype(int).tolist()
+        ):
+            bar = {"date": stamp, "open": o, "high": h, "low": l, "close": c, "volume": volume}
+            if oi:
+                bar["oi"] = open_interest_value
+            bars.append(bar)
+        return bars
+
+    def _last_price(self, row: Dict[str, Any]) -> float:
+        now = self._now()
+        day = now.date()
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        minute = int((now - datetime.combine(now.date(), SESSION_OPEN)).total_seconds() // 60)
+        minute = min(max(minute, 0), SESSION_MINUTES - 1) if day == now.date() else SESSION_MINUTES - 1
+        return round(float(self._minute_path(row, day)[minute]), 2)
+
+    # -- KiteConnect API ----------------------------------------------------------
+
+    def instruments(self, exchange: Optional[str] = None) -> List[Dict[str, Any]]:
+        self._call("instruments")
+        if exchange:
+            return [dict(row) for row in self._instruments if row["exchange"] == exchange]
+        return [dict(row) for row in self._instruments]
+
+    def historical_data(
+        self,
+        instrument_token: Union[int, str],
+        from_date: DateLike,
+        to_date: DateLike,
+        interval: str,
+        continuous: bool = False,
+        oi: bool = False,
+    ) -> List[Dict[str, Any]]:
+        self._call("historical_data", rate_limited=True)
+        if interval not in MAX_DAYS_PER_REQUEST:
+            raise kite_exceptions.InputException(f"Invalid interval: {interval}")
+        row = self._instrument(instrument_token)
+        start, end = _parse_datetime(from_date), min(_parse_datetime(to_date), self._now())
+        if (end - start).days > MAX_DAYS_PER_REQUEST[interval]:
+            raise kite_exceptions.InputException("interval exceeds max limit: too many days requested")
+
+        bars: List[Dict[str, Any]] = []
+        day = start.date()
+        while day <= end.date():
+            if day.weekday() < 5:
+                for bar in self._session_bars(row, day, interval, oi):
+                    stamp = bar["date"].replace(tzinfo=None)
+                    if start <= stamp <= end:
+                        bars.append(bar)
+            day += timedelta(days=1)
+        return bars
+
+    def ltp(self, instruments: Union[str, int, Iterable[Union[str, int]]]) -> Dict[str, Dict[str, Any]]:
+        self._call("ltp")
+        keys = [instruments] if isinstance(instruments, (str, int)) else list(instruments)
+        out = {}
+        for key in keys:
+            row = self._instrument(key)
+            out[str(key)] = {"instrument_token": row["instrument_token"], "last_price": self._last_price(row)}
+        return out
+
+    def quote(self, instruments: Union[str, int, Iterable[Union[str, int]]]) -> Dict[str, Dict[str, Any]]:
+        self._call("quote")
+        keys = [instruments] if isinstance(instruments, (str, int)) else list(instruments)
+        out = {}
+        for key in keys:
+            row = self._instrument(key)
+            last_price = self._last_price(row)
+            previous = self._previous_close(row)
+            out[str(key)] = {
+                "instrument_token": row["instrument_token"],
+                "timestamp": self._now(),
+                "last_trade_time": self._now(),
+                "last_price": last_price,
+                "last_quantity": 1,
+                "volume": 0 if row.get("segment") == "INDICES" else 150000,
+                "average_price": last_price,
+                "oi": 100000 if row.get("segment", "").startswith("NFO") else 0,
+                "net_change": round(last_price - previous, 2),
+                "ohlc": {"open": previous, "high": max(previous, last_price), "low": min(previous, last_price), "close": previous},
+                "depth": {
+                    "buy": [{"price": round(last_price - 0.05 * (i + 1), 2), "quantity": 100, "orders": 1} for i in range(5)],
+                    "sell": [{"price": round(last_price + 0.05 * (i + 1), 2), "quantity": 100, "orders": 1} for i in range(5)],
+                },
+            }
+        return out
+
+    def _previous_close(self, row: Dict[str, Any]) -> float:
+        day = self._now().date() - timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return round(float(self._minute_path(row, day)[-1]), 2)
+
+    def margins(self, segment: Optional[str] = None) -> Dict[str, Any]:
+        self._call("margins")
+        equity = {
+            "enabled": True,
+            "net": 500000.0,
+            "available": {"adhoc_margin": 0.0, "cash": 500000.0, "opening_balance": 500000.0, "live_balance": 500000.0, "collateral": 0.0, "intraday_payin": 0.0},
+            "utilised": {"debits": 0.0, "exposure": 0.0, "m2m_realised": 0.0, "m2m_unrealised": 0.0, "option_premium": 0.0, "payout": 0.0, "span": 0.0, "holding_sales": 0.0, "turnover": 0.0},
+        }
+        commodity = dict(equity, net=0.0, available=dict(equity["available"], cash=0.0, opening_balance=0.0, live_balance=0.0))
+        if segment == "equity":
+            return equity
+        if segment == "commodity":
+            return commodity
+        return {"equity": equity, "commodity": commodity}
@@ -5,7 +5,16 @@ Usage example (fetch last year of NIFTY 50 daily data):
 
     python scripts/fetch_price_history.py
 
-Provide additional instruments by repeating the --instrument flag.
+Provide additional instruments by repeating the --instrument flag. Large
+backfills can be parallelised with --workers; every worker shares a single
+token bucket so the combined request rate stays within the historical API
+quota (--rate-limit requests per second). Download ``minute`` bars with --rollup
+to derive the higher intervals locally instead of requesting each one.
+
+During market hours --daemon keeps a watchlist current instead of exiting:
+
+    python scripts/fetch_price_history.py --daemon --interval minute \
+        --instrument "NIFTY 50" --instrument "NIFTY BANK"
 """
 
 from __future__ import annotations
@@ -13,168 +22,431 @@ from __future__ import annotations
 import argparse
 import logging
 import os
+import queue
+import random
+import signal
 import sqlite3
 import sys
-from datetime import datetime, timedelta
-from typing import Any, Dict, Iterable, List, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
     sys.path.append(ROOT)
 
-from env_loader import get_kite_config
-from kite_token_manager import KiteTokenManager
+from kiteconnect import exceptions as kite_exceptions
+
+from market_data.chunks import pack_series
+from market_data.continuous import refresh_continuous
+from market_data.coverage import advance_coverage, mark_rewritten, refresh_coverage
+from market_data.instruments import upsert_instrument
+from market_data.maintenance import JOURNAL_SIZE_LIMIT, checkpoint, run_maintenance
+from market_data.quality import last_close_before, record_chunk_quality, refresh_quality, validate_chunk
+from market_data.rollup import ROLLUP_INTERVALS, rollup_series
+from market_data.schema import (
+    INTERVAL_CODES,
+    SESSION_DATE_SQL,
+    create_schema,
+    day_start_epoch,
+    from_epoch,
+    interval_code,
+    to_epoch,
+)
+from market_data.shards import attach_shards, bars_table, bars_tables, series_table
+from scripts.instrument_catalogue import DEFAULT_CACHE_DIR, InstrumentIndex, load_catalogue
 
 
 logger = logging.getLogger(__name__)
 
+# Kite Connect allows 3 historical data requests per second per API key.
+HISTORICAL_RATE_LIMIT = 3.0
+
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+
+SESSION_OPEN = dt_time(9, 15)
+SESSION_CLOSE = dt_time(15, 30)
+
+DateRange = Tuple[datetime, datetime]
+ChunkSink = Callable[[DateRange, List[Dict[str, Any]]], None]
+
+# Errors that will not go away by retrying the same request.
+NON_RETRYABLE_ERRORS = (
+    kite_exceptions.TokenException,
+    kite_exceptions.PermissionException,
+    kite_exceptions.InputException,
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker issuing API requests.
+
+    ``capacity`` defaults to a single token, so requests are spaced at least
+    ``1 / rate`` apart. A larger bucket lets a burst through after an idle moment,
+    which Kite answers with HTTP 429.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        if tokens > self.capacity:
+            raise ValueError(f"cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+@dataclass
+class DownloadStats:
+    """Counters aggregated across workers for the end-of-run throughput report."""
+
+    requests: int = 0
+    retries: int = 0
+    bars: int = 0
+    completed: int = 0
+    write_seconds: float = 0.0
+    failed: List[str] = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_request(self, bars: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bars += bars
+
+    def add_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"{self.completed} instruments ok, {len(self.failed)} failed, "
+            f"{self.bars} bars in {self.requests} requests ({self.retries} retries) "
+            f"over {elapsed:.1f}s: {self.bars / elapsed:.1f} bars/s, {self.requests / elapsed:.2f} requests/s; "
+            f"{self.write_seconds:.1f}s in database writes"
+        )
+
+
+def connect_db(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    # Takes effect for a new file (it must precede WAL mode) or at the next VACUUM, and
+    # lets market_data.maintenance hand freed pages back incrementally.
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+    conn.execute("PRAGMA journal_mode=WAL;")
+    # Without a limit the WAL file keeps its high-water size after every checkpoint.
+    conn.execute(f"PRAGMA journal_size_limit={JOURNAL_SIZE_LIMIT};")
+    attach_shards(conn)
+    return conn
+
 
 def init_db(db_path: str) -> sqlite3.Connection:
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute(
+    conn = connect_db(db_path)
+    create_schema(conn)
+    return conn
+
+
+def write_validated_bars(
+    conn: sqlite3.Connection,
+    table: str,
+    instrument_token: int,
+    interval: str,
+    rows: Iterable[Dict[str, Any]],
+    previous_close: Optional[float] = None,
+) -> int:
+    """Validate a chunk, write its accepted bars to ``table`` and record the rest.
+
+    ``previous_close`` is the close the chunk's first bar is spike-checked against;
+    by default the last stored close before the chunk.
+    """
+    code = interval_code(interval)
+    rows = list(rows)
+    first = to_epoch(rows[0]["date"]) if rows else None
+    if rows and previous_close is None:
+        previous_close = last_close_before(conn, instrument_token, code, first)
+    chunk = validate_chunk(rows, previous_close)
+    conflict = (
         """
-        CREATE TABLE IF NOT EXISTS instruments (
-            instrument_token INTEGER PRIMARY KEY,
-            tradingsymbol TEXT,
-            name TEXT,
-            segment TEXT,
-            exchange TEXT,
-            lot_size INTEGER,
-            expiry TEXT,
-            last_refreshed TEXT
-        )
+        ON CONFLICT(instrument_token, interval, timestamp) DO UPDATE SET
+            open=excluded.open,
+            high=excluded.high,
+            low=excluded.low,
+            close=excluded.close,
+            volume=excluded.volume,
+            oi=excluded.oi
         """
+        if table == "price_bars"
+        else ""
+    )
+    if table == "price_bars":
+        table = bars_table(conn, code)
+        if rows:
+            mark_rewritten(conn, instrument_token, code, first)
+    cursor = conn.executemany(
+        f"""
+        INSERT INTO {table} (
+            instrument_token, interval, timestamp, open, high, low, close, volume, oi
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        {conflict}
+        """,
+        chunk.bar_rows(instrument_token, code),
     )
+    record_chunk_quality(conn, instrument_token, code, chunk)
+    if chunk.flags.any() or chunk.duplicates:
+        logger.debug("Quality issues for %s %s: %s", instrument_token, interval, chunk.counts())
+    return max(cursor.rowcount, 0)
+
+
+def upsert_price_bars(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    rows: Iterable[Dict[str, Any]],
+) -> int:
+    return write_validated_bars(conn, "price_bars", instrument_token, interval, rows)
+
+
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA synchronous=OFF;",
+    "PRAGMA cache_size=-262144;",  # 256 MiB page cache for the loader connection only
+    "PRAGMA temp_store=MEMORY;",
+)
+
+
+def ensure_staging_table(conn: sqlite3.Connection) -> None:
+    """Create the unindexed staging table used by bulk loads.
+
+    It is a regular table rather than a TEMP one so rows staged by an interrupted
+    load are merged by the next bulk run instead of being lost.
+    """
     conn.execute(
         """
-        CREATE TABLE IF NOT EXISTS price_bars (
+        CREATE TABLE IF NOT EXISTS price_bars_staging (
             instrument_token INTEGER NOT NULL,
-            interval TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
+            interval INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
             open REAL,
             high REAL,
             low REAL,
             close REAL,
             volume REAL,
-            oi REAL,
-            PRIMARY KEY (instrument_token, interval, timestamp),
-            FOREIGN KEY (instrument_token) REFERENCES instruments(instrument_token)
+            oi REAL
         )
         """
     )
-    return conn
 
 
-def upsert_instrument(conn: sqlite3.Connection, instrument: Dict[str, Any]) -> None:
-    conn.execute(
-        """
-        INSERT INTO instruments (
-            instrument_token, tradingsymbol, name, segment, exchange, lot_size, expiry, last_refreshed
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(instrument_token) DO UPDATE SET
-            tradingsymbol=excluded.tradingsymbol,
-            name=excluded.name,
-            segment=excluded.segment,
-            exchange=excluded.exchange,
-            lot_size=excluded.lot_size,
-            expiry=excluded.expiry,
-            last_refreshed=excluded.last_refreshed
-        """,
-        (
-            instrument["instrument_token"],
-            instrument.get("tradingsymbol"),
-            instrument.get("name"),
-            instrument.get("segment"),
-            instrument.get("exchange"),
-            instrument.get("lot_size"),
-            instrument.get("expiry"),
-            datetime.utcnow().isoformat(),
-        ),
-    )
-
-
-def upsert_price_bars(
+def stage_price_bars(
     conn: sqlite3.Connection,
     instrument_token: int,
     interval: str,
     rows: Iterable[Dict[str, Any]],
+    previous_close: Optional[float] = None,
 ) -> int:
-    payload: List[tuple] = []
-    for row in rows:
-        timestamp = row.get("date")
-        if isinstance(timestamp, datetime):
-            timestamp_iso = timestamp.isoformat()
-        else:
-            timestamp_iso = str(timestamp)
-        payload.append(
-            (
-                instrument_token,
-                interval,
-                timestamp_iso,
-                row.get("open"),
-                row.get("high"),
-                row.get("low"),
-                row.get("close"),
-                row.get("volume"),
-                row.get("oi"),
+    """Validate a chunk into the staging table.
+
+    Staged bars are not visible to :func:`last_close_before` until the merge, so bulk
+    loads pass the close of the series' previous staged chunk as ``previous_close``.
+    """
+    return write_validated_bars(conn, "price_bars_staging", instrument_token, interval, rows, previous_close)
+
+
+def merge_staging(conn: sqlite3.Connection) -> int:
+    """Merge every staged row into price_bars with one set-based upsert and empty the stage.
+
+    Rows are merged in primary-key order so the index is appended to sequentially; a
+    sharded database gets one upsert per shard.
+    """
+    # Same transaction as the upsert, like write_validated_bars for direct writes.
+    staged = conn.execute(
+        "SELECT instrument_token, interval, MIN(timestamp) FROM price_bars_staging GROUP BY instrument_token, interval"
+    ).fetchall()
+    for instrument_token, code, since in staged:
+        mark_rewritten(conn, instrument_token, code, since)
+    merged = 0
+    for table, codes in bars_tables(conn):
+        where = "true" if codes is None else f"interval IN ({','.join(map(str, codes))})"
+        cursor = conn.execute(
+            f"""
+            INSERT INTO {table} (
+                instrument_token, interval, timestamp, open, high, low, close, volume, oi
             )
+            SELECT instrument_token, interval, timestamp, open, high, low, close, volume, oi
+            FROM price_bars_staging
+            WHERE {where}
+            ORDER BY instrument_token, interval, timestamp
+            ON CONFLICT(instrument_token, interval, timestamp) DO UPDATE SET
+                open=excluded.open,
+                high=excluded.high,
+                low=excluded.low,
+                close=excluded.close,
+                volume=excluded.volume,
+                oi=excluded.oi
+            """
         )
+        merged += max(cursor.rowcount, 0)
+    conn.execute("DELETE FROM price_bars_staging")
+    conn.commit()
+    return merged
+
+
+def market_now() -> datetime:
+    """Current exchange-local time as a naive datetime, matching what Kite expects."""
+    return datetime.now(MARKET_TZ).replace(tzinfo=None)
 
-    if not payload:
-        return 0
 
+def record_sessions(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    ranges: Sequence[DateRange],
+) -> None:
+    """Update the per-session coverage map for every session fully covered by ``ranges``."""
+    if not ranges:
+        return
+    code = interval_code(interval)
+    start = min(r[0] for r in ranges).date()
+    end = max(r[1] for r in ranges).date()
+    counts = dict(
+        conn.execute(
+            f"""
+            SELECT {SESSION_DATE_SQL}, COUNT(*)
+            FROM price_bars
+            WHERE instrument_token = ? AND interval = ? AND timestamp >= ? AND timestamp < ?
+            GROUP BY 1
+            """,
+            (instrument_token, code, day_start_epoch(start), day_start_epoch(end + timedelta(days=1))),
+        ).fetchall()
+    )
+    payload = []
+    for range_start, range_end in ranges:
+        for session in trading_days(range_start.date(), range_end.date()):
+            # Sessions cut by a chunk boundary or still trading are left for a later request.
+            if range_start > datetime.combine(session, SESSION_OPEN):
+                continue
+            if range_end < datetime.combine(session, SESSION_CLOSE):
+                continue
+            payload.append((instrument_token, code, session.isoformat(), counts.get(session.isoformat(), 0)))
     conn.executemany(
-        """
-        INSERT INTO price_bars (
-            instrument_token, interval, timestamp, open, high, low, close, volume, oi
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(instrument_token, interval, timestamp) DO UPDATE SET
-            open=excluded.open,
-            high=excluded.high,
-            low=excluded.low,
-            close=excluded.close,
-            volume=excluded.volume,
-            oi=excluded.oi
+        f"""
+        INSERT INTO {series_table(conn, "series_sessions", code)} (instrument_token, interval, session_date, bar_count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval, session_date) DO UPDATE SET
+            bar_count=excluded.bar_count
         """,
         payload,
     )
-    return len(payload)
+
+
+def bootstrap_sessions(conn: sqlite3.Connection, instrument_token: int, interval: str) -> None:
+    """Seed the coverage map from bars stored before coverage tracking existed."""
+    code = interval_code(interval)
+    conn.execute(
+        f"""
+        INSERT OR IGNORE INTO {series_table(conn, "series_sessions", code)} (instrument_token, interval, session_date, bar_count)
+        SELECT instrument_token, interval, {SESSION_DATE_SQL}, COUNT(*)
+        FROM price_bars
+        WHERE instrument_token = ? AND interval = ?
+        GROUP BY 3
+        """,
+        (instrument_token, code),
+    )
+    refresh_coverage(conn, instrument_token, interval)
+
+
+def trading_days(start: date, end: date) -> Iterable[date]:
+    """Weekdays between ``start`` and ``end`` inclusive; holidays are learnt from empty responses."""
+    current = start
+    while current <= end:
+        if current.weekday() < 5:
+            yield current
+        current += timedelta(days=1)
+
+
+def plan_incremental_ranges(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    lookback_days: int,
+) -> List[DateRange]:
+    """Return the date ranges still missing for a series inside the lookback window.
+
+    The session holding the high-water mark is always requested again because it may
+    have been stored while the market was still open.
+    """
+    code = interval_code(interval)
+    row = conn.execute(
+        "SELECT last_timestamp FROM series_coverage WHERE instrument_token = ? AND interval = ?",
+        (instrument_token, code),
+    ).fetchone()
+    if row is None:
+        bootstrap_sessions(conn, instrument_token, interval)
+        row = conn.execute(
+            "SELECT last_timestamp FROM series_coverage WHERE instrument_token = ? AND interval = ?",
+            (instrument_token, code),
+        ).fetchone()
+    high_water_mark = row[0] if row else None
+
+    now = market_now()
+    window_start = (now - timedelta(days=lookback_days)).date()
+    known = {
+        session
+        for (session,) in conn.execute(
+            """
+            SELECT session_date FROM series_sessions
+            WHERE instrument_token = ? AND interval = ? AND session_date >= ?
+            """,
+            (instrument_token, code, window_start.isoformat()),
+        )
+    }
+    if high_water_mark is not None:
+        known.discard(from_epoch(high_water_mark).date().isoformat())
+
+    missing = [day for day in trading_days(window_start, now.date()) if day.isoformat() not in known]
+
+    ranges: List[DateRange] = []
+    for day in missing:
+        start = datetime.combine(day, dt_time.min)
+        end = min(datetime.combine(day, dt_time(23, 59, 59)), now)
+        if ranges and all(
+            gap.weekday() >= 5 for gap in _dates_between(ranges[-1][1].date(), day)
+        ):
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _dates_between(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=offset) for offset in range(1, (end - start).days)]
 
 
 def resolve_instrument(
-    catalogue: List[Dict[str, Any]],
+    index: InstrumentIndex,
     identifier: str,
     segment: Optional[str],
     exchange: Optional[str],
 ) -> Dict[str, Any]:
-    identifier_upper = identifier.upper()
-    matches = []
-    for item in catalogue:
-        tradingsymbol = str(item.get("tradingsymbol", "")).upper()
-        name = str(item.get("name", "")).upper()
-        if identifier_upper not in {tradingsymbol, name}:
-            continue
-        if segment and item.get("segment") != segment:
-            continue
-        if exchange and item.get("exchange") not in (None, "", exchange):
-            continue
-        matches.append(item)
-
-    if not matches:
-        raise ValueError(
-            f"Instrument '{identifier}' not found. Try specifying --segment/--exchange "
-            "or provide the instrument token directly."
-        )
-
-    if len(matches) > 1:
-        logger.warning(
-            "Multiple matches found for %s; selecting the first one: %s",
-            identifier,
-            matches[0],
-        )
-    return matches[0]
+    return index.resolve(identifier, segment, exchange)
 
 
 def resolve_chunk_days(interval: str, override: Optional[int]) -> int:
@@ -193,6 +465,44 @@ def resolve_chunk_days(interval: str, override: Optional[int]) -> int:
     return defaults.get(interval, 120)
 
 
+def request_historical(
+    kite,
+    limiter: Optional[TokenBucket],
+    stats: Optional[DownloadStats],
+    max_retries: int,
+    **params: Any,
+) -> List[Dict[str, Any]]:
+    """Issue one historical_data call under the shared rate limit, retrying transient failures."""
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            batch = kite.historical_data(**params)
+        except NON_RETRYABLE_ERRORS:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            if attempt >= max_retries:
+                raise
+            attempt += 1
+            if stats is not None:
+                stats.add_retry()
+            delay = min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+            logger.warning(
+                "historical_data failed for %s (%s); retry %s/%s in %.1fs",
+                params.get("instrument_token"),
+                exc,
+                attempt,
+                max_retries,
+                delay,
+            )
+            time.sleep(delay)
+            continue
+        if stats is not None:
+            stats.add_request(len(batch))
+        return batch
+
+
 def historical_data_chunked(
     kite,
     instrument_token: int,
@@ -200,8 +510,11 @@ def historical_data_chunked(
     from_date: datetime,
     to_date: datetime,
     chunk_days: int,
-):
-    results: List[Dict[str, Any]] = []
+    limiter: Optional[TokenBucket] = None,
+    stats: Optional[DownloadStats] = None,
+    max_retries: int = 0,
+) -> Iterator[Tuple[DateRange, List[Dict[str, Any]]]]:
+    """Yield ``((chunk_start, chunk_end), bars)`` for each request as soon as it returns."""
     current_start = from_date
     delta = timedelta(days=chunk_days)
 
@@ -210,7 +523,11 @@ def historical_data_chunked(
         logger.debug(
             "Requesting %s to %s (%s)", current_start.isoformat(), current_end.isoformat(), interval
         )
-        batch = kite.historical_data(
+        batch = request_historical(
+            kite,
+            limiter,
+            stats,
+            max_retries,
             instrument_token=instrument_token,
             from_date=current_start,
             to_date=current_end,
@@ -218,12 +535,309 @@ def historical_data_chunked(
             continuous=False,
             oi=True,
         )
-        results.extend(batch)
+        yield (current_start, current_end), batch
         if current_end == to_date:
             break
         # Move start forward by one minute to avoid duplicate candles on boundary
         current_start = current_end + timedelta(minutes=1)
-    return results
+
+
+def instrument_label(instrument: Dict[str, Any]) -> str:
+    return str(instrument.get("tradingsymbol") or instrument.get("name") or instrument.get("instrument_token"))
+
+
+def lookback_range(lookback_days: int) -> List[DateRange]:
+    to_date = datetime.utcnow()
+    return [(to_date - timedelta(days=lookback_days), to_date)]
+
+
+def stream_bars(
+    kite,
+    instrument: Dict[str, Any],
+    interval: str,
+    ranges: Sequence[DateRange],
+    chunk_days: int,
+    sink: ChunkSink,
+    limiter: Optional[TokenBucket] = None,
+    stats: Optional[DownloadStats] = None,
+    max_retries: int = 0,
+) -> int:
+    """Download ``ranges`` chunk by chunk, handing each chunk to ``sink`` before the next request."""
+    instrument_token = int(instrument["instrument_token"])
+    downloaded = 0
+    for from_date, to_date in ranges:
+        logger.info(
+            "Fetching %s (%s) data from %s to %s",
+            instrument_label(instrument),
+            interval,
+            from_date.date(),
+            to_date.date(),
+        )
+        for chunk_range, batch in historical_data_chunked(
+            kite,
+            instrument_token=instrument_token,
+            interval=interval,
+            from_date=from_date,
+            to_date=to_date,
+            chunk_days=chunk_days,
+            limiter=limiter,
+            stats=stats,
+            max_retries=max_retries,
+        ):
+            downloaded += len(batch)
+            sink(chunk_range, batch)
+    return downloaded
+
+
+def store_chunk(
+    conn: sqlite3.Connection,
+    instrument: Dict[str, Any],
+    interval: str,
+    chunk_range: DateRange,
+    bars: Iterable[Dict[str, Any]],
+) -> int:
+    """Write one downloaded chunk and its session coverage in a single transaction.
+
+    The instrument row must already exist (callers upsert it once per series), so in a
+    sharded database the transaction only touches the shard holding ``interval``.
+    """
+    instrument_token = int(instrument["instrument_token"])
+    try:
+        count = upsert_price_bars(conn, instrument_token, interval, bars)
+        record_sessions(conn, instrument_token, interval, [chunk_range])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def finish_series(conn: sqlite3.Connection, instrument_token: int, interval: str) -> None:
+    # write_validated_bars already marked rewritten bars.
+    refresh_coverage(conn, instrument_token, interval, rewritten=False)
+    refresh_quality(conn, instrument_token, interval)
+    conn.commit()
+
+
+class WriterError(RuntimeError):
+    """Raised by :class:`BarWriter` calls once its thread has stopped on an error."""
+
+
+class BarWriter:
+    """Dedicated SQLite writer thread fed through a bounded queue.
+
+    Download workers block in :meth:`put` once ``max_pending`` chunks are waiting,
+    so peak memory stays flat whatever the lookback. Every chunk is committed on
+    its own, which means an interrupted run keeps all chunks written so far.
+
+    Every series whose :meth:`finish` has been handled is reported on ``finished`` as
+    ``(instrument_token, interval, error)`` once its bars are committed (after the
+    merge in bulk mode), with ``error`` None unless writing the series failed.
+
+    A failure of one series is recorded in ``errors`` and the writer carries on. A
+    failure of the writer itself (opening the database, the bulk merge) stops the
+    thread; :meth:`put`, :meth:`finish` and :meth:`close` then raise
+    :class:`WriterError` instead of waiting on a queue nobody drains.
+
+    With ``bulk=True`` the connection is tuned for loading, chunks are appended to
+    the unindexed ``price_bars_staging`` table and merged into ``price_bars`` with a
+    single statement when the writer is closed. Session coverage and high-water
+    marks are recorded after that merge.
+    """
+
+    _FINISH = "finish"
+    _STOP = object()
+    _POLL_SECONDS = 0.5
+
+    def __init__(self, db_path: str, max_pending: int = 8, bulk: bool = False) -> None:
+        self.db_path = db_path
+        self.bulk = bulk
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        self.errors: Dict[int, str] = {}
+        self.fatal: Optional[Exception] = None
+        self.finished: "queue.Queue[Tuple[int, str, Optional[str]]]" = queue.Queue()
+        self._staged: Dict[Tuple[int, str], List[DateRange]] = {}
+        # Last staged (timestamp, close) per series, the reference for its next chunk.
+        self._staged_closes: Dict[Tuple[int, str], Tuple[int, float]] = {}
+        self._finishing: List[Tuple[int, str]] = []
+        # Instruments upserted by this writer; once per token is enough.
+        self._instruments: Set[int] = set()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_pending))
+        self._thread = threading.Thread(target=self._run, name="bar-writer", daemon=True)
+        self._thread.start()
+
+    def put(
+        self,
+        instrument: Dict[str, Any],
+        interval: str,
+        chunk_range: DateRange,
+        bars: List[Dict[str, Any]],
+    ) -> None:
+        self._enqueue((instrument, interval, chunk_range, bars))
+
+    def finish(self, instrument: Dict[str, Any], interval: str) -> None:
+        """Queue the high-water-mark refresh for a series after its last chunk."""
+        self._enqueue((instrument, interval, self._FINISH, None))
+
+    def close(self) -> None:
+        """Drain the queue and stop the writer thread; raises :class:`WriterError` if it failed."""
+        try:
+            self._enqueue(self._STOP)
+        finally:
+            self._thread.join()
+        self._raise_if_failed()
+
+    def _raise_if_failed(self) -> None:
+        if self.fatal is not None:
+            raise WriterError(f"Bar writer stopped: {self.fatal}") from self.fatal
+
+    def _enqueue(self, item: Any) -> None:
+        while True:
+            self._raise_if_failed()
+            if not self._thread.is_alive():
+                raise WriterError("Bar writer is not running.")
+            try:
+                self._queue.put(item, timeout=self._POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self) -> None:
+        try:
+            conn = connect_db(self.db_path)
+        except Exception as exc:  # noqa: BLE001
+            self._fail(exc)
+            return
+        try:
+            if self.bulk:
+                for pragma in BULK_LOAD_PRAGMAS:
+                    conn.execute(pragma)
+                # Changing temp_store drops every TEMP object, the shard views among them.
+                attach_shards(conn)
+                ensure_staging_table(conn)
+                leftover = merge_staging(conn)
+                if leftover:
+                    logger.info("Merged %s bars left in staging by a previous bulk load", leftover)
+            started = time.monotonic()
+            while True:
+                item = self._queue.get()
+                if item is self._STOP:
+                    break
+                write_started = time.monotonic()
+                self._handle(conn, *item)
+                self.write_seconds += time.monotonic() - write_started
+            if self.bulk:
+                merge_started = time.monotonic()
+                self._merge(conn, started)
+                self.write_seconds += time.monotonic() - merge_started
+        except Exception as exc:  # noqa: BLE001
+            conn.rollback()
+            self._fail(exc)
+        finally:
+            conn.close()
+
+    def _fail(self, exc: Exception) -> None:
+        # Bulk rows already staged stay in price_bars_staging for the next bulk run.
+        self.fatal = exc
+        logger.exception("Bar writer stopped: %s", exc)
+
+    def _handle(
+        self,
+        conn: sqlite3.Connection,
+        instrument: Dict[str, Any],
+        interval: str,
+        chunk_range: Any,
+        bars: Optional[List[Dict[str, Any]]],
+    ) -> None:
+        instrument_token = int(instrument["instrument_token"])
+        if instrument_token in self.errors:
+            if chunk_range == self._FINISH:
+                self.finished.put((instrument_token, interval, self.errors[instrument_token]))
+            return
+        try:
+            if chunk_range != self._FINISH and instrument_token not in self._instruments:
+                upsert_instrument(conn, instrument)
+                conn.commit()
+                self._instruments.add(instrument_token)
+            if chunk_range == self._FINISH:
+                if self.bulk:
+                    self._finishing.append((instrument_token, interval))
+                else:
+                    finish_series(conn, instrument_token, interval)
+                    self.finished.put((instrument_token, interval, None))
+            elif self.bulk:
+                previous_close = self._previous_staged_close(instrument_token, interval, bars)
+                self.rows_written += stage_price_bars(conn, instrument_token, interval, bars or [], previous_close)
+                conn.commit()
+                self._staged.setdefault((instrument_token, interval), []).append(chunk_range)
+            else:
+                self.rows_written += store_chunk(conn, instrument, interval, chunk_range, bars or [])
+        except Exception as exc:  # noqa: BLE001
+            conn.rollback()
+            self.errors[instrument_token] = str(exc)
+            logger.exception("Failed to write bars for %s: %s", instrument_label(instrument), exc)
+            if chunk_range == self._FINISH:
+                self.finished.put((instrument_token, interval, str(exc)))
+
+    def _previous_staged_close(
+        self, instrument_token: int, interval: str, bars: Optional[List[Dict[str, Any]]]
+    ) -> Optional[float]:
+        """Close of the series' last staged bar before ``bars``, remembering theirs for the next chunk."""
+        key = (instrument_token, interval)
+        timestamps = [to_epoch(bar["date"]) for bar in bars or []]
+        previous = self._staged_closes.get(key)
+        closes = [(timestamp, bar["close"]) for timestamp, bar in zip(timestamps, bars or []) if bar.get("close")]
+        if closes:
+            last = max(closes, key=lambda item: item[0])
+            if previous is None or last[0] > previous[0]:
+                self._staged_closes[key] = (last[0], float(last[1]))
+        if previous is None or not timestamps or previous[0] >= min(timestamps):
+            return None
+        return previous[1]
+
+    def _merge(self, conn: sqlite3.Connection, started: float) -> None:
+        staged_elapsed = time.monotonic() - started
+        merge_started = time.monotonic()
+        merged = merge_staging(conn)
+        merge_elapsed = time.monotonic() - merge_started
+        for (instrument_token, interval), ranges in self._staged.items():
+            record_sessions(conn, instrument_token, interval, ranges)
+            refresh_coverage(conn, instrument_token, interval, rewritten=False)
+            refresh_quality(conn, instrument_token, interval)
+        conn.commit()
+        for instrument_token, interval in self._finishing:
+            self.finished.put((instrument_token, interval, self.errors.get(instrument_token)))
+        logger.info(
+            "Bulk load: staged %s rows in %.1fs, merged %s rows in %.2fs (%.0f rows/s)",
+            self.rows_written,
+            staged_elapsed,
+            merged,
+            merge_elapsed,
+            merged / max(merge_elapsed, 1e-9),
+        )
+
+
+def plan_ranges(
+    conn: sqlite3.Connection,
+    instrument: Dict[str, Any],
+    interval: str,
+    lookback_days: int,
+    incremental: bool,
+) -> List[DateRange]:
+    if not incremental:
+        return lookback_range(lookback_days)
+    ranges = plan_incremental_ranges(conn, int(instrument["instrument_token"]), interval, lookback_days)
+    conn.commit()
+    requested_days = sum((end.date() - start.date()).days + 1 for start, end in ranges)
+    logger.info(
+        "%s (%s): %s missing ranges covering %s days",
+        instrument_label(instrument),
+        interval,
+        len(ranges),
+        requested_days,
+    )
+    return ranges
 
 
 def fetch_and_store(
@@ -233,33 +847,623 @@ def fetch_and_store(
     interval: str,
     lookback_days: int,
     chunk_days: int,
-) -> None:
+    limiter: Optional[TokenBucket] = None,
+    stats: Optional[DownloadStats] = None,
+    max_retries: int = 0,
+    incremental: bool = False,
+) -> int:
     instrument_token = int(instrument["instrument_token"])
-    to_date = datetime.utcnow()
-    from_date = to_date - timedelta(days=lookback_days)
+    upsert_instrument(conn, instrument)
+    conn.commit()
+    ranges = plan_ranges(conn, instrument, interval, lookback_days, incremental)
+    count = 0
 
-    logger.info(
-        "Fetching %s days of %s (%s) data from %s to %s",
-        lookback_days,
-        instrument.get("tradingsymbol") or instrument.get("name"),
+    def write(chunk_range: DateRange, bars: List[Dict[str, Any]]) -> None:
+        nonlocal count
+        count += store_chunk(conn, instrument, interval, chunk_range, bars)
+
+    stream_bars(kite, instrument, interval, ranges, chunk_days, write, limiter, stats, max_retries)
+    finish_series(conn, instrument_token, interval)
+    logger.info("Stored %s bars for token %s", count, instrument_token)
+    return count
+
+
+def stream_to_writer(
+    kite,
+    writer: BarWriter,
+    instrument: Dict[str, Any],
+    interval: str,
+    ranges: Sequence[DateRange],
+    chunk_days: int,
+    limiter: Optional[TokenBucket],
+    stats: Optional[DownloadStats],
+    max_retries: int,
+) -> int:
+    downloaded = stream_bars(
+        kite,
+        instrument,
         interval,
-        from_date.date(),
-        to_date.date(),
+        ranges,
+        chunk_days,
+        lambda chunk_range, bars: writer.put(instrument, interval, chunk_range, bars),
+        limiter,
+        stats,
+        max_retries,
     )
+    writer.finish(instrument, interval)
+    return downloaded
 
-    bars = historical_data_chunked(
-        kite,
-        instrument_token=instrument_token,
-        interval=interval,
-        from_date=from_date,
-        to_date=to_date,
-        chunk_days=chunk_days,
+
+def download_concurrently(
+    kite,
+    conn: sqlite3.Connection,
+    targets: List[Dict[str, Any]],
+    interval: str,
+    lookback_days: int,
+    chunk_days: int,
+    workers: int,
+    limiter: TokenBucket,
+    max_retries: int,
+    incremental: bool = False,
+    db_path: Optional[str] = None,
+    max_pending: int = 8,
+    bulk: bool = False,
+) -> DownloadStats:
+    """Stream targets from a worker pool into a single :class:`BarWriter`.
+
+    Only the HTTP calls run on the pool. Range planning uses ``conn`` on the calling
+    thread and all writes go through the writer's own connection.
+    """
+    stats = DownloadStats()
+    total = len(targets)
+    if db_path is None:
+        db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    writer = BarWriter(db_path, max_pending=max_pending, bulk=bulk)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="historical") as pool:
+            futures = {}
+            for instrument in targets:
+                ranges = plan_ranges(conn, instrument, interval, lookback_days, incremental)
+                future = pool.submit(
+                    stream_to_writer,
+                    kite,
+                    writer,
+                    instrument,
+                    interval,
+                    ranges,
+                    chunk_days,
+                    limiter,
+                    stats,
+                    max_retries,
+                )
+                futures[future] = instrument
+            for future in as_completed(futures):
+                instrument = futures[future]
+                label = instrument_label(instrument)
+                try:
+                    count = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    stats.failed.append(label)
+                    logger.exception("Failed to download %s: %s", label, exc)
+                    continue
+                stats.completed += 1
+                logger.info(
+                    "[%s/%s] Downloaded %s bars for %s",
+                    stats.completed + len(stats.failed),
+                    total,
+                    count,
+                    label,
+                )
+    finally:
+        writer.close()
+        stats.write_seconds = writer.write_seconds
+
+    for instrument in targets:
+        instrument_token = int(instrument["instrument_token"])
+        if instrument_token in writer.errors and instrument_label(instrument) not in stats.failed:
+            stats.completed -= 1
+            stats.failed.append(instrument_label(instrument))
+    logger.info("Writer committed %s bars", writer.rows_written)
+    return stats
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def monthly_expiries(expiries: Iterable[Any], today: date) -> List[date]:
+    """Last listed expiry of each calendar month from ``today`` onwards, soonest first."""
+    by_month: Dict[Tuple[int, int], date] = {}
+    for value in expiries:
+        expiry = _as_date(value)
+        if expiry is None or expiry < today:
+            continue
+        key = (expiry.year, expiry.month)
+        if key not in by_month or expiry > by_month[key]:
+            by_month[key] = expiry
+    return [by_month[key] for key in sorted(by_month)]
+
+
+def expand_option_chain(
+    index: InstrumentIndex,
+    underlying: str,
+    expiry_count: int,
+    segment: str = "NFO-OPT",
+) -> List[Dict[str, Any]]:
+    """Every CE/PE contract of ``underlying`` for its next ``expiry_count`` monthly expiries."""
+    contracts = [
+        item
+        for item in index.lookup(underlying, segment=segment)
+        if str(item.get("name") or "").upper() == underlying.upper()
+    ]
+    expiries = set(monthly_expiries((item.get("expiry") for item in contracts), market_now().date())[:expiry_count])
+    return [item for item in contracts if _as_date(item.get("expiry")) in expiries]
+
+
+def underlying_reference_price(
+    kite,
+    index: InstrumentIndex,
+    underlying: str,
+    contracts: Sequence[Dict[str, Any]],
+) -> float:
+    """LTP of the nearest future, falling back to the median listed strike."""
+    futures = [
+        item
+        for item in index.lookup(underlying, segment="NFO-FUT")
+        if str(item.get("name") or "").upper() == underlying.upper() and _as_date(item.get("expiry"))
+    ]
+    if futures:
+        nearest = min(futures, key=lambda item: _as_date(item.get("expiry")))
+        key = f"{nearest.get('exchange') or 'NFO'}:{nearest['tradingsymbol']}"
+        try:
+            return float(kite.ltp([key])[key]["last_price"])
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Could not fetch LTP for %s (%s); using median strike", key, exc)
+    strikes = sorted(float(item.get("strike") or 0) for item in contracts)
+    return strikes[len(strikes) // 2] if strikes else 0.0
+
+
+class BackfillQueue:
+    """Persistent priority queue of ``(instrument_token, interval)`` backfill jobs.
+
+    Jobs live in the ``backfill_jobs`` table of the market database, so a job run can
+    be stopped and resumed. Jobs left ``running`` by a crashed process go back to
+    ``pending`` when the queue is opened. Lower priorities run first; failed jobs are
+    retried with exponential backoff until ``max_attempts`` is reached.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, max_attempts: int = 5) -> None:
+        self.conn = conn
+        self.max_attempts = max_attempts
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS backfill_jobs (
+                instrument_token INTEGER NOT NULL,
+                interval TEXT NOT NULL,
+                priority REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT NOT NULL,
+                last_error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (instrument_token, interval)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_backfill_jobs_claim ON backfill_jobs (status, priority)"
+        )
+        conn.execute("UPDATE backfill_jobs SET status = 'pending' WHERE status = 'running'")
+        conn.commit()
+
+    def enqueue(self, instrument: Dict[str, Any], interval: str, priority: float) -> None:
+        """Add a job, or re-arm an existing one with a fresh priority and attempt budget."""
+        now = datetime.utcnow().isoformat()
+        upsert_instrument(self.conn, instrument)
+        self.conn.execute(
+            """
+            INSERT INTO backfill_jobs (
+                instrument_token, interval, priority, status, attempts, next_attempt_at, updated_at
+            ) VALUES (?, ?, ?, 'pending', 0, ?, ?)
+            ON CONFLICT(instrument_token, interval) DO UPDATE SET
+                priority=excluded.priority,
+                status='pending',
+                attempts=0,
+                next_attempt_at=excluded.next_attempt_at,
+                last_error=NULL,
+                updated_at=excluded.updated_at
+            """,
+            (int(instrument["instrument_token"]), interval, priority, now, now),
+        )
+
+    def claim(self, limit: int) -> List[Tuple[int, str]]:
+        now = datetime.utcnow().isoformat()
+        jobs = self.conn.execute(
+            """
+            SELECT instrument_token, interval FROM backfill_jobs
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY priority
+            LIMIT ?
+            """,
+            (now, limit),
+        ).fetchall()
+        self.conn.executemany(
+            "UPDATE backfill_jobs SET status = 'running', updated_at = ? WHERE instrument_token = ? AND interval = ?",
+            [(now, token, interval) for token, interval in jobs],
+        )
+        self.conn.commit()
+        return [(int(token), interval) for token, interval in jobs]
+
+    def complete(self, instrument_token: int, interval: str) -> None:
+        self.conn.execute(
+            """
+            UPDATE backfill_jobs SET status = 'done', last_error = NULL, updated_at = ?
+            WHERE instrument_token = ? AND interval = ?
+            """,
+            (datetime.utcnow().isoformat(), instrument_token, interval),
+        )
+        self.conn.commit()
+
+    def fail(self, instrument_token: int, interval: str, error: str) -> None:
+        attempts = self.conn.execute(
+            "SELECT attempts FROM backfill_jobs WHERE instrument_token = ? AND interval = ?",
+            (instrument_token, interval),
+        ).fetchone()[0] + 1
+        now = datetime.utcnow()
+        status = "failed" if attempts >= self.max_attempts else "pending"
+        retry_at = now + timedelta(seconds=min(3600, 30 * 2 ** (attempts - 1)))
+        self.conn.execute(
+            """
+            UPDATE backfill_jobs
+            SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+            WHERE instrument_token = ? AND interval = ?
+            """,
+            (status, attempts, retry_at.isoformat(), error[:500], now.isoformat(), instrument_token, interval),
+        )
+        self.conn.commit()
+
+    def next_retry_at(self) -> Optional[datetime]:
+        row = self.conn.execute(
+            "SELECT MIN(next_attempt_at) FROM backfill_jobs WHERE status = 'pending'"
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM backfill_jobs GROUP BY status").fetchall())
+
+
+def enqueue_option_chain(
+    kite,
+    jobs: BackfillQueue,
+    index: InstrumentIndex,
+    underlying: str,
+    interval: str,
+    expiry_count: int,
+) -> int:
+    """Queue every contract of an option chain, nearest-to-the-money first."""
+    contracts = expand_option_chain(index, underlying, expiry_count)
+    if not contracts:
+        raise ValueError(f"No option contracts found for underlying '{underlying}'.")
+    spot = underlying_reference_price(kite, index, underlying, contracts)
+    expiry_rank = {expiry: rank for rank, expiry in enumerate(sorted({_as_date(c.get("expiry")) for c in contracts}))}
+    for contract in contracts:
+        distance = abs(float(contract.get("strike") or 0) - spot) / spot if spot else 0.0
+        # Moneyness dominates; the expiry rank only breaks ties between equally distant strikes.
+        priority = round(distance, 4) + expiry_rank[_as_date(contract.get("expiry"))] * 1e-6
+        jobs.enqueue(contract, interval, priority)
+    jobs.conn.commit()
+    logger.info(
+        "Queued %s %s contracts across %s expiries around %.2f",
+        len(contracts),
+        underlying,
+        len(expiry_rank),
+        spot,
     )
+    return len(contracts)
 
-    upsert_instrument(conn, instrument)
-    count = upsert_price_bars(conn, instrument_token, interval, bars)
+
+def load_instrument(conn: sqlite3.Connection, instrument_token: int) -> Dict[str, Any]:
+    cursor = conn.execute("SELECT * FROM instruments WHERE instrument_token = ?", (instrument_token,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"Instrument token {instrument_token} missing from instruments table.")
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+def run_backfill_jobs(
+    kite,
+    conn: sqlite3.Connection,
+    jobs: BackfillQueue,
+    lookback_days: int,
+    chunk_size: Callable[[str], int],
+    workers: int,
+    limiter: TokenBucket,
+    max_retries: int,
+    db_path: str,
+    max_pending: int = 8,
+) -> DownloadStats:
+    """Drain the backfill queue in priority order within the shared rate limit.
+
+    Each job only requests ranges missing from the coverage map, so re-running a
+    finished queue after a restart costs one request per series. A job is marked done
+    only once the writer has committed its bars; jobs still in flight when the process
+    dies are picked up again by the next run.
+    """
+    stats = DownloadStats()
+    writer = BarWriter(db_path, max_pending=max_pending)
+    labels: Dict[Tuple[int, str], str] = {}
+
+    def settle() -> None:
+        while True:
+            try:
+                instrument_token, interval, error = writer.finished.get_nowait()
+            except queue.Empty:
+                return
+            label = labels.pop((instrument_token, interval), str(instrument_token))
+            if error is not None:
+                jobs.fail(instrument_token, interval, error)
+                stats.failed.append(label)
+                logger.warning("Writing the backfill of %s (%s) failed: %s", label, interval, error)
+                continue
+            jobs.complete(instrument_token, interval)
+            stats.completed += 1
+            logger.info("Backfilled %s (%s); queue: %s", label, interval, jobs.counts())
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="backfill") as pool:
+            running: Dict[Any, Tuple[Dict[str, Any], str]] = {}
+            while True:
+                for instrument_token, interval in jobs.claim(max(1, workers) * 2 - len(running)):
+                    try:
+                        instrument = load_instrument(conn, instrument_token)
+                        ranges = plan_ranges(conn, instrument, interval, lookback_days, incremental=True)
+                    except Exception as exc:  # noqa: BLE001
+                        jobs.fail(instrument_token, interval, str(exc))
+                        continue
+                    future = pool.submit(
+                        stream_to_writer,
+                        kite,
+                        writer,
+                        instrument,
+                        interval,
+                        ranges,
+                        chunk_size(interval),
+                        limiter,
+                        stats,
+                        max_retries,
+                    )
+                    running[future] = (instrument, interval)
+                    labels[(instrument_token, interval)] = instrument_label(instrument)
+
+                settle()
+                if not running:
+                    retry_at = jobs.next_retry_at()
+                    if retry_at is None:
+                        break
+                    time.sleep(min(60.0, max(1.0, (retry_at - datetime.utcnow()).total_seconds())))
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    instrument, interval = running.pop(future)
+                    instrument_token = int(instrument["instrument_token"])
+                    label = instrument_label(instrument)
+                    try:
+                        count = future.result()
+                    except Exception as exc:  # noqa: BLE001
+                        labels.pop((instrument_token, interval), None)
+                        jobs.fail(instrument_token, interval, str(exc))
+                        stats.failed.append(label)
+                        logger.warning("Backfill of %s (%s) failed: %s", label, interval, exc)
+                        continue
+                    # The job is completed by settle() once the writer has committed it.
+                    logger.info("Downloaded %s bars for %s (%s)", count, label, interval)
+    finally:
+        writer.close()
+    settle()
+    return stats
+
+
+def next_poll_time(now: datetime, delay: float) -> datetime:
+    """The next minute boundary plus ``delay`` seconds, when Kite has closed the previous bar."""
+    return now.replace(second=0, microsecond=0) + timedelta(minutes=1, seconds=delay)
+
+
+def record_lag(
+    conn: sqlite3.Connection,
+    instrument_token: int,
+    interval: str,
+    last_bar: Optional[int],
+    polled_at: datetime,
+    error: Optional[str] = None,
+) -> None:
+    """Store how far a series trails the wall clock after a poll.
+
+    Lag is measured from the close of the last stored bar, so a series that is fully
+    current reports less than one bar width.
+    """
+    code = interval_code(interval)
+    polled = to_epoch(polled_at)
+    lag = None if last_bar is None else max(polled - (last_bar + code * 60), 0)
+    conn.execute(
+        f"""
+        INSERT INTO {series_table(conn, "ingest_lag", code)} (instrument_token, interval, last_bar_timestamp, polled_at, lag_seconds, error)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(instrument_token, interval) DO UPDATE SET
+            last_bar_timestamp=COALESCE(excluded.last_bar_timestamp, last_bar_timestamp),
+            polled_at=excluded.polled_at,
+            lag_seconds=COALESCE(excluded.lag_seconds, lag_seconds),
+            error=excluded.error
+        """,
+        (instrument_token, code, last_bar, polled, lag, error),
+    )
+
+
+def high_water_marks(conn: sqlite3.Connection, interval: str) -> Dict[int, int]:
+    rows = conn.execute(
+        "SELECT instrument_token, last_timestamp FROM series_coverage WHERE interval = ? AND last_timestamp IS NOT NULL",
+        (interval_code(interval),),
+    ).fetchall()
+    return dict(rows)
+
+
+def poll_watchlist(
+    kite,
+    conn: sqlite3.Connection,
+    targets: List[Dict[str, Any]],
+    interval: str,
+    limiter: TokenBucket,
+    max_retries: int,
+    workers: int,
+    now: datetime,
+    max_days: int,
+) -> DownloadStats:
+    """Fetch every watchlist series from its last stored bar up to ``now``.
+
+    The last stored bar is requested again because Kite may still have been filling it
+    on the previous poll. Series that are furthest behind are requested first, so a
+    watchlist larger than one minute of rate budget still rotates through every token.
+    Each series is committed on its own so API readers only ever wait on one short write.
+    """
+    stats = DownloadStats()
+    marks = high_water_marks(conn, interval)
+    session_open = datetime.combine(now.date(), SESSION_OPEN)
+    earliest = now - timedelta(days=max_days)
+    ordered = sorted(targets, key=lambda item: marks.get(int(item["instrument_token"]), 0))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="watchlist") as pool:
+        futures = {}
+        for instrument in ordered:
+            instrument_token = int(instrument["instrument_token"])
+            mark = marks.get(instrument_token)
+            start = max(from_epoch(mark).replace(tzinfo=None), earliest) if mark else session_open
+            future = pool.submit(
+                request_historical,
+                kite,
+                limiter,
+                stats,
+                max_retries,
+                instrument_token=instrument_token,
+                from_date=start,
+                to_date=now,
+                interval=interval,
+                continuous=False,
+                oi=True,
+            )
+            futures[future] = instrument
+
+        for future in as_completed(futures):
+            instrument = futures[future]
+            instrument_token = int(instrument["instrument_token"])
+            mark = marks.get(instrument_token)
+            try:
+                bars = future.result()
+                if bars:
+                    upsert_price_bars(conn, instrument_token, interval, bars)
+                    stamps = [to_epoch(bar["date"]) for bar in bars]
+                    appended = sum(1 for stamp in stamps if mark is None or stamp > mark)
+                    advance_coverage(conn, instrument_token, interval, min(stamps), max(stamps), appended)
+                    mark = max(stamps + ([mark] if mark is not None else []))
+                record_lag(conn, instrument_token, interval, mark, market_now())
+                conn.commit()
+                stats.completed += 1
+            except Exception as exc:  # noqa: BLE001
+                conn.rollback()
+                stats.failed.append(instrument_label(instrument))
+                logger.warning("Watchlist poll failed for %s: %s", instrument_label(instrument), exc)
+                record_lag(conn, instrument_token, interval, None, market_now(), error=str(exc))
+                conn.commit()
+    return stats
+
+
+def finalise_session(
+    kite,
+    conn: sqlite3.Connection,
+    targets: List[Dict[str, Any]],
+    interval: str,
+    session: date,
+    limiter: TokenBucket,
+    max_retries: int,
+) -> None:
+    """Re-request the whole closed session once so it is recorded as complete in the coverage map."""
+    session_range = (datetime.combine(session, SESSION_OPEN), datetime.combine(session, SESSION_CLOSE))
+    for instrument in targets:
+        instrument_token = int(instrument["instrument_token"])
+        try:
+            bars = request_historical(
+                kite,
+                limiter,
+                None,
+                max_retries,
+                instrument_token=instrument_token,
+                from_date=session_range[0],
+                to_date=session_range[1],
+                interval=interval,
+                continuous=False,
+                oi=True,
+            )
+            store_chunk(conn, instrument, interval, session_range, bars)
+            finish_series(conn, instrument_token, interval)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Could not finalise %s for %s: %s", session, instrument_label(instrument), exc)
+    logger.info("Finalised session %s for %s series", session, len(targets))
+
+
+def run_daemon(
+    kite,
+    conn: sqlite3.Connection,
+    targets: List[Dict[str, Any]],
+    interval: str,
+    limiter: TokenBucket,
+    max_retries: int,
+    workers: int,
+    poll_delay: float,
+    stop: threading.Event,
+) -> None:
+    """Keep ``targets`` current during market hours until ``stop`` is set.
+
+    Polls once per minute boundary while the session is open and finalises each
+    session once after the close.
+    """
+    for instrument in targets:
+        upsert_instrument(conn, instrument)
     conn.commit()
-    logger.info("Stored %s bars for token %s", count, instrument_token)
+
+    budget = limiter.rate * 60
+    if len(targets) > budget:
+        logger.warning(
+            "Watchlist has %s series but the rate limit allows %.0f requests per minute; "
+            "each series will be refreshed every %.1f minutes.",
+            len(targets),
+            budget,
+            len(targets) / budget,
+        )
+    max_days = resolve_chunk_days(interval, None)
+    finalised: Optional[date] = None
+    logger.info("Watching %s series at %s resolution", len(targets), interval)
+
+    while not stop.is_set():
+        now = market_now()
+        close = datetime.combine(now.date(), SESSION_CLOSE)
+        if now.weekday() < 5 and now.time() > SESSION_OPEN:
+            if now <= close + timedelta(minutes=1, seconds=poll_delay):
+                stats = poll_watchlist(kite, conn, targets, interval, limiter, max_retries, workers, now, max_days)
+                logger.info("Poll at %s: %s", now.strftime("%H:%M:%S"), stats.summary())
+                # Keep the WAL short while the dashboard is reading; never waits on readers.
+                checkpoint(conn, "PASSIVE")
+            elif finalised != now.date():
+                finalise_session(kite, conn, targets, interval, now.date(), limiter, max_retries)
+                finalised = now.date()
+                run_maintenance(conn)
+        wake = next_poll_time(market_now(), poll_delay)
+        stop.wait(max(0.0, (wake - market_now()).total_seconds()))
 
 
 def parse_args() -> argparse.Namespace:
@@ -278,6 +1482,30 @@ def parse_args() -> argparse.Namespace:
         dest="instrument_token",
         help="Explicit instrument token. When provided, --instrument is ignored and metadata is looked up from the instruments dump.",
     )
+    parser.add_argument(
+        "--chain",
+        dest="chains",
+        action="append",
+        help="Underlying (e.g. BANKNIFTY) whose full option chain is queued as backfill jobs; "
+        "repeat for several. Jobs are kept in the database and run nearest-the-money first.",
+    )
+    parser.add_argument(
+        "--chain-expiries",
+        type=int,
+        default=2,
+        help="Number of upcoming monthly expiries to expand for --chain (default: 2).",
+    )
+    parser.add_argument(
+        "--resume-jobs",
+        action="store_true",
+        help="Run backfill jobs left in the database by an earlier --chain run without queueing new ones.",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=5,
+        help="Attempts per backfill job before it is marked failed (default: 5).",
+    )
     parser.add_argument(
         "--segment",
         help="Optional segment filter used when resolving instruments (e.g. INDICES, NFO-OPT, NSE).",
@@ -286,9 +1514,15 @@ def parse_args() -> argparse.Namespace:
         "--exchange",
         help="Optional exchange filter used when resolving instruments (e.g. NSE).",
     )
+    parser.add_argument(
+        "--refresh-instruments",
+        action="store_true",
+        help="Ignore today's cached instruments dump and download it again.",
+    )
     parser.add_argument(
         "--interval",
         default="day",
+        choices=list(INTERVAL_CODES),
         help="Kite interval to request (default: day).",
     )
     parser.add_argument(
@@ -297,16 +1531,82 @@ def parse_args() -> argparse.Namespace:
         default=365,
         help="Number of calendar days to fetch (default: 365).",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only request sessions missing from the local coverage map within the lookback window "
+        "(the tail since the last stored bar plus interior gaps).",
+    )
     parser.add_argument(
         "--chunk-days",
         type=int,
         help="Override the maximum number of days per request. Useful for minute-level data where Kite enforces smaller ranges.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of instruments to download concurrently (default: 1).",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=HISTORICAL_RATE_LIMIT,
+        help=f"Maximum historical API requests per second across all workers (default: {HISTORICAL_RATE_LIMIT:g}).",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retries with exponential backoff for each failed historical request (default: 3).",
+    )
+    parser.add_argument(
+        "--max-pending-chunks",
+        type=int,
+        default=8,
+        help="Downloaded chunks allowed to wait for the database writer before workers block (default: 8).",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Bulk-load mode for large initial loads: stage rows in an unindexed table with relaxed "
+        "durability pragmas and merge them into price_bars in one statement at the end.",
+    )
+    parser.add_argument(
+        "--rollup",
+        action="store_true",
+        help="With --interval minute, derive "
+        + "/".join(ROLLUP_INTERVALS)
+        + " bars from the stored minute bars instead of downloading those intervals.",
+    )
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="After downloading, pack completed intraday sessions of the downloaded series into "
+        "compressed columnar chunks (see scripts/pack_price_bars.py).",
+    )
     parser.add_argument(
         "--db-path",
         default=os.path.join("data", "market_data.db"),
         help="SQLite database path (default: data/market_data.db).",
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run continuously and keep the resolved instruments current during market hours "
+        "(requires an intraday --interval such as minute).",
+    )
+    parser.add_argument(
+        "--poll-delay",
+        type=float,
+        default=5.0,
+        help="Seconds after each minute boundary before the daemon polls (default: 5).",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the synthetic FakeKite client from scripts/fake_kite.py instead of a live session.",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -317,6 +1617,10 @@ def parse_args() -> argparse.Namespace:
 
 
 def authenticate_kite():
+    # Imported here so the module can be used offline (see --offline) without Kite credentials.
+    from env_loader import get_kite_config
+    from kite_token_manager import KiteTokenManager
+
     cfg = get_kite_config()
     manager = KiteTokenManager(api_key=cfg["api_key"])
     if not manager.ensure_authenticated(api_secret=cfg["api_secret"]):
@@ -329,38 +1633,100 @@ def main() -> None:
     logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
 
     conn = init_db(args.db_path)
-    kite = authenticate_kite()
+    if args.offline:
+        from scripts.fake_kite import FakeKite
+
+        kite = FakeKite(historical_rate_limit=None)
+    else:
+        kite = authenticate_kite()
+
+    # Keep the synthetic dump away from the real instruments cache.
+    cache_dir = os.path.join(DEFAULT_CACHE_DIR, "offline") if args.offline else DEFAULT_CACHE_DIR
+    index = InstrumentIndex(load_catalogue(kite, cache_dir=cache_dir, force_refresh=args.refresh_instruments))
+    limiter = TokenBucket(args.rate_limit)
 
-    catalogue = kite.instruments()
+    if args.chains or args.resume_jobs:
+        jobs = BackfillQueue(conn, max_attempts=args.max_attempts)
+        for underlying in args.chains or []:
+            enqueue_option_chain(kite, jobs, index, underlying, args.interval, args.chain_expiries)
+        stats = run_backfill_jobs(
+            kite,
+            conn,
+            jobs,
+            args.lookback_days,
+            lambda interval: resolve_chunk_days(interval, args.chunk_days),
+            args.workers,
+            limiter,
+            args.max_retries,
+            args.db_path,
+            args.max_pending_chunks,
+        )
+        logger.info("Backfill summary: %s; queue: %s", stats.summary(), jobs.counts())
+        conn.close()
+        return
 
     targets: List[Dict[str, Any]] = []
     if args.instrument_token is not None:
-        match = next((item for item in catalogue if int(item.get("instrument_token", 0)) == args.instrument_token), None)
+        match = index.by_token(args.instrument_token)
         if not match:
             raise ValueError(f"Instrument token {args.instrument_token} not found in instruments dump.")
         targets.append(match)
     else:
         requested = args.instruments or ["NIFTY 50"]
         for identifier in requested:
-            instrument = resolve_instrument(catalogue, identifier, args.segment, args.exchange)
+            instrument = resolve_instrument(index, identifier, args.segment, args.exchange)
             targets.append(instrument)
 
     logger.info("Resolved %s instruments for download", len(targets))
+    if args.daemon:
+        if args.interval == "day":
+            raise ValueError("--daemon keeps intraday series current; use an intraday --interval such as minute.")
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            run_daemon(kite, conn, targets, args.interval, limiter, args.max_retries, args.workers, args.poll_delay, stop)
+        except KeyboardInterrupt:
+            logger.info("Stopping watchlist daemon")
+        finally:
+            conn.close()
+        return
+    if args.pack and args.interval == "day":
+        raise ValueError("--pack stores intraday sessions; daily bars are not packed.")
+    if args.rollup and args.interval != "minute":
+        raise ValueError("--rollup derives bars from minute data; use it with --interval minute.")
 
     chunk_days = resolve_chunk_days(args.interval, args.chunk_days)
 
-    for instrument in targets:
-        try:
-            fetch_and_store(
-                kite,
-                conn,
-                instrument,
-                args.interval,
-                args.lookback_days,
-                chunk_days,
-            )
-        except Exception as exc:  # noqa: BLE001
-            logger.exception("Failed to download %s: %s", instrument.get("tradingsymbol") or instrument.get("name"), exc)
+    stats = download_concurrently(
+        kite,
+        conn,
+        targets,
+        args.interval,
+        args.lookback_days,
+        chunk_days,
+        args.workers,
+        limiter,
+        args.max_retries,
+        incremental=args.incremental,
+        db_path=args.db_path,
+        max_pending=args.max_pending_chunks,
+        bulk=args.bulk,
+    )
+    logger.info("Download summary: %s", stats.summary())
+    if stats.failed:
+        logger.warning("Failed instruments: %s", ", ".join(stats.failed))
+
+    if args.rollup:
+        for instrument in targets:
+            rollup_series(conn, int(instrument["instrument_token"]))
+
+    if args.pack:
+        for instrument in targets:
+            pack_series(conn, int(instrument["instrument_token"]), args.interval)
+
+    # Extend any continuous futures series registered for the underlyings just downloaded.
+    futures = sorted({instrument["name"] for instrument in targets if instrument.get("segment") == "NFO-FUT"})
+    refresh_continuous(conn, futures, args.interval)
 
     conn.close()
 
@@ -0,0 +1,315 @@
+"""Daily on-disk cache and lookup helpers for the Kite instruments dump.
+
+The dump has ~100k rows and only changes once a day, so it is downloaded once per
+trading day into a columnar ``.npz`` file under ``data/cache`` and shared by every
+tool. Identifiers are resolved through hash indexes built once per run instead of
+scanning the catalogue for every lookup.
+"""
+
+from __future__ import annotations
+
+import difflib
+import glob
+import logging
+import os
+from bisect import bisect_left
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_CACHE_DIR = os.path.join(ROOT, "data", "cache")
+
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+# Kite publishes the day's instruments dump around 08:30 IST.
+DUMP_PUBLISH_TIME = dt_time(8, 30)
+
+INT_FIELDS = ("instrument_token", "exchange_token", "lot_size")
+FLOAT_FIELDS = ("last_price", "strike", "tick_size")
+STR_FIELDS = ("tradingsymbol", "name", "expiry", "instrument_type", "segment", "exchange")
+FIELDS = INT_FIELDS + FLOAT_FIELDS + STR_FIELDS
+
+# Separator for the distinct values of a string column; never present in the dump.
+_VALUE_SEPARATOR = "\x1f"
+
+
+class InstrumentCatalogue(Sequence[Dict[str, Any]]):
+    """Column-oriented instruments dump that materialises row dicts on access.
+
+    Numeric fields are plain arrays. String fields are dictionary-encoded as the
+    list of distinct values plus one integer code per row, which keeps the cache
+    file compact and makes loading a column a single ``str.split``.
+    """
+
+    def __init__(
+        self,
+        numeric: Dict[str, np.ndarray],
+        strings: Dict[str, Tuple[List[str], np.ndarray]],
+    ) -> None:
+        self.numeric = numeric
+        self.strings = strings
+        self._length = len(numeric["instrument_token"])
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]]) -> "InstrumentCatalogue":
+        numeric: Dict[str, np.ndarray] = {}
+        for field in INT_FIELDS:
+            dtype = np.int64 if field == "instrument_token" else np.int32
+            numeric[field] = np.array([int(item.get(field) or 0) for item in records], dtype=dtype)
+        for field in FLOAT_FIELDS:
+            numeric[field] = np.array([float(item.get(field) or 0.0) for item in records], dtype=np.float64)
+        strings: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        for field in STR_FIELDS:
+            distinct: Dict[str, int] = {}
+            codes = [distinct.setdefault(_to_text(item.get(field)), len(distinct)) for item in records]
+            strings[field] = (list(distinct), np.array(codes, dtype=_code_dtype(len(distinct))))
+        return cls(numeric, strings)
+
+    @classmethod
+    def load(cls, path: str) -> "InstrumentCatalogue":
+        with np.load(path, allow_pickle=False) as data:
+            numeric = {field: data[field] for field in INT_FIELDS + FLOAT_FIELDS}
+            strings = {
+                field: (
+                    data[f"{field}__values"].tobytes().decode("utf-8").split(_VALUE_SEPARATOR),
+                    data[f"{field}__codes"],
+                )
+                for field in STR_FIELDS
+            }
+        return cls(numeric, strings)
+
+    def save(self, path: str) -> None:
+        """Write the columns to ``path`` atomically (uncompressed, so loads stay fast)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload: Dict[str, np.ndarray] = dict(self.numeric)
+        for field, (values, codes) in self.strings.items():
+            blob = _VALUE_SEPARATOR.join(values).encode("utf-8")
+            payload[f"{field}__values"] = np.frombuffer(blob, dtype=np.uint8)
+            payload[f"{field}__codes"] = codes
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **payload)
+        os.replace(tmp_path, path)
+
+    def column(self, field: str) -> np.ndarray:
+        if field in self.numeric:
+            return self.numeric[field]
+        values, codes = self.strings[field]
+        return np.array(values, dtype=object)[codes]
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame({field: self.column(field) for field in FIELDS})
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, position):  # type: ignore[override]
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._length))]
+        row: Dict[str, Any] = {field: self.numeric[field][position].item() for field in INT_FIELDS + FLOAT_FIELDS}
+        for field, (values, codes) in self.strings.items():
+            row[field] = values[codes[position]]
+        row["expiry"] = date.fromisoformat(row["expiry"]) if row["expiry"] else ""
+        return row
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for position in range(self._length):
+            yield self[position]
+
+
+def _code_dtype(distinct: int) -> type:
+    if distinct <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if distinct <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.int32
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()[:10]
+    return str(value)
+
+
+def catalogue_date(now: Optional[datetime] = None) -> date:
+    """Trading day whose dump is current at ``now`` (the previous day before publication)."""
+    now = now.astimezone(MARKET_TZ) if now else datetime.now(MARKET_TZ)
+    if now.time() < DUMP_PUBLISH_TIME:
+        return now.date() - timedelta(days=1)
+    return now.date()
+
+
+def cache_path(cache_dir: str, day: date) -> str:
+    return os.path.join(cache_dir, f"instruments-{day.isoformat()}.npz")
+
+
+def load_catalogue(
+    kite,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    force_refresh: bool = False,
+    now: Optional[datetime] = None,
+) -> InstrumentCatalogue:
+    """Return today's instruments dump, downloading it only when the cache is stale."""
+    path = cache_path(cache_dir, catalogue_date(now))
+    if not force_refresh and os.path.exists(path):
+        try:
+            catalogue = InstrumentCatalogue.load(path)
+            logger.debug("Loaded %s instruments from %s", len(catalogue), path)
+            return catalogue
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Ignoring unreadable instruments cache %s: %s", path, exc)
+
+    catalogue = InstrumentCatalogue.from_records(kite.instruments())
+    try:
+        catalogue.save(path)
+        _prune_cache(cache_dir, keep=path)
+    except OSError as exc:
+        logger.warning("Could not write instruments cache %s: %s", path, exc)
+    logger.info("Downloaded %s instruments from Kite", len(catalogue))
+    return catalogue
+
+
+def _prune_cache(cache_dir: str, keep: str) -> None:
+    for stale in glob.glob(os.path.join(cache_dir, "instruments-*.npz")):
+        if os.path.abspath(stale) != os.path.abspath(keep):
+            os.remove(stale)
+
+
+class InstrumentIndex:
+    """Token, tradingsymbol and name indexes over an instruments catalogue."""
+
+    def __init__(self, catalogue: Sequence[Dict[str, Any]]) -> None:
+        self.catalogue = catalogue
+        self._by_token: Dict[int, int] = {}
+        self._by_key: Dict[str, List[int]] = {}
+        for position, token in enumerate(_column_values(catalogue, "instrument_token")):
+            if token is not None:
+                self._by_token.setdefault(int(token), position)
+        symbols = _column_values(catalogue, "tradingsymbol")
+        names = _column_values(catalogue, "name")
+        for position, (symbol, name) in enumerate(zip(symbols, names)):
+            symbol_key = str(symbol or "").upper()
+            name_key = str(name or "").upper()
+            if symbol_key:
+                self._by_key.setdefault(symbol_key, []).append(position)
+            if name_key and name_key != symbol_key:
+                self._by_key.setdefault(name_key, []).append(position)
+        self._sorted_keys = sorted(self._by_key)
+
+    def __len__(self) -> int:
+        return len(self.catalogue)
+
+    def by_token(self, instrument_token: int) -> Optional[Dict[str, Any]]:
+        position = self._by_token.get(int(instrument_token))
+        return None if position is None else self.catalogue[position]
+
+    def lookup(
+        self,
+        identifier: str,
+        segment: Optional[str] = None,
+        exchange: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Exact tradingsymbol/name matches (case-insensitive) in catalogue order."""
+        positions = self._by_key.get(identifier.upper(), [])
+        return self._filter((self.catalogue[p] for p in positions), segment, exchange)
+
+    def prefix(
+        self,
+        prefix: str,
+        segment: Optional[str] = None,
+        exchange: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Instruments whose tradingsymbol or name starts with ``prefix``."""
+        prefix = prefix.upper()
+        positions: List[int] = []
+        start = bisect_left(self._sorted_keys, prefix)
+        for key in self._sorted_keys[start:]:
+            if not key.startswith(prefix):
+                break
+            positions.extend(self._by_key[key])
+        matches = self._filter((self.catalogue[p] for p in sorted(set(positions))), segment, exchange)
+        return matches[:limit]
+
+    def fuzzy(
+        self,
+        identifier: str,
+        segment: Optional[str] = None,
+        exchange: Optional[str] = None,
+        limit: int = 5,
+        cutoff: float = 0.75,
+    ) -> List[Dict[str, Any]]:
+        """Closest tradingsymbol/name matches for a misspelt identifier.
+
+        Candidates are limited to keys sharing the first character, which keeps the
+        comparison set small on a full dump.
+        """
+        identifier = identifier.upper()
+        if not identifier:
+            return []
+        start = bisect_left(self._sorted_keys, identifier[0])
+        end = bisect_left(self._sorted_keys, chr(ord(identifier[0]) + 1))
+        candidates = self._sorted_keys[start:end]
+        matches: List[Dict[str, Any]] = []
+        for key in difflib.get_close_matches(identifier, candidates, n=limit * 4, cutoff=cutoff):
+            matches.extend(self._filter((self.catalogue[p] for p in self._by_key[key]), segment, exchange))
+            if len(matches) >= limit:
+                break
+        return matches[:limit]
+
+    def resolve(
+        self,
+        identifier: str,
+        segment: Optional[str] = None,
+        exchange: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        matches = self.lookup(identifier, segment, exchange)
+        if not matches:
+            suggestions = self.prefix(identifier, segment, exchange, limit=5) or self.fuzzy(
+                identifier, segment, exchange
+            )
+            hint = ""
+            if suggestions:
+                hint = " Did you mean: " + ", ".join(
+                    str(item.get("tradingsymbol")) for item in suggestions
+                ) + "?"
+            raise ValueError(
+                f"Instrument '{identifier}' not found. Try specifying --segment/--exchange "
+                f"or provide the instrument token directly.{hint}"
+            )
+
+        if len(matches) > 1:
+            logger.warning(
+                "Multiple matches found for %s; selecting the first one: %s",
+                identifier,
+                matches[0],
+            )
+        return matches[0]
+
+    @staticmethod
+    def _filter(
+        items: Iterable[Dict[str, Any]],
+        segment: Optional[str],
+        exchange: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        matches = []
+        for item in items:
+            if segment and item.get("segment") != segment:
+                continue
+            if exchange and item.get("exchange") not in (None, "", exchange):
+                continue
+            matches.append(item)
+        return matches
+
+
+def _column_values(catalogue: Sequence[Dict[str, Any]], field: str) -> List[Any]:
+    if isinstance(catalogue, InstrumentCatalogue):
+        return catalogue.column(field).tolist()
+    return [item.get(field) for item in catalogue]
@@ -15,6 +15,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from kiteconnect import KiteConnect
 from kite_token_manager import KiteTokenManager
 import scripts.config as config
+from scripts.instrument_catalogue import load_catalogue
+from market_data.ticks import TickWriter
 
 # --- LOGGING SETUP ---
 def setup_logging():
@@ -89,6 +91,9 @@ class IronFlyTrader:
         self.last_state_log_time: Optional[datetime] = None
         self.last_llm_confidence: Optional[float] = None
         self.entry_prices: Dict[str, float] = {}
+        self.tick_writer: Optional[TickWriter] = (
+            TickWriter(config.TICK_STORE_DIRECTORY) if getattr(config, 'TICK_STORE_DIRECTORY', None) else None
+        )
         self.load_instruments()
 
     # ------------------------------------------------------------------
@@ -195,8 +200,7 @@ class IronFlyTrader:
     def load_instruments(self):
         """Loads instruments and finds BANKNIFTY tokens and lot size."""
         try:
-            instruments_list = self.kite.instruments()
-            self.instruments_df = pd.DataFrame(instruments_list)
+            self.instruments_df = load_catalogue(self.kite).to_frame()
 
             nifty_bank_series = self.instruments_df[
                 (self.instruments_df['name'] == 'NIFTY BANK') &
@@ -452,6 +456,13 @@ class IronFlyTrader:
                         self.entry_prices[leg_name] = float(price)
 
             unrealized_pnl = self.calculate_unrealized_pnl(leg_prices)
+            if self.tick_writer:
+                now = datetime.now(ZoneInfo(config.MARKET_TIMEZONE))
+                if self.banknifty_instrument_token:
+                    self.tick_writer.append(self.banknifty_instrument_token, now, spot_price)
+                for quote in quotes.values():
+                    if quote.get('instrument_token') and quote.get('last_price') is not None:
+                        self.tick_writer.append(quote['instrument_token'], now, quote['last_price'], oi=quote.get('oi', math.nan))
 
             snapshot = {
                 "timestamp": datetime.now().isoformat(),
@@ -543,6 +554,8 @@ class IronFlyTrader:
                 logging.debug("Skipping state snapshot; spot price unavailable.")
                 continue
             self.log_state_snapshot(spot)
+        if self.tick_writer:
+            self.tick_writer.flush()
         logging.info(f"Completed state monitoring for {self.position_id}.")
 
 
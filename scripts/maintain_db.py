@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Checkpoint, vacuum and apply retention to the market database.
+
+Usage examples:
+
+    # one pass now; keep minute bars for 6 months and 5-minute bars for 24
+    python scripts/maintain_db.py --retention minute=6 --retention 5minute=24
+
+    # run a pass every 15 minutes (market hours get checkpoint-only passes)
+    python scripts/maintain_db.py --retention minute=6 --every-minutes 15
+
+    # size and fragmentation report
+    python scripts/maintain_db.py --stats --detailed
+
+``fetch_price_history.py --daemon`` already checkpoints after every poll and runs a
+retention-free pass after each session; run this script for retention policies or
+when the downloader is not running as a daemon.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import threading
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.maintenance import (  # noqa: E402
+    JOURNAL_SIZE_LIMIT,
+    database_stats,
+    enable_incremental_vacuum,
+    run_maintenance,
+)
+from market_data.schema import create_schema, interval_code  # noqa: E402
+from market_data.shards import attach_shards  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retention(values: List[str]) -> Dict[str, int]:
+    policies = {}
+    for value in values or []:
+        interval, _, months = value.partition("=")
+        interval_code(interval)
+        if not months.isdigit():
+            raise ValueError(f"Retention '{value}' must look like INTERVAL=MONTHS, e.g. minute=6.")
+        policies[interval] = int(months)
+    return policies
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain the SQLite market database.")
+    parser.add_argument(
+        "--retention",
+        action="append",
+        metavar="INTERVAL=MONTHS",
+        help="Keep bars of INTERVAL for MONTHS calendar months (repeat per interval). Applied outside market hours.",
+    )
+    parser.add_argument(
+        "--every-minutes",
+        type=float,
+        help="Keep running and start a pass every this many minutes.",
+    )
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="Convert the database to auto_vacuum=INCREMENTAL with a full VACUUM (blocks writers; run off-hours).",
+    )
+    parser.add_argument("--stats", action="store_true", help="Print size and fragmentation figures and exit.")
+    parser.add_argument("--detailed", action="store_true", help="With --stats, include per-table sizes.")
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+    retention = parse_retention(args.retention)
+
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    conn.execute(f"PRAGMA journal_size_limit={JOURNAL_SIZE_LIMIT};")
+    try:
+        attach_shards(conn)
+        if args.stats:
+            print(json.dumps(database_stats(conn, args.detailed), indent=2))
+            return
+        create_schema(conn)
+        if args.enable_incremental_vacuum:
+            enable_incremental_vacuum(conn)
+            logger.info("Database now uses auto_vacuum=INCREMENTAL")
+        if args.every_minutes is None:
+            run_maintenance(conn, retention)
+            return
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            while not stop.is_set():
+                run_maintenance(conn, retention)
+                stop.wait(args.every_minutes * 60)
+        except KeyboardInterrupt:
+            logger.info("Stopping maintenance")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
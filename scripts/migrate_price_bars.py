@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Upgrade a market database to the current schema in place.
+
+Version 1 stored ``interval`` and ``timestamp`` as TEXT in a rowid table. Version 2
+uses epoch-second timestamps and integer interval codes in a WITHOUT ROWID table,
+and version 3 adds the option fields and chain index to ``instruments`` (see
+``market_data/schema.py``). The new instrument fields are filled in from the most
+recent cached instruments dump when one is available. Usage:
+
+    python scripts/migrate_price_bars.py --db-path data/market_data.db
+
+The conversion runs in a single transaction, so an interrupted migration leaves the
+original tables untouched. Run it while no ingestion job is writing to the database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.schema import (  # noqa: E402
+    INSTRUMENT_OPTION_COLUMNS,
+    PRICE_BARS_VERSION,
+    SCHEMA_VERSION,
+    SESSION_DATE_SQL,
+    create_price_bars,
+    create_schema,
+    create_tables,
+    interval_code,
+    schema_version,
+    table_exists,
+    to_epoch,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def _convert_price_bars(conn: sqlite3.Connection, batch_size: int) -> int:
+    conn.execute("ALTER TABLE price_bars RENAME TO price_bars_v1")
+    create_price_bars(conn)
+    source = conn.execute(
+        """
+        SELECT instrument_token, interval, timestamp, open, high, low, close, volume, oi
+        FROM price_bars_v1
+        ORDER BY instrument_token, interval, timestamp
+        """
+    )
+    converted = 0
+    while True:
+        rows = source.fetchmany(batch_size)
+        if not rows:
+            break
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO price_bars (
+                instrument_token, interval, timestamp, open, high, low, close, volume, oi
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (token, interval_code(interval), to_epoch(timestamp), *values)
+                for token, interval, timestamp, *values in rows
+            ],
+        )
+        converted += len(rows)
+        logger.info("Converted %s bars", converted)
+    conn.execute("DROP TABLE price_bars_v1")
+    return converted
+
+
+def _convert_coverage(conn: sqlite3.Connection) -> None:
+    if table_exists(conn, "series_sessions"):
+        conn.execute("ALTER TABLE series_sessions RENAME TO series_sessions_v1")
+    if table_exists(conn, "series_coverage"):
+        conn.execute("DROP TABLE series_coverage")
+    create_tables(conn)
+    if table_exists(conn, "series_sessions_v1"):
+        sessions = conn.execute(
+            "SELECT instrument_token, interval, session_date, bar_count FROM series_sessions_v1"
+        ).fetchall()
+        conn.executemany(
+            "INSERT OR REPLACE INTO series_sessions VALUES (?, ?, ?, ?)",
+            [(token, interval_code(interval), day, count) for token, interval, day, count in sessions],
+        )
+        conn.execute("DROP TABLE series_sessions_v1")
+    conn.execute(
+        f"""
+        INSERT OR IGNORE INTO series_sessions (instrument_token, interval, session_date, bar_count)
+        SELECT instrument_token, interval, {SESSION_DATE_SQL}, COUNT(*)
+        FROM price_bars
+        GROUP BY 1, 2, 3
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO series_coverage (
+            instrument_token, interval, first_timestamp, last_timestamp, bar_count, updated_at
+        )
+        SELECT instrument_token, interval, MIN(timestamp), MAX(timestamp), COUNT(*), datetime('now')
+        FROM price_bars
+        GROUP BY 1, 2
+        """
+    )
+
+
+def _upgrade_instruments(conn: sqlite3.Connection) -> int:
+    """Add the v3 instrument columns and fill them from the latest cached dump."""
+    create_tables(conn)
+    conn.execute("UPDATE instruments SET expiry = NULL WHERE expiry = ''")
+
+    from scripts.instrument_catalogue import DEFAULT_CACHE_DIR, InstrumentCatalogue
+
+    cached = sorted(glob.glob(os.path.join(DEFAULT_CACHE_DIR, "instruments-*.npz")))
+    if not cached:
+        logger.info("No cached instruments dump; option fields fill in on the next download.")
+        return 0
+    catalogue = InstrumentCatalogue.load(cached[-1])
+    positions = {token: i for i, token in enumerate(catalogue.column("instrument_token").tolist())}
+    columns = {column: catalogue.column(column).tolist() for column in INSTRUMENT_OPTION_COLUMNS}
+    tokens = [row[0] for row in conn.execute("SELECT instrument_token FROM instruments")]
+    updates = [
+        (*(columns[column][positions[token]] for column in INSTRUMENT_OPTION_COLUMNS), token)
+        for token in tokens
+        if token in positions
+    ]
+    assignments = ", ".join(f"{column} = ?" for column in INSTRUMENT_OPTION_COLUMNS)
+    conn.executemany(f"UPDATE instruments SET {assignments} WHERE instrument_token = ?", updates)
+    logger.info("Filled option fields for %s instruments from %s", len(updates), cached[-1])
+    return len(updates)
+
+
+def migrate(db_path: str, batch_size: int = 50000, vacuum: bool = True) -> None:
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database {db_path} not found.")
+
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            logger.info("%s already uses schema v%s; nothing to do.", db_path, schema_version(conn))
+            return
+        if not table_exists(conn, "price_bars"):
+            create_schema(conn)
+            logger.info("Created v%s schema in %s", SCHEMA_VERSION, db_path)
+            return
+        if schema_version(conn) >= PRICE_BARS_VERSION:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                _upgrade_instruments(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            logger.info("Upgraded %s to schema v%s", db_path, SCHEMA_VERSION)
+            return
+
+        size_before = os.path.getsize(db_path)
+        started = time.monotonic()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if table_exists(conn, "price_bars_staging"):
+                conn.execute("INSERT OR REPLACE INTO price_bars SELECT * FROM price_bars_staging")
+                conn.execute("DROP TABLE price_bars_staging")
+            converted = _convert_price_bars(conn, batch_size)
+            _convert_coverage(conn)
+            _upgrade_instruments(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if vacuum:
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info(
+            "Migrated %s bars to schema v%s in %.1fs; file size %.1f MB -> %.1f MB",
+            converted,
+            SCHEMA_VERSION,
+            time.monotonic() - started,
+            size_before / 1e6,
+            os.path.getsize(db_path) / 1e6,
+        )
+    finally:
+        conn.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Upgrade a market database to the current schema in place.")
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=50000,
+        help="Rows converted per batch (default: 50000).",
+    )
+    parser.add_argument(
+        "--no-vacuum",
+        action="store_true",
+        help="Skip the VACUUM that reclaims the space freed by the old table.",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+    migrate(args.db_path, batch_size=args.batch_size, vacuum=not args.no_vacuum)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Pack completed intraday sessions into compressed columnar chunks.
+
+Usage example (pack every minute series, leaving each series' latest session as rows):
+
+    python scripts/pack_price_bars.py --interval minute --db-path data/market_data.db
+
+Packed sessions move from ``price_bars`` to ``price_chunks`` (see
+``market_data/chunks.py``) and are still served by every reader. Run ``VACUUM``
+afterwards to return the freed pages to the file system.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+from datetime import date
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.chunks import pack_series  # noqa: E402
+from market_data.schema import INTERVAL_CODES, create_schema, interval_code  # noqa: E402
+from market_data.shards import attach_shards  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def series_tokens(conn: sqlite3.Connection, interval: str) -> List[int]:
+    rows = conn.execute(
+        "SELECT DISTINCT instrument_token FROM price_bars WHERE interval = ?",
+        (interval_code(interval),),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pack stored intraday bars into compressed columnar chunks.")
+    parser.add_argument(
+        "--instrument-token",
+        dest="instrument_tokens",
+        type=int,
+        action="append",
+        help="Instrument token to pack. Repeat for multiple; defaults to every token with rows at --interval.",
+    )
+    parser.add_argument(
+        "--interval",
+        default="minute",
+        choices=[name for name in INTERVAL_CODES if name != "day"],
+        help="Intraday interval to pack (default: minute).",
+    )
+    parser.add_argument(
+        "--before",
+        type=date.fromisoformat,
+        help="Pack sessions before this date (YYYY-MM-DD). Defaults to all but each series' latest session.",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    try:
+        create_schema(conn)
+        attach_shards(conn)
+        tokens = args.instrument_tokens or series_tokens(conn, args.interval)
+        packed = sum(pack_series(conn, token, args.interval, args.before) for token in tokens)
+        logger.info("Packed %s %s bars across %s instruments", packed, args.interval, len(tokens))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Snapshot whole option chains every few seconds during the session.
+
+Usage examples:
+
+    # BANKNIFTY's nearest expiry every 15 seconds
+    python scripts/record_option_chain.py --underlying BANKNIFTY --every-seconds 15
+
+    # two chains against the synthetic client, around the clock
+    python scripts/record_option_chain.py --underlying NIFTY --underlying BANKNIFTY --offline --outside-session
+
+Snapshots are delta encoded into ``option_chain_snapshots`` (see
+``market_data/chain_snapshots.py``); read a day back with
+``market_data.chain_snapshots.read_chain_history`` or ``GET /instruments/chain/history``.
+The instruments table must list the chain (``fetch_price_history.py`` keeps it current).
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.chain_snapshots import ChainSnapshotRecorder  # noqa: E402
+from market_data.schema import MARKET_TZ, create_schema  # noqa: E402
+from scripts.fetch_price_history import SESSION_CLOSE, SESSION_OPEN, TokenBucket, authenticate_kite  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+# Kite allows one quote request per second.
+QUOTE_RATE_LIMIT = 1.0
+# Re-read the instruments table this often for strikes listed during the day.
+CONTRACT_REFRESH_SECONDS = 1800
+
+
+def in_session(now: datetime) -> bool:
+    return now.weekday() < 5 and SESSION_OPEN <= now.time() <= SESSION_CLOSE
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Record delta-encoded snapshots of whole option chains.")
+    parser.add_argument(
+        "--underlying",
+        dest="underlyings",
+        action="append",
+        required=True,
+        help="Underlying name such as BANKNIFTY. Repeat for multiple.",
+    )
+    parser.add_argument(
+        "--expiry",
+        help="Expiry to record (YYYY-MM-DD) for every underlying. Defaults to each one's nearest expiry.",
+    )
+    parser.add_argument(
+        "--every-seconds",
+        type=float,
+        default=15.0,
+        help="Seconds between snapshots of each chain (default: 15).",
+    )
+    parser.add_argument(
+        "--outside-session",
+        action="store_true",
+        help="Keep snapshotting outside 09:15-15:30 on weekdays.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the synthetic FakeKite client from scripts/fake_kite.py instead of a live session.",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.offline:
+        from scripts.fake_kite import FakeKite
+
+        kite = FakeKite(historical_rate_limit=None)
+    else:
+        kite = authenticate_kite()
+
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    create_schema(conn)
+    conn.commit()
+    limiter = TokenBucket(QUOTE_RATE_LIMIT)
+    recorders = [
+        ChainSnapshotRecorder(kite, conn, underlying, args.expiry, acquire=limiter.acquire)
+        for underlying in args.underlyings
+    ]
+    for recorder in recorders:
+        logger.info("Recording %s %s: %s contracts", recorder.underlying, recorder.expiry, len(recorder.keys))
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    refreshed = time.monotonic()
+    try:
+        while not stop.is_set():
+            # Snapshots start on multiples of --every-seconds so their times line up across days.
+            stop.wait(args.every_seconds - time.time() % args.every_seconds)
+            now = datetime.now(MARKET_TZ)
+            if stop.is_set() or not (args.outside_session or in_session(now.replace(tzinfo=None))):
+                continue
+            if time.monotonic() - refreshed > CONTRACT_REFRESH_SECONDS:
+                for recorder in recorders:
+                    recorder.refresh_contracts()
+                refreshed = time.monotonic()
+            for recorder in recorders:
+                try:
+                    totals = recorder.snapshot(now.replace(microsecond=0))
+                    logger.debug("%s %s snapshot: %s", recorder.underlying, recorder.expiry, totals)
+                except Exception as exc:  # noqa: BLE001
+                    conn.rollback()
+                    logger.warning("Snapshot of %s failed: %s", recorder.underlying, exc)
+    except KeyboardInterrupt:
+        logger.info("Stopping option-chain recorder")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
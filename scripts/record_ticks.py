@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Record streaming Kite ticks into the append-only tick store.
+
+Usage examples:
+
+    # the BANKNIFTY index and its nearest-expiry option chain, full depth mode
+    python scripts/record_ticks.py --instrument-token 260105 --chain BANKNIFTY --mode full
+
+    # also build minute bars from the stream into price_bars as each minute closes
+    python scripts/record_ticks.py --instrument-token 260105 --mode full --bars
+
+    # seal yesterday's segment once nothing more will arrive for it
+    python scripts/record_ticks.py --seal 2026-10-15
+
+Ticks are buffered and appended to ``<root>/<YYYY-MM-DD>.ticks`` once a second (see
+``market_data/ticks.py``); read them back with ``market_data.ticks.read_ticks``. With
+``--bars`` the same ticks feed ``market_data.live_bars.MinuteBarAggregator``, which
+writes each completed minute to ``price_bars`` shortly after the boundary.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.live_bars import DEFAULT_GRACE_SECONDS, MinuteBarAggregator  # noqa: E402
+from market_data.schema import MARKET_TZ, create_schema  # noqa: E402
+from market_data.ticks import DEFAULT_FLUSH_SECONDS, TickWriter, kite_ticks_to_records, seal_day  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TICK_ROOT = os.path.join("data", "ticks")
+
+
+def chain_tokens(conn: sqlite3.Connection, underlying: str, today: date) -> List[int]:
+    """Tokens of every option on the nearest unexpired expiry of ``underlying``."""
+    rows = conn.execute(
+        """
+        SELECT instrument_token FROM instruments
+        WHERE name = ? AND instrument_type IN ('CE', 'PE') AND expiry = (
+            SELECT MIN(expiry) FROM instruments
+            WHERE name = ? AND instrument_type IN ('CE', 'PE') AND expiry >= ?
+        )
+        ORDER BY strike, instrument_type
+        """,
+        (underlying, underlying, today.isoformat()),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Record Kite ticks into the append-only tick store.")
+    parser.add_argument(
+        "--instrument-token",
+        dest="instrument_tokens",
+        type=int,
+        action="append",
+        help="Instrument token to subscribe to. Repeat for multiple.",
+    )
+    parser.add_argument(
+        "--chain",
+        dest="chains",
+        action="append",
+        help="Underlying name (e.g. BANKNIFTY) whose nearest-expiry options are subscribed. Repeat for multiple.",
+    )
+    parser.add_argument(
+        "--mode",
+        default="quote",
+        choices=["ltp", "quote", "full"],
+        help="KiteTicker subscription mode; 'full' adds exchange timestamps, OI and best bid/ask (default: quote).",
+    )
+    parser.add_argument(
+        "--root",
+        default=DEFAULT_TICK_ROOT,
+        help=f"Tick store directory (default: {DEFAULT_TICK_ROOT}).",
+    )
+    parser.add_argument(
+        "--flush-seconds",
+        type=float,
+        default=DEFAULT_FLUSH_SECONDS,
+        help=f"Seconds between batched appends (default: {DEFAULT_FLUSH_SECONDS}).",
+    )
+    parser.add_argument(
+        "--bars",
+        action="store_true",
+        help="Also aggregate the ticks into minute bars written to price_bars in --db-path.",
+    )
+    parser.add_argument(
+        "--grace-seconds",
+        type=float,
+        default=DEFAULT_GRACE_SECONDS,
+        help=f"With --bars, how long after a minute ends late ticks are still folded in (default: {DEFAULT_GRACE_SECONDS}).",
+    )
+    parser.add_argument(
+        "--seal",
+        type=date.fromisoformat,
+        help="Rewrite the segment of this finished day (YYYY-MM-DD) with one index entry per token and exit.",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database used to resolve --chain and written by --bars (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.seal:
+        sealed = seal_day(args.root, args.seal)
+        logger.info("Sealed %s ticks for %s", sealed, args.seal)
+        return
+
+    tokens = list(args.instrument_tokens or [])
+    if args.chains:
+        conn = sqlite3.connect(args.db_path, timeout=30)
+        try:
+            today = datetime.now(MARKET_TZ).date()
+            for underlying in args.chains:
+                chain = chain_tokens(conn, underlying, today)
+                if not chain:
+                    logger.warning("No unexpired options for %s in %s", underlying, args.db_path)
+                tokens.extend(chain)
+        finally:
+            conn.close()
+    tokens = sorted(set(tokens))
+    if not tokens:
+        raise SystemExit("Nothing to record; pass --instrument-token and/or --chain.")
+
+    # Imported here so --seal works without Kite credentials.
+    from kiteconnect import KiteTicker
+    from scripts.fetch_price_history import authenticate_kite
+
+    kite = authenticate_kite()
+    writer = TickWriter(args.root, flush_seconds=args.flush_seconds)
+    bars = None
+    if args.bars:
+        conn = sqlite3.connect(args.db_path, timeout=30)
+        try:
+            create_schema(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        bars = MinuteBarAggregator(args.db_path, grace_seconds=args.grace_seconds)
+    ticker = KiteTicker(kite.api_key, kite.access_token)
+    stop = threading.Event()
+
+    def on_connect(ws, response) -> None:
+        ws.subscribe(tokens)
+        ws.set_mode(args.mode, tokens)
+        logger.info("Subscribed to %s instruments in %s mode", len(tokens), args.mode)
+
+    def on_ticks(ws, ticks) -> None:
+        records = kite_ticks_to_records(ticks)
+        writer.extend(records)
+        if bars is not None:
+            bars.extend(records)
+
+    def on_close(ws, code, reason) -> None:
+        logger.warning("Ticker closed (%s): %s", code, reason)
+
+    ticker.on_connect = on_connect
+    ticker.on_ticks = on_ticks
+    ticker.on_close = on_close
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    ticker.connect(threaded=True)
+    try:
+        while not stop.wait(60):
+            logger.info("Recorded %s ticks so far", writer.ticks_written)
+    finally:
+        ticker.close()
+        writer.close()
+        logger.info("Recorded %s ticks into %s", writer.ticks_written, args.root)
+        if bars is not None:
+            bars.close()
+            logger.info("Wrote %s live minute bars (%s late ticks dropped)", bars.bars_written, bars.late_ticks)
+
+
+if __name__ == "__main__":
+    main()
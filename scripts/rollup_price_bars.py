@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Derive 3/5/10/15/30/60-minute and daily bars from minute bars already in the database.
+
+Usage example (bring every instrument with minute data up to date):
+
+    python scripts/rollup_price_bars.py --db-path data/market_data.db
+
+Only sessions that are new since the last run are rebuilt, so the script is cheap to
+run after every minute download (``fetch_price_history.py --rollup`` does the same
+for the instruments it just downloaded).
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.rollup import ROLLUP_INTERVALS, rollup_series  # noqa: E402
+from market_data.schema import create_schema, interval_code  # noqa: E402
+from market_data.shards import attach_shards  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def minute_tokens(conn: sqlite3.Connection) -> List[int]:
+    rows = conn.execute(
+        "SELECT DISTINCT instrument_token FROM series_coverage WHERE interval = ? AND bar_count > 0",
+        (interval_code("minute"),),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Roll stored minute bars up to higher intervals.")
+    parser.add_argument(
+        "--instrument-token",
+        dest="instrument_tokens",
+        type=int,
+        action="append",
+        help="Instrument token to roll up. Repeat for multiple; defaults to every token with minute bars.",
+    )
+    parser.add_argument(
+        "--intervals",
+        nargs="+",
+        default=list(ROLLUP_INTERVALS),
+        choices=list(ROLLUP_INTERVALS),
+        help="Intervals to derive (default: all).",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    try:
+        create_schema(conn)
+        attach_shards(conn)
+        tokens = args.instrument_tokens or minute_tokens(conn)
+        logger.info("Rolling up %s instruments to %s", len(tokens), ", ".join(args.intervals))
+        for token in tokens:
+            rollup_series(conn, token, args.intervals)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
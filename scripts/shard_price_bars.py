@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Move price_bars and its series bookkeeping into one database file per interval family.
+
+Usage examples:
+
+    # minute-family and day bars into market_data.minute.db / market_data.day.db
+    python scripts/shard_price_bars.py --db-path data/market_data.db
+
+    # only split off the minute family for now
+    python scripts/shard_price_bars.py --family minute
+
+Every script and the backend attach the shard files automatically once they are
+registered (see ``market_data/shards.py``). Stop writers before running this; the move
+holds the write lock of the main database for the duration of each family. Run
+``VACUUM`` afterwards to return the pages the bars occupied in the main file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.schema import create_schema  # noqa: E402
+from market_data.shards import SHARD_FAMILIES, attach_shards, shard_database  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Move price_bars into per-interval-family database files.")
+    parser.add_argument(
+        "--family",
+        dest="families",
+        action="append",
+        choices=list(SHARD_FAMILIES),
+        help="Interval family to move into its own file. Repeat for multiple; defaults to all of them.",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    try:
+        create_schema(conn)
+        attach_shards(conn)
+        moved = shard_database(conn, args.families or list(SHARD_FAMILIES))
+        logger.info("Moved %s bars into %s shard files", sum(moved.values()), len(moved))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
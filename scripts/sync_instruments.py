@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Load the full Kite instruments dump into the instruments table.
+
+Usage examples:
+
+    # today's dump (downloaded once per day into data/cache) into the default database
+    python scripts/sync_instruments.py
+
+    # against the synthetic client from scripts/fake_kite.py
+    python scripts/sync_instruments.py --offline --db-path data/dev.db
+
+Only instruments that are new or changed since the last sync are written, and
+contracts that dropped out of the dump are removed once expired unless bars are stored
+for them (see ``market_data.instruments.sync_instruments``), so a daily run is cheap.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from market_data.instruments import sync_instruments  # noqa: E402
+from market_data.schema import create_schema  # noqa: E402
+from scripts.instrument_catalogue import DEFAULT_CACHE_DIR, load_catalogue  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sync the full instruments dump into the instruments table.")
+    parser.add_argument(
+        "--refresh-instruments",
+        action="store_true",
+        help="Ignore today's cached instruments dump and download it again.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help="Directory of the daily instruments dump cache (default: data/cache).",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the synthetic FakeKite client from scripts/fake_kite.py instead of a live session.",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.path.join("data", "market_data.db"),
+        help="SQLite database path (default: data/market_data.db).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging verbosity (default: INFO).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.offline:
+        from scripts.fake_kite import FakeKite
+
+        kite = FakeKite(historical_rate_limit=None)
+    else:
+        from scripts.fetch_price_history import authenticate_kite
+
+        kite = authenticate_kite()
+    catalogue = load_catalogue(kite, cache_dir=args.cache_dir, force_refresh=args.refresh_instruments)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db_path)), exist_ok=True)
+    conn = sqlite3.connect(args.db_path, timeout=30)
+    try:
+        create_schema(conn)
+        conn.commit()
+        started = time.perf_counter()
+        counts = sync_instruments(conn, catalogue)
+        logger.info(
+            "Synced %s instruments into %s in %.2fs: %s",
+            len(catalogue),
+            args.db_path,
+            time.perf_counter() - started,
+            counts,
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()